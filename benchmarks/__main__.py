@@ -0,0 +1,55 @@
+import argparse
+import sys
+
+from benchmarks.models import default_workloads
+from benchmarks.runner import (
+    compare,
+    format_comparison,
+    format_results,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmark the simulation engine"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    run = subparsers.add_parser("run", help="Run the benchmarks")
+    run.add_argument("--events", type=int, default=2000)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--filter", default="", help="Only run matching workloads")
+    run.add_argument("--output", help="Save the results as JSON")
+    diff = subparsers.add_parser("compare", help="Compare two saved runs")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Fail on throughput drops larger than this fraction",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        comparisons = compare(load_results(args.old), load_results(args.new))
+        print(format_comparison(comparisons, threshold=args.threshold))
+        return int(any(c.change < -args.threshold for c in comparisons))
+
+    events = getattr(args, "events", 2000)
+    workloads = [
+        w
+        for w in default_workloads(events=events)
+        if getattr(args, "filter", "") in w.name
+    ]
+    results = run_benchmarks(workloads, repeat=getattr(args, "repeat", 3))
+    print(format_results(results))
+    if getattr(args, "output", None):
+        save_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+from typing import Callable, Dict, List, NamedTuple
+
+from simulation.framework import Action, DiscreteSimulation, Event, State, Timeline
+from simulation.history import CheckpointHistory, FullHistory
+
+
+class Workload(NamedTuple):
+    name: str
+    factory: Callable[[], DiscreteSimulation]
+    events: int  # Number of events to execute
+    parameters: Dict[str, object] = {}
+
+
+class SyntheticEvent(Event):
+    key: str = None
+
+    def hook(self, state: State, *args, **kwargs):
+        return state.set(self.key, state.get(self.key) + 1)
+
+
+class SyntheticAction(Action):
+    """
+    Keeps `pending` of its events planned at all times
+    """
+
+    pending: int = 1
+
+    def ready_to_start(self, timeline: Timeline, *args, **kwargs) -> bool:
+        event_type = type(self.events[0][1])
+        return timeline.planned_events.count(of_type=event_type) < self.pending
+
+
+def synthetic_actions(
+    action_types: int, pending: int, density: int, state_size: int
+) -> List[Action]:
+    """
+    One action and event class per action type. Every `density` action types
+    share the same delay, so that many events end up in the same timeslot
+    """
+    actions = []
+    for i in range(action_types):
+        event_type = type(
+            "SyntheticEvent{}".format(i),
+            (SyntheticEvent,),
+            {"name": "SyntheticEvent{}".format(i), "key": "k{}".format(i % state_size)},
+        )
+        action_type = type(
+            "SyntheticAction{}".format(i),
+            (SyntheticAction,),
+            {
+                "name": "SyntheticAction{}".format(i),
+                "pending": pending,
+                "events": [(1 + i // density, event_type())],
+            },
+        )
+        actions.append(action_type())
+    return actions
+
+
+def synthetic_simulation(
+    action_types: int = 4,
+    pending: int = 1,
+    density: int = 1,
+    state_size: int = 4,
+    history: str = "full",
+    quiet: bool = False,
+) -> DiscreteSimulation:
+    """
+    History is "full" to keep every state, or the retention of a
+    CheckpointHistory
+    """
+    if history == "full":
+        history_factory = FullHistory
+    else:
+        history_factory = lambda: CheckpointHistory(retention=history)
+    return DiscreteSimulation(
+        max_duration=float("inf"),
+        available_actions=synthetic_actions(
+            action_types=action_types,
+            pending=pending,
+            density=density,
+            state_size=state_size,
+        ),
+        initial_values={"k{}".format(i): 0 for i in range(state_size)},
+        history_factory=history_factory,
+        quiet=quiet,
+    )
+
+
+def synthetic_workload(events: int, **parameters) -> Workload:
+    name = "synthetic[{}]".format(
+        ",".join(
+            "{}={}".format(k, v)
+            for k, v in sorted({**parameters, "events": events}.items())
+        )
+    )
+    return Workload(
+        name=name,
+        factory=lambda: synthetic_simulation(**parameters),
+        events=events,
+        parameters=parameters,
+    )
+
+
+def water_bucket_workload(events: int) -> Workload:
+    from examples.water_bucket import water_bucket_simulation
+
+    return Workload(
+        name="water_bucket[events={}]".format(events),
+        factory=lambda: water_bucket_simulation(max_duration=float("inf")),
+        events=events,
+    )
+
+
+def default_workloads(events: int = 2000) -> List[Workload]:
+    """
+    The reference workload plus synthetic models that each scale one
+    dimension of the engine
+    """
+    workloads = [water_bucket_workload(events)]
+    for pending in (1, 10, 100):
+        workloads.append(synthetic_workload(events, pending=pending))
+    for action_types in (1, 16, 64):
+        workloads.append(synthetic_workload(events, action_types=action_types))
+    for density in (4, 16):
+        workloads.append(synthetic_workload(events, action_types=16, density=density))
+    for state_size in (64, 1024):
+        workloads.append(synthetic_workload(events, state_size=state_size))
+    for history in ("all", "final"):
+        workloads.append(synthetic_workload(events, history=history))
+    workloads.append(synthetic_workload(events, quiet=True))
+    workloads.append(synthetic_workload(events * 5))
+    return workloads
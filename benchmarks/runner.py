@@ -0,0 +1,173 @@
+import json
+import tracemalloc
+from collections import defaultdict
+from itertools import islice
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional
+
+from benchmarks.models import Workload
+from simulation.framework import DiscreteSimulation, logger
+
+
+class Result(NamedTuple):
+    name: str
+    events: int
+    seconds: float
+    events_per_second: float
+    peak_memory: int  # Bytes, as traced by tracemalloc
+    phases: Dict[str, float]  # Seconds spent in every phase of the loop
+
+
+class Comparison(NamedTuple):
+    name: str
+    old: float  # Events per second
+    new: float
+
+    @property
+    def change(self) -> float:
+        return self.new / self.old - 1
+
+
+def _execute(sim: DiscreteSimulation, events: int):
+    for _ in islice(sim.iter_run(), events):
+        pass
+
+
+def _timed(function, phase: str, phases: Dict[str, float]):
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            phases[phase] += perf_counter() - start
+
+    return timed
+
+
+def time_phases(workload: Workload) -> Dict[str, float]:
+    """
+    Time spent in every phase of the simulation loop. The timers add overhead
+    of their own, so this is measured separately from the throughput
+    """
+    phases = defaultdict(float)
+    sim = workload.factory()
+    state_factory = sim.timeline.current_state.__class__
+    timed_state = type(
+        state_factory.__name__,
+        (state_factory,),
+        {"apply": _timed(state_factory.apply, "apply", phases)},
+    )
+    sim.timeline.current_state.__class__ = timed_state
+    sim.get_available_actions = _timed(
+        sim.get_available_actions, "find actions", phases
+    )
+    timeline = sim.timeline
+    timeline.schedule_action = _timed(timeline.schedule_action, "schedule", phases)
+    timeline.get_first_upcoming_event = _timed(
+        timeline.get_first_upcoming_event, "next event", phases
+    )
+    timeline.set_state = _timed(timeline.set_state, "record", phases)
+    sim.triggers.mark = _timed(sim.triggers.mark, "triggers", phases)
+
+    start = perf_counter()
+    _execute(sim, workload.events)
+    total = perf_counter() - start
+    phases["other"] = total - sum(phases.values())
+    return dict(phases)
+
+
+def measure(workload: Workload, repeat: int = 3) -> Result:
+    """
+    Best throughput out of a number of runs, peak memory of one traced run
+    and the time per phase of another
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        sim = workload.factory()
+        start = perf_counter()
+        _execute(sim, workload.events)
+        seconds = min(seconds, perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _execute(workload.factory(), workload.events)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        name=workload.name,
+        events=workload.events,
+        seconds=seconds,
+        events_per_second=workload.events / seconds,
+        peak_memory=peak_memory,
+        phases=time_phases(workload),
+    )
+
+
+def run_benchmarks(workloads: List[Workload], repeat: int = 3) -> List[Result]:
+    # Logs of the engine and the models would only measure the log sinks
+    logger.disable("")
+    try:
+        return [measure(w, repeat=repeat) for w in workloads]
+    finally:
+        logger.enable("")
+
+
+def save_results(results: List[Result], path: str):
+    with open(path, "w") as fp:
+        json.dump([r._asdict() for r in results], fp, indent=2)
+
+
+def load_results(path: str) -> List[Result]:
+    with open(path) as fp:
+        return [Result(**r) for r in json.load(fp)]
+
+
+def compare(old: List[Result], new: List[Result]) -> List[Comparison]:
+    """
+    Throughput of the workloads that are in both runs
+    """
+    old_by_name = {r.name: r for r in old}
+    return [
+        Comparison(
+            name=r.name,
+            old=old_by_name[r.name].events_per_second,
+            new=r.events_per_second,
+        )
+        for r in new
+        if r.name in old_by_name
+    ]
+
+
+def format_results(results: List[Result]) -> str:
+    lines = [
+        "{:<48} {:>12} {:>12}  {}".format("workload", "events/s", "peak KiB", "phases")
+    ]
+    for r in results:
+        phases = ", ".join(
+            "{} {:.0%}".format(phase, seconds / sum(r.phases.values()))
+            for phase, seconds in sorted(r.phases.items(), key=lambda p: -p[1])
+        )
+        lines.append(
+            "{:<48} {:>12.0f} {:>12.0f}  {}".format(
+                r.name, r.events_per_second, r.peak_memory / 1024, phases
+            )
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(
+    comparisons: List[Comparison], threshold: Optional[float] = None
+) -> str:
+    lines = ["{:<48} {:>12} {:>12} {:>8}".format("workload", "old", "new", "change")]
+    for c in comparisons:
+        flag = ""
+        if threshold is not None and c.change < -threshold:
+            flag = "  REGRESSION"
+        lines.append(
+            "{:<48} {:>12.0f} {:>12.0f} {:>+8.1%}{}".format(
+                c.name, c.old, c.new, c.change, flag
+            )
+        )
+    return "\n".join(lines)
@@ -1,9 +1,13 @@
 from random import randint
+from typing import TYPE_CHECKING
 
 import loguru
 
 from simulation.framework import Action, DiscreteSimulation, Event, State, Timeline
 
+if TYPE_CHECKING:
+    from simulation.vectorized import VectorState, VectorTimeline
+
 logger = loguru.logger
 
 
@@ -11,7 +15,15 @@ class WaterDropEvent(Event):
     name = "WaterDropEvent"
 
     def hook(self, state: State):
-        return state.set("drops", state.get("drops") + randint(1, 10))
+        if state.streams is None:
+            drops = randint(1, 10)
+        else:
+            drops = state.streams[self.name].randint(1, 10)
+        return state.set("drops", state.get("drops") + drops)
+
+    def vector_hook(self, state: "VectorState", mask):
+        drops = state.get("drops") + state.rng.integers(1, 11, size=state.lanes)
+        return state.set("drops", drops, mask=mask)
 
 
 class WaterDropAction(Action):
@@ -21,6 +33,9 @@ class WaterDropAction(Action):
     def ready_to_start(self, timeline: Timeline, *args, **kwargs) -> bool:
         return not timeline.action_already_planned(action=self)
 
+    def vector_ready(self, state: "VectorState", timeline: "VectorTimeline"):
+        return ~timeline.action_already_planned(action=self)
+
 
 class WaterBucketOverflowEvent(Event):
     name = "WaterBucketOverflowEvent"
@@ -31,26 +46,70 @@ class WaterBucketOverflowEvent(Event):
         state = state.set("drops", 0)
         return state.set("overflows", state.get("overflows") + 1)
 
+    def vector_hook(self, state: "VectorState", mask):
+        state = state.set("drops", 0, mask=mask)
+        return state.set("overflows", state.get("overflows") + 1, mask=mask)
+
 
 class WaterBucketOverflowAction(Action):
     name = "WaterBucketOverflowAction"
     events = [(1, WaterBucketOverflowEvent())]
+    depends_on = ("drops",)  # Only check again when the drops change
 
     def ready_to_start(self, timeline: Timeline, *args, **kwargs) -> bool:
         return timeline.current_state.get(
             "drops"
         ) > 100 and not timeline.action_already_planned(action=self)
 
+    def vector_ready(self, state: "VectorState", timeline: "VectorTimeline"):
+        return (state.get("drops") > 100) & ~timeline.action_already_planned(
+            action=self
+        )
+
+
+def water_bucket_simulation(max_duration=600, seed=None) -> DiscreteSimulation:
+    """
+    With a seed, the drops come from reproducible random streams, which need
+    NumPy. Without one, from the random module
+    """
+    streams = None
+    if seed is not None:
+        from simulation.rng import RandomStreams
+
+        streams = RandomStreams(seed)
+    return DiscreteSimulation(
+        initial_values={"drops": 0, "overflows": 0},
+        available_actions=[WaterDropAction(), WaterBucketOverflowAction()],
+        max_duration=max_duration,
+        streams=streams,
+    )
 
-sim = DiscreteSimulation(
-    initial_values={"drops": 0, "overflows": 0},
-    available_actions=[WaterDropAction(), WaterBucketOverflowAction()],
-    max_duration=600,
-)
-sim.run()
 
-logger.info(
-    "Bucket is filled with {drops} drops and overflowed {overflows} time(s)".format(
-        **sim.timeline.current_state.values
+if __name__ == "__main__":
+    sim = water_bucket_simulation()
+    sim.run()
+
+    logger.info(
+        "Bucket is filled with {drops} drops and overflowed {overflows} time(s)".format(
+            **sim.timeline.current_state.values
+        )
+    )
+
+    try:
+        from simulation.vectorized import VectorizedSimulation
+    except ImportError:
+        raise SystemExit("Install NumPy to run a thousand buckets at once")
+
+    # Run a thousand buckets at once
+    lockstep = VectorizedSimulation(
+        initial_values={"drops": 0, "overflows": 0},
+        available_actions=[WaterDropAction(), WaterBucketOverflowAction()],
+        max_duration=600,
+        lanes=1000,
+    )
+    overflows = lockstep.run().get("overflows")
+    logger.info(
+        "{} buckets overflowed {} time(s) on average".format(
+            lockstep.lanes, overflows.mean()
+        )
     )
-)
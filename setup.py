@@ -12,6 +12,7 @@ setup(
     author_email="alexandergrooff@gmail.com",
     url="https://github.com/AlexanderGrooff/discrete-event-simulation",
     packages=["simulation"],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
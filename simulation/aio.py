@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+from typing import AsyncIterator, Iterator, List
+
+from simulation.batching import (
+    BatchedSimulation,
+    HookResult,
+    OverlayState,
+    Replay,
+    SerialOnly,
+    conflict_free,
+    same_random_states,
+)
+from simulation.checkpoint import random_states, restore_random_states
+from simulation.framework import Event, State, Step
+
+
+class AsyncDiscreteSimulation(BatchedSimulation):
+    """
+    Runs on asyncio, so event hooks can be coroutines. The hooks of events
+    at the same time that can be batched run together, at most
+    `max_concurrency` at a time and `max_batch` per batch. As with
+    ParallelDiscreteSimulation, the changes are only kept up to the first
+    hook that read what an earlier one in the batch set, and the steps come
+    out in the same order as with DiscreteSimulation.
+
+    `run_async` and `iter_run_async` are the coroutines to await inside a
+    running event loop. `run` and `iter_run` drive them on a loop of their
+    own, so the simulation can be forked, replicated and swept like any
+    other. Coroutine hooks run on an OverlayState, so they should only
+    change the state through `set`
+    """
+
+    max_concurrency: int = 16
+
+    def __init__(self, *args, max_concurrency: int = 16, **kwargs):
+        self.max_concurrency = max_concurrency
+        super(AsyncDiscreteSimulation, self).__init__(*args, **kwargs)
+
+    def iter_run(self) -> Iterator[Step]:
+        """
+        Drive `iter_run_async` on an event loop of its own, so the simulation
+        can be used wherever a DiscreteSimulation is
+        """
+        loop = asyncio.new_event_loop()
+        steps = self.iter_run_async()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(steps.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(steps.aclose())
+            loop.close()
+
+    async def run_async(self) -> State:
+        async for _ in self.iter_run_async():
+            pass
+        return self.timeline.current_state
+
+    async def iter_run_async(self) -> AsyncIterator[Step]:
+        self._begin_run()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            while self._running():
+                self._schedule_available_actions()
+                event_occurrence = self._next_event()
+                if event_occurrence is None:
+                    break
+                new_time, event = event_occurrence
+                self._before_execute(new_time, event)
+                state = self.timeline.current_state
+                changes = self._precomputed_changes(new_time, event)
+                if changes is None:
+                    batch = self._batch_at(new_time, event)
+                    if batch:
+                        before = random_states()
+                        results = await self._run_batch(batch, state, semaphore, before)
+                        self._drew_random(batch, [c for c, _ in results], before)
+                        results = [c for c, _ in results[: conflict_free(results)]]
+                        self._keep(new_time, batch, results)
+                        changes = results[0] if results else None
+                    if changes is None and inspect.iscoroutinefunction(event.hook):
+                        changes, _ = await self._run_hook(event, state, semaphore)
+                if changes is None:
+                    new_state = state.apply(event)
+                else:
+                    new_state = state.apply(Replay(event, changes))
+                yield self._record(new_time, event, new_state)
+        finally:
+            self._end_run()
+
+    async def _run_batch(
+        self,
+        batch: List[Event],
+        state: State,
+        semaphore: asyncio.Semaphore,
+        before: dict,
+    ) -> List[HookResult]:
+        results = await asyncio.gather(
+            *(self._run_hook(event, state, semaphore, batched=True) for event in batch)
+        )
+        if self._unclear_draws([changes for changes, _ in results], before):
+            restore_random_states(before)
+            for position, (changes, _) in enumerate(results):
+                if changes is None:
+                    results[position] = await self._run_hook(
+                        batch[position], state, semaphore, batched=True
+                    )
+        return results
+
+    @staticmethod
+    async def _run_hook(
+        event: Event,
+        state: State,
+        semaphore: asyncio.Semaphore,
+        batched: bool = False,
+    ) -> HookResult:
+        """
+        Values the hook sets, without changing the state, and the keys it
+        read. None when it runs in a batch and drew random numbers, so it has
+        to run on its own
+        """
+        overlay = OverlayState(state, batched=batched)
+        async with semaphore:
+            before = random_states() if batched else None
+            try:
+                result = event.hook(state=overlay)
+                if inspect.isawaitable(result):
+                    await result
+            except SerialOnly:
+                return None, None
+            if batched and not same_random_states(before, random_states()):
+                return None, None
+        return overlay.changes, overlay.reads
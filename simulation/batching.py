@@ -0,0 +1,215 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from simulation.checkpoint import random_states, restore_random_states
+from simulation.framework import DiscreteSimulation, Event, State
+from simulation.types import Time
+
+
+def same_random_states(first: dict, second: dict) -> bool:
+    """
+    Whether nothing was drawn from the global random generators between two
+    `random_states()`
+    """
+    if first.keys() != second.keys() or first["random"] != second["random"]:
+        return False
+    if "numpy" not in first:
+        return True
+    (name, keys, *rest), (other_name, other_keys, *other_rest) = (
+        first["numpy"],
+        second["numpy"],
+    )
+    return name == other_name and rest == other_rest and (keys == other_keys).all()
+
+
+# Values set and keys read, None for all. Hooks that have to run on their
+# own have None as values
+HookResult = Tuple[Optional[dict], Optional[Set]]
+
+
+def conflict_free(results: List[HookResult]) -> int:
+    """
+    Number of leading results that don't read what an earlier one set. Those
+    are the same as when the hooks run one after the other
+    """
+    written = set()
+    for position, (changes, reads) in enumerate(results):
+        if changes is None:
+            return position
+        if reads is None and written or reads is not None and reads & written:
+            return position
+        written.update(changes)
+    return len(results)
+
+
+class SerialOnly(Exception):
+    """
+    Raised when a hook in a batch has to run on its own instead
+    """
+
+
+class OverlayState(State):
+    """
+    Reads through to another state and keeps the values set on it apart, so
+    a hook can run without changing the state it reads. Records the keys it
+    read from the other state, or None once all values were read.
+
+    Hooks in a batch can't use the random streams, as those have to be drawn
+    from in the usual order. They get SerialOnly instead
+    """
+
+    base: State = None
+    reads: Optional[Set] = None
+    batched: bool = False
+
+    def __init__(self, base: State, batched: bool = False):
+        self.base = base
+        self.batched = batched
+        self.active_events = base.active_events
+        self.completed_events = base.completed_events
+        self.changes = {}
+        self.reads = set()
+
+    @property
+    def streams(self) -> "RandomStreams":
+        if self.batched:
+            raise SerialOnly("Random streams can't be used in a batch")
+        return self.base.streams
+
+    @property
+    def values(self) -> dict:
+        self.reads = None
+        return {**self.base.values, **self.changes}
+
+    def get(self, key, default=None):
+        try:
+            return self.changes[key]
+        except KeyError:
+            if self.reads is not None:
+                self.reads.add(key)
+            return self.base.get(key, default)
+
+    def set(self, key, value) -> "OverlayState":
+        self.changes[key] = value
+        return self
+
+
+class Replay:
+    """
+    Stands in for an event whose hook already ran, setting the values it set
+    """
+
+    __slots__ = ("event", "changes")
+
+    def __init__(self, event: Event, changes: dict):
+        self.event = event
+        self.changes = changes
+
+    def __call__(self, state: State, *args, **kwargs) -> State:
+        self.event.started = True
+        for key, value in self.changes.items():
+            state.set(key, value)
+        return state
+
+
+class BatchedSimulation(DiscreteSimulation):
+    """
+    Base of engines that run the hooks of events due at the same time
+    together. Their changes are applied one event at a time in the usual
+    order, with actions scheduled in between, so the result matches running
+    them one by one. When anything else runs in between, the changes that
+    weren't applied yet are thrown away and computed again later.
+
+    Random numbers have to be drawn in the usual order as well. A hook that
+    uses the random streams of the state, or draws from the global random
+    generators, is cut from its batch, the generators are set back and the
+    hook runs again on its own. Its event type isn't batched anymore after
+    that
+    """
+
+    max_batch: Optional[int] = None
+    # Changes of batched events that weren't applied yet, by id of the event
+    _precomputed: Dict[int, Tuple[Time, Event, dict]] = None
+    # Types of events whose hooks drew random numbers, so they run on their own
+    serial_types: Set[type] = None
+
+    def __init__(self, *args, max_batch: Optional[int] = None, **kwargs):
+        self.max_batch = max_batch
+        self._precomputed = {}
+        self.serial_types = set()
+        super(BatchedSimulation, self).__init__(*args, **kwargs)
+
+    def reset(self, initial_values: Optional[dict] = None):
+        self._precomputed = {}
+        super(BatchedSimulation, self).reset(initial_values)
+
+    def joins(self, event: Event, batch: List[Event]) -> bool:
+        """
+        Whether the event can run together with the batch so far. Events that
+        declare `reads` and `writes` join unless they read what an event
+        before them sets, others when they are `concurrent`
+        """
+        if event.reads is None or event.writes is None:
+            return event.concurrent
+        written = set()
+        for other in batch:
+            written.update(other.writes or ())
+        return not written.intersection(event.reads)
+
+    def _joins(self, event: Event, batch: List[Event]) -> bool:
+        return type(event) not in self.serial_types and self.joins(event, batch)
+
+    def _batch_at(self, time: Time, event: Event) -> List[Event]:
+        """
+        The event and the events after it at the same time that can run
+        together with it, or nothing when it can't be batched
+        """
+        if not self._joins(event, []):
+            return []
+        batch = [event]
+        upcoming = self.timeline.events[time].upcoming_events()
+        position = next(i for i, e in enumerate(upcoming) if e is event)
+        for other in upcoming[position + 1 :]:
+            if len(batch) == self.max_batch or not self._joins(other, batch):
+                break
+            batch.append(other)
+        return batch
+
+    def _drew_random(
+        self, batch: List[Event], changes: List[Optional[dict]], before: dict
+    ):
+        """
+        Set the global random generators back to `before` when hooks in the
+        batch drew random numbers, which have None as changes
+        """
+        drew = [e for e, c in zip(batch, changes) if c is None]
+        if drew:
+            restore_random_states(before)
+            self.serial_types.update(type(e) for e in drew)
+
+    @staticmethod
+    def _unclear_draws(changes: List[Optional[dict]], before: dict) -> bool:
+        """
+        Whether several hooks were cut from the batch while the global random
+        generators moved. Hooks running at the same time see each other's
+        draws, so they run again one at a time to tell which ones drew
+        """
+        cut = sum(c is None for c in changes)
+        return cut > 1 and not same_random_states(before, random_states())
+
+    def _keep(self, time: Time, batch: List[Event], changes: List[dict]):
+        self._precomputed = {
+            id(e): (time, e, c) for e, c in zip(batch[1:], changes[1:])
+        }
+
+    def _precomputed_changes(self, time: Time, event: Event) -> Optional[dict]:
+        entry = self._precomputed.pop(id(event), None)
+        if entry is not None and entry[0] == time and entry[1] is event:
+            return entry[2]
+        # Another event runs first, so the rest of the batch may be stale
+        self._precomputed.clear()
+        return None
+
+    def __getstate__(self) -> dict:
+        state = super(BatchedSimulation, self).__getstate__()
+        state["_precomputed"] = {}  # Keyed by id(), and cheap to compute again
+        return state
@@ -0,0 +1,85 @@
+import os
+import pickle
+import random
+import struct
+import sys
+from typing import List
+
+CHECKPOINT_MAGIC = b"DESCKPT\0"
+CHECKPOINT_VERSION = 1
+
+_HEADER = struct.Struct("<8sHI")  # Magic, version, number of buffers
+_LENGTH = struct.Struct("<Q")
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+def random_states() -> dict:
+    """
+    States of the global random generators of Python and, if loaded, NumPy
+    """
+    states = {"random": random.getstate()}
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        states["numpy"] = numpy.random.get_state()
+    return states
+
+
+def restore_random_states(states: dict):
+    random.setstate(states["random"])
+    if "numpy" in states:
+        import numpy
+
+        numpy.random.set_state(states["numpy"])
+
+
+def write_checkpoint(obj, path: str):
+    """
+    Write a versioned snapshot of the object and the global random states.
+    Large buffers, like NumPy arrays, are written out-of-band without copying
+    them into the pickle. The file is replaced atomically
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    payload = pickle.dumps(
+        {"object": obj, "random": random_states()},
+        protocol=5,
+        buffer_callback=buffers.append,
+    )
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "wb") as fp:
+        fp.write(_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(buffers)))
+        fp.write(_LENGTH.pack(len(payload)))
+        fp.write(payload)
+        for buffer in buffers:
+            data = buffer.raw()
+            fp.write(_LENGTH.pack(data.nbytes))
+            fp.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: str, restore_random: bool = True):
+    with open(path, "rb") as fp:
+        header = fp.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise CheckpointError("{} is not a checkpoint".format(path))
+        magic, version, nbuffers = _HEADER.unpack(header)
+        if magic != CHECKPOINT_MAGIC:
+            raise CheckpointError("{} is not a checkpoint".format(path))
+        if version != CHECKPOINT_VERSION:
+            raise CheckpointError(
+                "Unsupported checkpoint version {} in {}".format(version, path)
+            )
+        (length,) = _LENGTH.unpack(fp.read(_LENGTH.size))
+        payload = fp.read(length)
+        buffers = []
+        for _ in range(nbuffers):
+            (length,) = _LENGTH.unpack(fp.read(_LENGTH.size))
+            buffer = bytearray(length)
+            fp.readinto(buffer)
+            buffers.append(buffer)
+    snapshot = pickle.loads(payload, buffers=buffers)
+    if restore_random:
+        restore_random_states(snapshot["random"])
+    return snapshot["object"]
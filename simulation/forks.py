@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+from simulation.framework import DiscreteSimulation
+from simulation.replications import Reducer, final_values
+
+Setup = Callable[[DiscreteSimulation, object], None]
+
+# Simulation the workers fork from, set when the worker starts
+_base: Optional[tuple] = None
+
+
+def _start_worker(*base):
+    global _base
+    _base = base
+
+
+def run_fork(
+    sim: DiscreteSimulation,
+    variant,
+    setup: Setup,
+    reducer: Optional[Reducer] = None,
+    keys: Optional[Sequence] = None,
+    random_state: Optional[tuple] = None,
+) -> dict:
+    """
+    Run a fork of the simulation after `setup` applied the variant to it
+    """
+    branch = sim.fork()
+    setup(branch, variant)
+    if random_state is not None:
+        random.setstate(random_state)
+    branch.run()
+    return reducer(branch) if reducer is not None else final_values(branch, keys)
+
+
+def _run_fork_in_worker(variant) -> dict:
+    return run_fork(*_base[:1], variant, *_base[1:])
+
+
+def run_forks(
+    sim: DiscreteSimulation,
+    variants: Sequence,
+    setup: Setup,
+    reducer: Optional[Reducer] = None,
+    keys: Optional[Sequence] = None,
+    workers: Optional[int] = None,
+) -> List[dict]:
+    """
+    Continue a simulation once per variant, for example after a warm-up,
+    with `setup(fork, variant)` changing the fork before it runs. Every fork
+    starts from the same random state, so the variants see common random
+    numbers.
+
+    Workers are started with os.fork where the platform has it, so they
+    share the memory of the simulation until they change it; elsewhere the
+    simulation is pickled once per worker. Variants and results have to be
+    picklable. Use 1 worker to run in this process
+    """
+    random_state = random.getstate()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        try:
+            return [
+                run_fork(sim, v, setup, reducer, keys, random_state) for v in variants
+            ]
+        finally:
+            random.setstate(random_state)
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_start_worker,
+        initargs=(sim, setup, reducer, keys, random_state),
+    ) as executor:
+        return list(executor.map(_run_fork_in_worker, variants))
@@ -1,5 +1,12 @@
+from bisect import bisect_left
 from collections import OrderedDict
-from copy import deepcopy
+from collections.abc import MutableMapping
+from copy import copy, deepcopy
+from itertools import chain, takewhile
+from math import inf
+from operator import attrgetter
+from time import perf_counter
+from types import MethodType
 from typing import (
     OrderedDict as OrderedDictType,
     Optional,
@@ -7,11 +14,24 @@ from typing import (
     Tuple,
     Callable,
     Union,
+    Dict,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Set,
 )
 from uuid import uuid4
 
 import loguru
 
+from simulation.checkpoint import read_checkpoint, write_checkpoint
+from simulation.history import FullHistory, StateHistory
+from simulation.indexes import PendingIndex, SharedPast, TimeIndex
+from simulation.observers import Observer
+from simulation.queues import EventQueue, HeapEventQueue, QueueEntry
+from simulation.recorder import Recorder
+from simulation.stopping import STOP_MAX_DURATION, STOP_NO_EVENTS, StopCondition
+from simulation.triggers import ActionTriggers
 from simulation.types import Time, Timedelta, Weight
 
 logger = loguru.logger
@@ -21,6 +41,16 @@ class SimulationError(RuntimeError):
     pass
 
 
+class Step(NamedTuple):
+    """
+    Event executed by the simulation, with the values it set
+    """
+
+    time: Time
+    event: "Event"
+    changes: dict
+
+
 class State:
     """
     State of the simulation at a given point in time
@@ -29,6 +59,8 @@ class State:
     values: dict = None
     active_events: List["Action"] = None
     completed_events: List["Action"] = None
+    changes: dict = None  # Values set by the event that produced this state
+    streams: "RandomStreams" = None  # Random streams of the simulation, if any
 
     def __init__(
         self,
@@ -39,14 +71,25 @@ class State:
         self.values = values or {}
         self.active_events = active_events or []
         self.completed_events = completed_events or []
+        self.changes = {}
 
     def get(self, key, default=None):
         return self.values.get(key, default)
 
     def set(self, key, value) -> "State":
         self.values[key] = value
+        self.changes[key] = value
         return self
 
+    def apply(self, event: "Event") -> "State":
+        """
+        Run the event on a copy of this state and return the state that
+        follows from it. This state stays as it was, as recorded in the history
+        """
+        state = deepcopy(self)
+        state.changes = {}
+        return event(state=state)
+
     def complete_event(self, event: "Action") -> "State":
         active_event = [ae for ae in self.active_events if ae.id == event.id][0]
         self.active_events.remove(active_event)
@@ -54,20 +97,90 @@ class State:
         return self
 
 
+class IdCounter:
+    """
+    Monotonically increasing integer ids
+    """
+
+    def __init__(self, start: int = 1):
+        self.next_id = start
+
+    def __call__(self) -> int:
+        next_id = self.next_id
+        self.next_id += 1
+        return next_id
+
+    def skip_past(self, used_id):
+        """
+        Make sure ids that are already in use, like restored ones, are never
+        handed out again
+        """
+        if isinstance(used_id, int) and used_id >= self.next_id:
+            self.next_id = used_id + 1
+
+
+def uuid_id() -> str:
+    """
+    Random string ids, for models that depend on those
+    """
+    return str(uuid4())
+
+
 class BaseSimObject:
-    id = None
-    name: str = None
-    weight: Weight = 0
-    started: bool = False
+    """
+    Common attributes live in slots. The __dict__ is only filled when a
+    subclass overrides a default on class level or sets other attributes
+    """
+
+    __slots__ = ("id", "name", "weight", "started", "__dict__")
+
+    id: Union[int, str]
+    name: str
+    weight: Weight
+    started: bool
+    deepcopy_instances: bool = False  # Opt out of shallow instantiation
+    # One source for the ids of every object, prototypes, scheduled instances
+    # and objects that hooks create alike, so they never collide
+    id_factory: Callable[[], Union[int, str]] = IdCounter()
 
     def __init__(self, name: str = None, weight: Weight = None, *args, **kwargs):
-        self.weight = weight or self.weight or 0
-        self.id = str(uuid4())
-        self.name = name or self.name or self.__class__.__name__
+        self.weight = weight or getattr(self, "weight", None) or 0
+        self.id = self.__class__.id_factory()
+        self.name = name or getattr(self, "name", None) or self.__class__.__name__
+        self.started = False
 
     def __repr__(self):
         return "{} - {}".format(self.name, self.id)
 
+    def instantiate(self, ids: Optional[IdCounter] = None) -> "BaseSimObject":
+        """
+        Create an instance of this object to put on the timeline, with a fresh
+        id from `ids` or the id factory of the class. Attributes are shared
+        with this object, unless it opts out of that through
+        `deepcopy_instances`
+        """
+        cls = self.__class__
+        if self.deepcopy_instances:
+            instance = deepcopy(self)
+        else:
+            instance = cls.__new__(cls)
+            self._copy_slots(instance)
+            if self.__dict__:
+                instance.__dict__.update(self.__dict__)
+        instance.id = self._new_id(ids)
+        return instance
+
+    def _new_id(self, ids: Optional[IdCounter] = None) -> Union[int, str]:
+        id_factory = self.__class__.id_factory
+        if ids is not None and id_factory is BaseSimObject.id_factory:
+            return ids()  # Classes with their own id factory keep using it
+        return id_factory()
+
+    def _copy_slots(self, instance: "BaseSimObject"):
+        instance.name = self.name
+        instance.weight = self.weight
+        instance.started = self.started
+
     def __eq__(self, other: "BaseSimObject"):
         return (
             type(self) == type(other)
@@ -75,31 +188,67 @@ class BaseSimObject:
             and self.name == other.name
         )
 
+    def __hash__(self):
+        return hash(self.id)
+
 
 class Event(BaseSimObject):
     """
     Event is scheduled by an action
     """
 
-    started: bool = False
+    __slots__ = ("hook",)
+
+    # The hook only changes the state through `set` and doesn't read what
+    # other concurrent events at the same time set, so batched engines may
+    # run it alongside them
+    concurrent: bool = False
+    # State keys the hook reads and sets. Events that declare both are
+    # batched with the events before them unless they read what those set
+    reads: Optional[Tuple] = None
+    writes: Optional[Tuple] = None
 
     def __init__(self, name: str = None, hook: Callable = None, weight: Weight = None):
         super(Event, self).__init__(name=name, weight=weight)
-        self.hook = hook or self.hook
+        if hook is not None:
+            self.hook = hook
+        else:
+            self.hook  # Subclasses define the hook as a method
 
     def __call__(self, state: State, *args, **kwargs) -> State:
         self.started = True
         return self.hook(state=state, *args, **kwargs)
 
+    def instantiate(self, ids: Optional[IdCounter] = None) -> "Event":
+        instance = super(Event, self).instantiate(ids)
+        hook = instance.hook
+        if isinstance(hook, MethodType) and hook.__self__ is self:
+            instance.hook = MethodType(hook.__func__, instance)
+        return instance
+
+    def _copy_slots(self, instance: "Event"):
+        super(Event, self)._copy_slots(instance)
+        if self.__class__.hook is _event_hook_slot:
+            # Not a method, so it was passed to __init__
+            instance.hook = self.hook
+
+
+_event_hook_slot = Event.__dict__["hook"]
+
 
 class Action(BaseSimObject):
     """
     Actions at a point in time that trigger a series of events
     """
 
-    started = False
+    __slots__ = ("duration", "events")
+
     is_complete = False
-    events: List[Tuple[Timedelta, Event]] = None
+    events: List[Tuple[Timedelta, Event]]
+    # State keys and event types readiness depends on. Actions that declare
+    # neither are checked for readiness after every event
+    depends_on: Tuple[str, ...] = None
+    triggered_by: Tuple[type, ...] = ()
 
     def __init__(
         self,
@@ -110,14 +259,33 @@ class Action(BaseSimObject):
     ):
         super(Action, self).__init__(name=name, weight=weight)
         self.duration = duration
-        self.events = events or self.events or []
+        self.events = events or getattr(self, "events", None) or []
 
     def ready_to_start(self, timeline: "Timeline", *args, **kwargs) -> bool:
         return not self.started  # TODO
 
+    def instantiate(self, ids: Optional[IdCounter] = None) -> "Action":
+        instance = super(Action, self).instantiate(ids)
+        if self.deepcopy_instances:
+            for _, e in instance.events:
+                e.id = e._new_id(ids)
+        else:
+            instance.events = [(td, e.instantiate(ids)) for td, e in self.events]
+        return instance
+
+    def _copy_slots(self, instance: "Action"):
+        super(Action, self)._copy_slots(instance)
+        instance.duration = self.duration
+
 
 class Timeslot:
-    items: OrderedDictType[Weight, List[BaseSimObject]] = None
+    """
+    Items at a single point in time, bucketed by weight. High weight has prio
+    """
+
+    _weights: List[Weight] = None  # Negated, so buckets are in ascending order
+    _buckets: Dict[Weight, List[BaseSimObject]] = None
+    _discarded: Set[int] = None  # Ids of items that are skipped until compaction
 
     def __init__(
         self, items: Optional[Union[BaseSimObject, List[BaseSimObject]]] = None
@@ -125,69 +293,269 @@ class Timeslot:
         items = items or []
         if not isinstance(items, list):
             items = [items]
-        self.items = OrderedDict()
+        self._weights = []
+        self._buckets = {}
+        self._discarded = set()
+        self._size = 0
+        # Position of the first item that might not be started yet
+        self._cursor_bucket = 0
+        self._cursor_position = 0
         for item in items:
-            if self.items.get(item.weight):
-                self.items[item.weight].append(item)
-            else:
-                self.items[item.weight] = [item]
-        self.sort()
+            self.add(item)
+
+    def __getstate__(self) -> dict:
+        # Discarded items are tracked by id(), which doesn't survive copying
+        self._compact()
+        return self.__dict__.copy()
+
+    @property
+    def items(self) -> OrderedDictType[Weight, List[BaseSimObject]]:
+        self._compact()
+        return OrderedDict((-w, self._buckets[-w]) for w in self._weights)
 
     def sort(self) -> "Timeslot":
-        self.items = OrderedDict(
-            sorted(self.items.items(), reverse=True)
-        )  # High weight has prio
-        return self
+        return self  # Buckets are always kept in order
 
     def add(self, item: BaseSimObject) -> "Timeslot":
-        self.items[item.weight] = self.items.get(item.weight, [])
-        self.items[item.weight].append(item)
-        self.sort()
+        if id(item) in self._discarded:
+            self._compact()  # Added again, so the old place has to go first
+        index = bisect_left(self._weights, -item.weight)
+        bucket = self._buckets.get(item.weight)
+        if bucket is None:
+            bucket = self._buckets[item.weight] = []
+            self._weights.insert(index, -item.weight)
+            if index <= self._cursor_bucket:
+                self._cursor_bucket, self._cursor_position = index, 0
+        elif index < self._cursor_bucket:
+            self._cursor_bucket, self._cursor_position = index, len(bucket)
+        bucket.append(item)
+        self._size += 1
         return self
 
+    def discard(self, item: BaseSimObject) -> bool:
+        """
+        Remove this very item, not one that is equal to it, in O(1). The item
+        is skipped from now on and dropped once half of the items are
+        discarded. Returns False if it was discarded already
+        """
+        if id(item) in self._discarded:
+            return False
+        self._discarded.add(id(item))
+        if len(self._discarded) * 2 > self._size:
+            self._compact()
+        return True
+
+    def _compact(self):
+        if not self._discarded:
+            return
+        discarded = self._discarded
+        for weight in list(self._buckets):
+            bucket = [i for i in self._buckets[weight] if id(i) not in discarded]
+            if bucket:
+                self._buckets[weight] = bucket
+            else:
+                del self._buckets[weight]
+                self._weights.remove(-weight)
+        self._discarded = set()
+        self._size = sum(len(bucket) for bucket in self._buckets.values())
+        self._cursor_bucket, self._cursor_position = 0, 0
+
     def to_list(self) -> List[BaseSimObject]:
         flat_list = []
-        for i in self.items.values():
-            for j in i:
-                flat_list.append(j)
+        for w in self._weights:
+            flat_list.extend(self._buckets[-w])
+        if self._discarded:
+            return [i for i in flat_list if id(i) not in self._discarded]
         return flat_list
 
+    def _remaining(self) -> Iterator[Tuple[int, int, BaseSimObject]]:
+        position = self._cursor_position
+        discarded = self._discarded
+        for index in range(self._cursor_bucket, len(self._weights)):
+            bucket = self._buckets[-self._weights[index]]
+            for position in range(position, len(bucket)):
+                if not discarded or id(bucket[position]) not in discarded:
+                    yield index, position, bucket[position]
+            position = 0
+
     def upcoming_events(self) -> List[BaseSimObject]:
-        return [i for i in self.to_list() if not i.started]
+        return [i for _, _, i in self._remaining() if not i.started]
 
     def next_event(self) -> Optional[BaseSimObject]:
-        try:
-            return self.upcoming_events()[0]  # TODO: Not as efficient as possible
-        except IndexError:
-            pass
+        for index, position, item in self._remaining():
+            if not item.started:
+                # Items before the cursor are started, so they are never
+                # visited again
+                self._cursor_bucket, self._cursor_position = index, position
+                return item
+        self._cursor_bucket, self._cursor_position = len(self._weights), 0
 
     def __eq__(self, other: "Timeslot") -> bool:
         return self.to_list() == other.to_list()
 
 
+class Timeslots(SharedPast, MutableMapping):
+    """
+    Timeslots by time, in order of time. Copies share the timeslots of the
+    past
+    """
+
+    def __init__(self):
+        self._own: OrderedDictType[Time, Timeslot] = OrderedDict()
+
+    def at(self, time: Time) -> Timeslot:
+        """
+        Timeslot at the time, added if there is none yet
+        """
+        try:
+            return self[time]
+        except KeyError:
+            pass
+        timeslots = self._own
+        timeslot = timeslots[time] = Timeslot()
+        # New times are mostly the latest ones, so only the few times after it
+        # have to be moved to keep the timeslots sorted
+        times = reversed(timeslots)
+        next(times)
+        for t in reversed(list(takewhile(lambda t: t > time, times))):
+            timeslots.move_to_end(t)
+        return timeslot
+
+    def trim(self, before: Time):
+        """
+        Forget the timeslots before the given time
+        """
+        self._drop_past(before)
+        while self._own and next(iter(self._own)) < before:
+            self._own.popitem(last=False)
+
+    def _split(self, time: Time) -> "Timeslots":
+        past = copy(self)
+        past._own = OrderedDict()
+        while self._own and next(iter(self._own)) < time:
+            t, timeslot = self._own.popitem(last=False)
+            past._own[t] = timeslot
+        return past
+
+    def _joined(self, newer: "Timeslots") -> "Timeslots":
+        past = copy(newer)
+        past._past, past._since = self._past, self._since
+        past._own = OrderedDict(chain(self._own.items(), newer._own.items()))
+        return past
+
+    def _size(self) -> int:
+        return len(self._own)
+
+    def __getitem__(self, time: Time) -> Timeslot:
+        try:
+            return self._own[time]
+        except KeyError:
+            if self._past is None or time >= self._since:
+                raise
+        return self._past[time]
+
+    def __setitem__(self, time: Time, timeslot: Timeslot):
+        self._own[time] = timeslot
+
+    def __delitem__(self, time: Time):
+        del self._own[time]  # The past never changes
+
+    def __iter__(self) -> Iterator[Time]:
+        if self._past is None:
+            return iter(self._own)
+        return chain(self._past, self._own)
+
+    def __len__(self) -> int:
+        past = len(self._past) if self._past is not None else 0
+        return past + len(self._own)
+
+    def __repr__(self):
+        return "Timeslots({})".format(dict(self.items()))
+
+
+class Handle:
+    """
+    Scheduled event or action, to cancel or move it later
+    """
+
+    __slots__ = ("timeline", "item", "time")
+
+    def __init__(self, timeline: "Timeline", item: BaseSimObject, time: Time):
+        self.timeline = timeline
+        self.item = item
+        self.time = time
+
+    def cancel(self) -> bool:
+        return self.timeline.cancel(self.item)
+
+    def reschedule(self, time: Time) -> "Handle":
+        return self.timeline.reschedule(self.item, time)
+
+    def __repr__(self):
+        return "Handle({!r} at {})".format(self.item, self.time)
+
+
 class Timeline:
     """
     Tracks the state and events over time
     """
 
-    states: OrderedDictType[Time, State] = None
-    events: OrderedDictType[Time, Timeslot] = None
-    actions: OrderedDictType[Time, Timeslot] = None
+    history: StateHistory = None
+    events: Timeslots = None
+    actions: Timeslots = None
+    pending: EventQueue = None
+    planned_events: PendingIndex = None
+    planned_actions: PendingIndex = None
+    # Everything ever scheduled, and the events that were executed, by time
+    scheduled_events: TimeIndex = None
+    executed_events: TimeIndex = None
+    scheduled_actions: TimeIndex = None
+    quiet: bool = False
+    _shared_until: Time = -inf  # Time before which the past is shared
 
-    def __init__(self, initial_values: Optional[dict] = None):
-        initial_state = State(
+    def __init__(
+        self,
+        initial_values: Optional[dict] = None,
+        queue: EventQueue = None,
+        state_factory: Callable[..., State] = State,
+        history: StateHistory = None,
+        quiet: bool = False,
+    ):
+        initial_state = state_factory(
             active_events=[], completed_events=[], values=initial_values
         )
-        self.states = OrderedDict({0: initial_state})
-        self.events = OrderedDict()
-        self.actions = OrderedDict()
+        self.history = history if history is not None else FullHistory()
+        self.history.record(time=0, state=initial_state)
+        self.events = Timeslots()
+        self.actions = Timeslots()
+        self.pending = queue if queue is not None else HeapEventQueue()
+        self.planned_events = PendingIndex()
+        self.planned_actions = PendingIndex()
+        self.scheduled_events = TimeIndex()
+        self.executed_events = TimeIndex()
+        self.scheduled_actions = TimeIndex()
+        # Queue entries of pending events, to cancel them
+        self._queue_entries: Dict[int, QueueEntry] = {}
+        self.quiet = quiet
+
+    def __getstate__(self) -> dict:
+        # Queue entries are keyed by id(), which doesn't survive copying
+        state = self.__dict__.copy()
+        state["_queue_entries"] = list(self._queue_entries.values())
+        return state
+
+    def __setstate__(self, state: dict):
+        entries = state.pop("_queue_entries", [])
+        self.__dict__.update(state)
+        self._queue_entries = {id(e.item): e for e in entries}
+
+    @property
+    def states(self) -> StateHistory:
+        return self.history
 
     @property
     def last_time(self) -> Optional[Time]:
-        try:
-            return next(reversed(self.states.keys()))
-        except StopIteration:
-            pass
+        return self.history.current_time
 
     @property
     def current_time(self) -> Time:
@@ -195,126 +563,549 @@ class Timeline:
 
     @property
     def current_state(self) -> State:
-        return self.states[self.current_time]
+        return self.history.current_state
 
     @property
     def events_to_come(self) -> List[Event]:
-        upcoming_events = []
-        for t, timeslot in self.events.items():
-            if t >= self.current_time:
-                upcoming_events.extend(timeslot.upcoming_events())
-        return upcoming_events
+        return self.planned_events.items()
 
     @property
     def actions_to_come(self) -> List[Action]:
-        upcoming_actions = []
-        for t, timeslot in self.actions.items():
-            if t >= self.current_time:
-                upcoming_actions.extend(timeslot.upcoming_events())
-        return upcoming_actions
-
-    def schedule_action(self, action: Action):
-        curr_time = self.current_time
-        logger.debug("Scheduling action {} at time {}".format(action, curr_time))
-        self.actions[curr_time] = self.actions.get(curr_time, Timeslot())
-        self.actions[curr_time].add(item=action)
+        return self.planned_actions.items()
+
+    def schedule_action(self, action: Action, time: Time = None) -> Handle:
+        time = self.current_time if time is None else time
+        if not self.quiet:
+            logger.debug("Scheduling action {} at time {}".format(action, time))
+        self.actions.at(time).add(item=action)
+        self.planned_actions.add(time=time, item=action)
+        self.scheduled_actions.add(time=time, item=action)
         for td, e in action.events:
-            self.schedule_event(event=e, time=curr_time + td)
+            self.schedule_event(event=e, time=time + td)
+        return Handle(self, action, time)
 
-    def schedule_event(self, event: Event, time: Time = None):
-        logger.debug("Scheduling event {} at time {}".format(event, time))
+    def schedule_event(self, event: Event, time: Time = None) -> Handle:
+        if not self.quiet:
+            logger.debug("Scheduling event {} at time {}".format(event, time))
         time = time or self.current_time
-        self.events[time] = self.events.get(time, Timeslot())
-        self.events[time].add(item=event)
-        # Sort by time
-        self.events = OrderedDict(sorted(self.events.items()))
+        self.events.at(time).add(item=event)
+        entry = self.pending.push(time=time, weight=event.weight, item=event)
+        self._queue_entries[id(event)] = entry
+        self.planned_events.add(time=time, item=event)
+        self.scheduled_events.add(time=time, item=event)
+        return Handle(self, event, time)
+
+    def cancel(self, item: Union[Event, Action]) -> bool:
+        """
+        Take a pending event off the timeline, or a planned action together
+        with its events that didn't run yet. Returns whether anything was
+        cancelled
+        """
+        if isinstance(item, Action):
+            return self._cancel_action(item)
+        entry = self._queue_entries.pop(id(item), None)
+        if entry is None or item.started:
+            return False
+        self.pending.cancel(entry)  # Removed from the queue lazily
+        self.planned_events.discard(item)
+        self.scheduled_events.discard(entry.time, item)
+        timeslot = self.events.get(entry.time)
+        if timeslot is not None:
+            timeslot.discard(item)
+        return True
 
-    def set_state(self, state: State, time: Time):
-        self.states[time] = state
+    def _cancel_action(self, action: Action) -> bool:
+        cancelled = False
+        for _, e in action.events:
+            cancelled = self.cancel(e) or cancelled
+        time = self.planned_actions.time_of(action)
+        if time is not None:
+            self.planned_actions.discard(action)
+            self.scheduled_actions.discard(time, action)
+            self.actions[time].discard(action)
+            cancelled = True
+        return cancelled
+
+    def reschedule(self, item: Union[Event, Action], time: Time) -> Handle:
+        """
+        Move a pending event to another time, or a planned action together
+        with its events. The events of an action keep their offset to it, so
+        none of them may have run yet
+        """
+        if time < self.current_time:
+            raise SimulationError("Can't move {} into the past".format(item))
+        if isinstance(item, Action):
+            if self.planned_actions.time_of(item) is None or any(
+                e.started for _, e in item.events
+            ):
+                raise SimulationError(
+                    "{} isn't planned or already started, so can't be moved".format(
+                        item
+                    )
+                )
+            self._cancel_action(item)
+            return self.schedule_action(action=item, time=time)
+        if not self.cancel(item):
+            raise SimulationError("{} isn't pending, so can't be moved".format(item))
+        return self.schedule_event(event=item, time=time)
+
+    def set_state(self, state: State, time: Time, event: Event = None):
+        self.history.record(time=time, state=state, event=event)
+        if event is not None:
+            self._queue_entries.pop(id(event), None)
+            self.planned_events.discard(event)
+            self.executed_events.add(time=time, item=event)
+        self.planned_events.expire(self.current_time)
+        self.planned_actions.expire(self.current_time)
+        retained_since = self.history.retained_since()
+        if retained_since is not None:
+            self.forget_before(retained_since)
+
+    def forget_before(self, time: Time):
+        """
+        Drop the events and actions from before the given time, when the
+        history doesn't keep the states of that time either
+        """
+        for timeslots in (self.events, self.actions):
+            timeslots.trim(time)
+        for index in (
+            self.scheduled_events,
+            self.executed_events,
+            self.scheduled_actions,
+        ):
+            index.trim(time)
+
+    def state_at(self, time: Time) -> State:
+        return self.history.state_at(time)
 
     def get_first_upcoming_event(
         self, time: Time = None
     ) -> Optional[Tuple[Time, Event]]:
         time = time or self.current_time
-        for t, timeslot in self.events.items():
-            if t >= time and (e := timeslot.next_event()):
-                return t, e
+        current_time = self.current_time
+        while (entry := self.pending.peek()) is not None:
+            if entry.item.started or entry.time < current_time:
+                # Executed or skipped events are dropped lazily
+                self.pending.pop()
+                if self._queue_entries.get(id(entry.item)) is entry:
+                    del self._queue_entries[id(entry.item)]
+            elif entry.time >= time:
+                return entry.time, entry.item
+            else:
+                for entry in self.pending.ordered():
+                    if entry.time >= time and not entry.item.started:
+                        return entry.time, entry.item
+                break
         logger.debug("There are no upcoming events")
 
-    def last_event_occurrence(self, event_type) -> Optional[Tuple[Time, Event]]:
-        for t, timeslot in sorted(self.events.items(), reverse=True):
-            for e in timeslot.to_list():
-                if isinstance(e, event_type):
-                    return t, e
+    def share_past(self):
+        """
+        Freeze what never changes again, so copies of the timeline share it
+        instead of copying it: the states and events before now, and the
+        actions before the first one with events from now on
+        """
+        now = self.current_time
+        until = now
+        for time, action in self.scheduled_actions.between(self._shared_until, now):
+            if any(time + td >= now for td, _ in action.events):
+                until = time
+                break
+        for past in (
+            self.history,
+            self.events,
+            self.scheduled_events,
+            self.executed_events,
+        ):
+            past.share_before(now)
+        for past in (self.actions, self.scheduled_actions):
+            past.share_before(until)
+        self._shared_until = until
+
+    def _event_index(self, executed: bool) -> TimeIndex:
+        return self.executed_events if executed else self.scheduled_events
+
+    def last_event_occurrence(
+        self, event_type: type = Event, executed: bool = False
+    ) -> Optional[Tuple[Time, Event]]:
+        """
+        Latest scheduled event of the type, or latest executed one. The one
+        with the highest weight if there are more at that time
+        """
+        return self._event_index(executed).last(of_type=event_type)
+
+    def events_between(
+        self, start: Time, end: Time, of_type: type = Event, executed: bool = False
+    ) -> List[Tuple[Time, Event]]:
+        """
+        Events from start up to and including end, in the order they run
+        """
+        return self._event_index(executed).between(start, end, of_type=of_type)
+
+    def count_since(
+        self, time: Time, of_type: type = Event, executed: bool = False
+    ) -> int:
+        return self._event_index(executed).count_since(time, of_type=of_type)
+
+    def last_action_occurrence(
+        self, action_type: type = Action
+    ) -> Optional[Tuple[Time, Action]]:
+        return self.scheduled_actions.last(of_type=action_type)
+
+    def actions_between(
+        self, start: Time, end: Time, of_type: type = Action
+    ) -> List[Tuple[Time, Action]]:
+        return self.scheduled_actions.between(start, end, of_type=of_type)
+
+    def action_count_since(self, time: Time, of_type: type = Action) -> int:
+        return self.scheduled_actions.count_since(time, of_type=of_type)
 
     def action_already_planned(self, action) -> bool:
-        return any([e for e in self.actions_to_come if isinstance(e, action.__class__)])
+        return self.planned_actions.contains(action.__class__)
+
+    def planned_action_count(self, action_type: type, time: Time = None) -> int:
+        return self.planned_actions.count(of_type=action_type, time=time)
+
+    def events_to_come_of(self, event_type: type) -> List[Event]:
+        return self.planned_events.items(of_type=event_type)
+
+
+_weight_of = attrgetter("weight")
 
 
 class DiscreteSimulation:
-    available_actions = None
+    """
+    Runs the actions and their events in time order up to `max_duration`.
+
+    Checkpoints every `checkpoint_every` events to `checkpoint_path` need a
+    bounded history, so a `history_factory` like
+    `partial(CheckpointHistory, retention="final")`. The default FullHistory,
+    like an unbounded CheckpointHistory, is refused with a ValueError
+    """
+
+    _available_actions: List[Action] = None
+    _actions_by_weight: List[Action] = None
+    _sorted_actions: List[Action] = None  # What the actions by weight were sorted from
+    _sorted_weights: List[Weight] = None
+    _triggers: ActionTriggers = None
     timeline: Timeline = None
     max_duration: Time = None
+    queue_factory: Callable[[], EventQueue] = None
+    state_factory: Callable[..., State] = None
+    history_factory: Callable[[], StateHistory] = None
+    checkpoint_every: Optional[int] = None
+    checkpoint_path: Optional[str] = None
+    observers: List[Observer] = None
+    quiet: bool = False
+    progress_every: Optional[int] = None
+    recorder: Optional[Recorder] = None
+    stop_conditions: List[StopCondition] = None
+    stop_reason: Optional[str] = None  # Why the last run stopped
+    warmup_cutoff: Optional[Time] = None  # End of the warm-up, if detected
+    streams: Optional["RandomStreams"] = None
+    # Progress of the current run
+    _executed: int = 0
+    _started: float = 0.0
+    _last_report: float = 0.0
 
     def __init__(
         self,
         max_duration: Time,
         available_actions: List[Action],
         initial_values: Optional[dict] = None,
+        queue_factory: Callable[[], EventQueue] = HeapEventQueue,
+        state_factory: Callable[..., State] = State,
+        history_factory: Callable[[], StateHistory] = FullHistory,
+        checkpoint_every: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        observers: Optional[List[Observer]] = None,
+        quiet: bool = False,
+        progress_every: Optional[int] = None,
+        record: Optional[Union[Iterable, Dict[object, str]]] = None,
+        stop_when: Optional[List[StopCondition]] = None,
+        streams: Optional["RandomStreams"] = None,
     ):
+        if checkpoint_every and not checkpoint_path:
+            raise ValueError("Automatic checkpoints need a checkpoint_path")
         self.max_duration = max_duration
         self.available_actions = available_actions
+        self.queue_factory = queue_factory
+        self.state_factory = state_factory
+        self.history_factory = history_factory
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+        self.observers = list(observers or [])
+        self.quiet = quiet
+        self.progress_every = progress_every
+        self.stop_conditions = list(stop_when or [])
+        self.streams = streams
+        if record:
+            self.recorder = self.add_observer(Recorder(record))
         self.reset(initial_values)
+        if checkpoint_every and not self.timeline.history.bounded:
+            # Every checkpoint writes the whole history, which would make
+            # them slower and slower
+            raise ValueError(
+                "checkpoint_every needs a bounded history, so a "
+                "CheckpointHistory with retention 'last' or 'final' as "
+                "history_factory, not {}".format(type(self.timeline.history).__name__)
+            )
+
+    @property
+    def available_actions(self) -> List[Action]:
+        return self._available_actions
+
+    @available_actions.setter
+    def available_actions(self, actions: List[Action]):
+        self._available_actions = actions
+        self._actions_by_weight = None
+
+    @property
+    def actions_by_weight(self) -> List[Action]:
+        # Sorted again when the actions are replaced, changed in place or get
+        # another weight. Comparing by identity and weight is cheap next to
+        # sorting and rebuilding the triggers on every step
+        actions = self._available_actions
+        if (
+            self._actions_by_weight is None
+            or actions != self._sorted_actions
+            or list(map(_weight_of, actions)) != self._sorted_weights
+        ):
+            self._sorted_actions = list(actions)
+            self._sorted_weights = list(map(_weight_of, actions))
+            self._actions_by_weight = sorted(actions, reverse=True, key=_weight_of)
+        return self._actions_by_weight
+
+    @property
+    def triggers(self) -> ActionTriggers:
+        actions = self.actions_by_weight
+        if self._triggers is None or self._triggers.actions is not actions:
+            self._triggers = ActionTriggers(actions)
+        return self._triggers
+
+    def add_observer(self, observer: Observer) -> Observer:
+        self.observers.append(observer)
+        return observer
+
+    def remove_observer(self, observer: Observer):
+        self.observers.remove(observer)
 
     def reset(self, initial_values: Optional[dict] = None):
         logger.debug("Prepping simulation to run")
-        self.timeline = Timeline(initial_values=initial_values)
+        self._triggers = None
+        self.timeline = Timeline(
+            initial_values=initial_values,
+            queue=self.queue_factory(),
+            state_factory=self.state_factory,
+            history=self.history_factory(),
+            quiet=self.quiet,
+        )
+        self.timeline.current_state.streams = self.streams
 
     def run(self) -> State:
+        for _ in self.iter_run():
+            pass
+        return self.timeline.current_state
+
+    def iter_run(self) -> Iterator[Step]:
+        """
+        Run the simulation, yielding every executed event as it happens. In
+        quiet mode nothing is logged or formatted per event, only progress
+        every `progress_every` events
+        """
+        self._begin_run()
+        try:
+            while self._running():
+                self._schedule_available_actions()
+                event_occurrence = self._next_event()
+                if event_occurrence is None:
+                    break
+                new_time, event = event_occurrence
+                self._before_execute(new_time, event)
+                new_state = self.timeline.current_state.apply(event)
+                yield self._record(new_time, event, new_state)
+        finally:
+            self._end_run()
+
+    def _begin_run(self):
         logger.info("Starting simulation with duration {}".format(self.max_duration))
-        while self.timeline.current_time < self.max_duration:
-            # Schedule actions until no more available
-            for action in self.get_available_actions():
-                self.timeline.schedule_action(action=action)
-
-            # Run next event
-            if not (event_occurrence := self.timeline.get_first_upcoming_event()):
-                # TODO: What to do if there is no action or event? Find next time available action?
-                logger.warning(
-                    "No events or actions available. Stopping simulation at {} time".format(
-                        self.timeline.current_time
-                    )
+        self._executed = 0
+        self.stop_reason = None
+        self.warmup_cutoff = None
+        self._started = self._last_report = perf_counter()
+        for condition in self.stop_conditions:
+            condition.before_run(self)
+        for o in self.observers:
+            o.before_run(self)
+
+    def _end_run(self):
+        for o in self.observers:
+            o.after_run(self)
+
+    def _running(self) -> bool:
+        if self.stop_reason is not None:
+            return False
+        if self.timeline.current_time >= self.max_duration:
+            self.stop_reason = STOP_MAX_DURATION
+            return False
+        return True
+
+    def _schedule_available_actions(self):
+        """
+        Schedule actions until no more available
+        """
+        observers = self.observers
+        for action in self.get_available_actions():
+            if observers:
+                for o in observers:
+                    o.before_schedule(self, action)
+            self.timeline.schedule_action(action=action)
+            if observers:
+                for o in observers:
+                    o.after_schedule(self, action)
+
+    def _next_event(self) -> Optional[Tuple[Time, Event]]:
+        """
+        Time and event to execute next, or None when the simulation is over
+        """
+        observers = self.observers
+        if observers:
+            for o in observers:
+                o.before_select(self)
+        event_occurrence = self.timeline.get_first_upcoming_event()
+        if observers:
+            for o in observers:
+                o.after_select(self, *(event_occurrence or (None, None)))
+        if not event_occurrence:
+            # TODO: What to do if there is no action or event? Find next time available action?
+            logger.warning(
+                "No events or actions available. Stopping simulation at {} time".format(
+                    self.timeline.current_time
                 )
-                break
-            new_time = event_occurrence[0]
-            event = event_occurrence[1]
-            if new_time > self.max_duration:
+            )
+            self.stop_reason = STOP_NO_EVENTS
+            return None
+        if event_occurrence[0] > self.max_duration:
+            logger.info(
+                "Next event {} starts after max duration. Stopping simulation".format(
+                    event_occurrence[1]
+                )
+            )
+            self.stop_reason = STOP_MAX_DURATION
+            return None
+        return event_occurrence
+
+    def _before_execute(self, time: Time, event: Event):
+        if not self.quiet:
+            logger.debug("Executing event {} at time {}".format(event, time))
+        if self.observers:
+            for o in self.observers:
+                o.before_execute(self, time, event)
+
+    def _record(self, time: Time, event: Event, new_state: State) -> Step:
+        """
+        Apply the state an event produced, then log, report progress and
+        checkpoint as configured
+        """
+        self.timeline.set_state(state=new_state, time=time, event=event)
+        if self.observers:
+            for o in self.observers:
+                o.after_execute(self, time, event, new_state)
+        self.triggers.mark(event=event, changes=new_state.changes)
+        for condition in self.stop_conditions:
+            if condition.update(self, time, event, new_state):
+                self.stop_reason = condition.reason
                 logger.info(
-                    "Next event {} starts after max duration. Stopping simulation".format(
-                        event
-                    )
+                    "Stopping simulation at time {}: {}".format(time, condition.reason)
                 )
                 break
-            logger.debug("Executing event {} at time {}".format(event, new_time))
-            new_state = deepcopy(event(state=self.timeline.current_state))
-
-            # Apply new state
-            self.timeline.set_state(state=new_state, time=new_time)
+        if not self.quiet:
             logger.info(
                 "Time: {}   -   State: {}".format(
                     self.timeline.current_time, new_state.values
                 )
             )
+        self._executed += 1
+        executed = self._executed
+        progress_every = self.progress_every
+        if progress_every and executed % progress_every == 0:
+            now = perf_counter()
+            logger.info(
+                "Executed {} events, at time {}, {:.0f} events/s ({:.0f} overall)".format(
+                    executed,
+                    time,
+                    progress_every / (now - self._last_report),
+                    executed / (now - self._started),
+                )
+            )
+            self._last_report = now
+        if self.checkpoint_every and executed % self.checkpoint_every == 0:
+            self.checkpoint(self.checkpoint_path)
+        return Step(time=time, event=event, changes=new_state.changes)
 
-        return self.timeline.current_state
+    def checkpoint(self, path: str):
+        """
+        Write the simulation and the random state to disk, so it can be resumed
+        with `restore`. Hooks and actions have to be picklable, so no lambdas.
+        Every checkpoint writes the whole simulation, which is why automatic
+        checkpoints every `checkpoint_every` events need a bounded history
+        """
+        logger.debug(
+            "Writing checkpoint at time {} to {}".format(
+                self.timeline.current_time, path
+            )
+        )
+        write_checkpoint(self, path)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_next_id"] = getattr(BaseSimObject.id_factory, "next_id", None)
+        return state
+
+    def __setstate__(self, state: dict):
+        # Objects created after restoring mustn't reuse the restored ids
+        next_id = state.pop("_next_id", None)
+        if next_id is not None and isinstance(BaseSimObject.id_factory, IdCounter):
+            BaseSimObject.id_factory.skip_past(next_id - 1)
+        self.__dict__.update(state)
+
+    def fork(self) -> "DiscreteSimulation":
+        """
+        Independent copy that continues from the current time, for example
+        with other actions or values. The past never changes, so it is frozen
+        and shared with this simulation instead of copied, and a fork only
+        copies what happened since the last fork and what is still to come.
+        The fork gets its own copy of the random streams
+        """
+        self.timeline.share_past()
+        memo = {}
+        if self.streams is not None:
+            memo[id(self.streams)] = self.streams.copy()
+        return deepcopy(self, memo)
+
+    @classmethod
+    def restore(cls, path: str) -> "DiscreteSimulation":
+        sim = read_checkpoint(path)
+        if not isinstance(sim, cls):
+            raise TypeError("{} doesn't contain a {}".format(path, cls.__name__))
+        return sim
 
     def get_available_actions(self) -> List[Action]:
-        return deepcopy(
-            [
-                aa
-                for aa in sorted(
-                    self.available_actions, reverse=True, key=lambda a: a.weight
-                )
-                if aa.ready_to_start(timeline=self.timeline)
-            ]
-        )
+        if self.observers:
+            return self._observed_available_actions()
+        return [
+            aa.instantiate()
+            for aa in self.triggers.due()
+            if aa.ready_to_start(timeline=self.timeline)
+        ]
+
+    def _observed_available_actions(self) -> List[Action]:
+        available = []
+        for aa in self.triggers.due():
+            for o in self.observers:
+                o.before_check(self, aa)
+            ready = aa.ready_to_start(timeline=self.timeline)
+            for o in self.observers:
+                o.after_check(self, aa, ready)
+            if ready:
+                available.append(aa.instantiate())
+        return available
@@ -0,0 +1,406 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping
+from copy import copy, deepcopy
+from itertools import chain
+from typing import Iterator, List, NamedTuple, Optional
+
+from simulation.indexes import SharedPast
+from simulation.types import Time
+
+RETENTION_ALL = "all"
+RETENTION_LAST = "last"
+RETENTION_CHECKPOINTS = "checkpoints"
+RETENTION_FINAL = "final"
+
+
+class StateHistory(Mapping):
+    """
+    States a Timeline went through, by time. The current state and time are
+    always available in O(1)
+    """
+
+    current_time: Time = None
+    current_state: "State" = None
+
+    def record(self, time: Time, state: "State", event: "Event" = None):
+        self.current_time = time
+        self.current_state = state
+
+    def state_at(self, time: Time) -> "State":
+        raise NotImplementedError
+
+    def share_before(self, time: Time):
+        """
+        Freeze the records from before the given time, so copies share them
+        instead of copying them. Histories that can't do that ignore it
+        """
+
+    def _frozen_copy(self) -> "StateHistory":
+        past = copy(self)
+        past.current_time = past.current_state = None
+        return past
+
+    def retained_since(self) -> Optional[Time]:
+        """
+        Earliest time the Timeline has to keep its events and actions for, or
+        None to keep all of them
+        """
+        return None
+
+    @property
+    def bounded(self) -> bool:
+        """
+        Whether the history stays the same size however long the run
+        """
+        return False
+
+    def __getitem__(self, time: Time) -> "State":
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[Time]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class FullHistory(SharedPast, StateHistory):
+    """
+    Keeps the state of every point in time
+    """
+
+    states: OrderedDict = None  # States since the shared past
+
+    def __init__(self):
+        self.states = OrderedDict()
+        self._times: List[Time] = []
+
+    def record(self, time: Time, state: "State", event: "Event" = None):
+        if time not in self.states:
+            self._times.append(time)
+        self.states[time] = state
+        super(FullHistory, self).record(time=time, state=state, event=event)
+
+    def state_at(self, time: Time) -> "State":
+        index = bisect_right(self._times, time)
+        if not index:
+            if self._past is not None:
+                return self._past.state_at(time)
+            raise KeyError(time)
+        return self.states[self._times[index - 1]]
+
+    def _split(self, time: Time) -> "FullHistory":
+        index = bisect_left(self._times, time)
+        past = self._frozen_copy()
+        past._times = self._times[:index]
+        past.states = OrderedDict((t, self.states.pop(t)) for t in past._times)
+        del self._times[:index]
+        return past
+
+    def _joined(self, newer: "FullHistory") -> "FullHistory":
+        past = copy(newer)
+        past._past, past._since = self._past, self._since
+        past._times = self._times + newer._times
+        past.states = OrderedDict(chain(self.states.items(), newer.states.items()))
+        return past
+
+    def _size(self) -> int:
+        return len(self._times)
+
+    def __getitem__(self, time: Time) -> "State":
+        try:
+            return self.states[time]
+        except KeyError:
+            if self._past is None:
+                raise
+        return self._past[time]
+
+    def __iter__(self) -> Iterator[Time]:
+        if self._past is None:
+            return iter(self.states)
+        return chain(self._past, self.states)
+
+    def __len__(self) -> int:
+        past = len(self._past) if self._past is not None else 0
+        return past + len(self.states)
+
+
+class LogEntry(NamedTuple):
+    time: Time
+    event: "Event"
+    changes: dict
+
+
+class Checkpoint(NamedTuple):
+    count: int  # Number of events executed before the checkpoint
+    time: Time
+    state: "State"
+
+
+class CheckpointHistory(SharedPast, StateHistory):
+    """
+    Keeps a log of executed events with the values they set, plus a full copy
+    of the state every `every` events or `interval` time units. States in
+    between are rebuilt by replaying the log from the nearest checkpoint.
+
+    Retention decides what is kept around:
+    - "all": the full log and every checkpoint
+    - "last": the last `keep` events and the checkpoints needed to rebuild them
+    - "checkpoints": only the checkpoints, so states are only known as of the
+      nearest checkpoint before them
+    - "final": only the current state
+    The Timeline drops its events and actions from before what is kept as
+    well, so queries like `events_between` don't go back further than that.
+    Forks share the log and checkpoints of the past with retention "all" and
+    "checkpoints", the others keep little enough to copy.
+
+    Replay only repeats the values events set through `set`. Anything else
+    that changes a state, like `complete_event` or changing a value in
+    place, only shows in rebuilt states as of the checkpoint they start from
+    """
+
+    def __init__(
+        self,
+        every: Optional[int] = 1000,
+        interval: Optional[Time] = None,
+        retention: str = RETENTION_ALL,
+        keep: Optional[int] = None,
+        cache_size: int = 16,
+    ):
+        if retention not in (
+            RETENTION_ALL,
+            RETENTION_LAST,
+            RETENTION_CHECKPOINTS,
+            RETENTION_FINAL,
+        ):
+            raise ValueError("Unknown retention {}".format(retention))
+        if retention == RETENTION_LAST and not keep:
+            raise ValueError("Retention 'last' needs the number of events to keep")
+        self.every = every
+        self.interval = interval
+        self.retention = retention
+        self.keep = keep
+        self.cache_size = cache_size
+        self.count = 0
+        self._log: List[LogEntry] = []
+        self._log_times: List[Time] = []
+        self._log_start = 0  # Event count of the first entry in the log
+        self._checkpoints: List[Checkpoint] = []
+        self._checkpoint_times: List[Time] = []
+        self._cache: OrderedDict = OrderedDict()
+
+    def record(self, time: Time, state: "State", event: "Event" = None):
+        if event is not None:
+            self.count += 1
+            if self.retention in (RETENTION_ALL, RETENTION_LAST):
+                self._log.append(LogEntry(time, event, dict(state.changes)))
+                self._log_times.append(time)
+        if self._checkpoint_due(time):
+            self._checkpoints.append(Checkpoint(self.count, time, deepcopy(state)))
+            self._checkpoint_times.append(time)
+        super(CheckpointHistory, self).record(time=time, state=state, event=event)
+        if self.retention == RETENTION_LAST:
+            self._trim()
+
+    def _checkpoint_due(self, time: Time) -> bool:
+        if self.retention == RETENTION_FINAL:
+            return False
+        last = self._last_checkpoint()
+        if last is None:
+            return True
+        if self.every and self.count - last.count >= self.every:
+            return True
+        return bool(self.interval and time - last.time >= self.interval)
+
+    def _trim(self):
+        # Trim in chunks, so the log isn't shifted on every event
+        if len(self._log) < 2 * self.keep:
+            return
+        first_kept = self.count - self.keep
+        counts = [c.count for c in self._checkpoints]
+        index = bisect_right(counts, first_kept) - 1
+        if index <= 0:
+            return
+        start = self._checkpoints[index].count
+        del self._checkpoints[:index]
+        del self._checkpoint_times[:index]
+        del self._log[: start - self._log_start]
+        del self._log_times[: start - self._log_start]
+        self._log_start = start
+
+    def retained_since(self) -> Optional[Time]:
+        if self.retention == RETENTION_ALL:
+            return None
+        if self.retention == RETENTION_LAST and self._log_times:
+            return self._log_times[0]
+        return self.current_time
+
+    @property
+    def bounded(self) -> bool:
+        return self.retention in (RETENTION_LAST, RETENTION_FINAL)
+
+    def share_before(self, time: Time):
+        if self.retention in (RETENTION_ALL, RETENTION_CHECKPOINTS):
+            super(CheckpointHistory, self).share_before(time)
+
+    def _split(self, time: Time) -> "CheckpointHistory":
+        past = self._frozen_copy()
+        past._cache = OrderedDict()
+        index = bisect_left(self._log_times, time)
+        past._log, past._log_times = self._log[:index], self._log_times[:index]
+        del self._log[:index]
+        del self._log_times[:index]
+        self._log_start += index
+        index = bisect_left(self._checkpoint_times, time)
+        past._checkpoints = self._checkpoints[:index]
+        past._checkpoint_times = self._checkpoint_times[:index]
+        del self._checkpoints[:index]
+        del self._checkpoint_times[:index]
+        return past
+
+    def _joined(self, newer: "CheckpointHistory") -> "CheckpointHistory":
+        past = copy(newer)
+        past._past, past._since = self._past, self._since
+        past._log_start = self._log_start
+        past._log = self._log + newer._log
+        past._log_times = self._log_times + newer._log_times
+        past._checkpoints = self._checkpoints + newer._checkpoints
+        past._checkpoint_times = self._checkpoint_times + newer._checkpoint_times
+        return past
+
+    def _size(self) -> int:
+        return len(self._log) + len(self._checkpoints)
+
+    @property
+    def checkpoints(self) -> List[Checkpoint]:
+        past = self._past.checkpoints if self._past is not None else []
+        return past + self._checkpoints
+
+    @property
+    def log(self) -> List[LogEntry]:
+        past = self._past.log if self._past is not None else []
+        return past + self._log
+
+    def _last_checkpoint(self) -> Optional[Checkpoint]:
+        if self._checkpoints:
+            return self._checkpoints[-1]
+        if self._past is not None:
+            return self._past._last_checkpoint()
+
+    def _checkpoint_before(self, count: int) -> Optional[Checkpoint]:
+        """
+        Latest checkpoint after at most the given number of events
+        """
+        index = bisect_right([c.count for c in self._checkpoints], count) - 1
+        if index >= 0:
+            return self._checkpoints[index]
+        if self._past is not None:
+            return self._past._checkpoint_before(count)
+
+    def _logged_since(self) -> int:
+        """
+        Event count of the first entry in the log, including the shared past
+        """
+        if self._past is not None:
+            return self._past._logged_since()
+        return self._log_start
+
+    def _entries(self, start: int, end: int) -> List[LogEntry]:
+        """
+        Log entries of the events from start up to end, by event count
+        """
+        entries = []
+        if start < self._log_start and self._past is not None:
+            entries = self._past._entries(start, min(end, self._log_start))
+        if end > self._log_start:
+            entries.extend(
+                self._log[max(start - self._log_start, 0) : end - self._log_start]
+            )
+        return entries
+
+    def _count_at(self, time: Time) -> int:
+        """
+        Number of events executed up to and including the given time
+        """
+        index = bisect_right(self._log_times, time)
+        if index:
+            return self._log_start + index
+        for checkpoint in reversed(self._checkpoints):
+            if checkpoint.time <= time and (
+                checkpoint.count <= self._log_start
+                or self.retention == RETENTION_CHECKPOINTS
+            ):
+                return checkpoint.count
+        if self._past is not None:
+            return self._past._count_at(time)
+        raise KeyError(time)
+
+    def state_at(self, time: Time) -> "State":
+        if time >= self.current_time:
+            return self.current_state
+        count = self._count_at(time)
+        if count == self.count:
+            return self.current_state
+        try:
+            self._cache.move_to_end(count)
+            return self._cache[count]
+        except KeyError:
+            pass
+        state = self._rebuild(count, time)
+        self._cache[count] = state
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return state
+
+    def _rebuild(self, count: int, time: Time) -> "State":
+        checkpoint = self._checkpoint_before(count)
+        if checkpoint is None:
+            raise KeyError(time)
+        if checkpoint.count == count:
+            return checkpoint.state
+        if checkpoint.count < self._logged_since() or count > self._log_start + len(
+            self._log
+        ):
+            raise KeyError(time)
+        state = deepcopy(checkpoint.state)
+        entries = self._entries(checkpoint.count, count)
+        for entry in entries:
+            for key, value in entry.changes.items():
+                state.set(key, value)
+        state.changes = dict(entries[-1].changes)
+        return state
+
+    def _recorded_times(self) -> List[Time]:
+        times = self._past._recorded_times() if self._past is not None else []
+        times.extend(self._checkpoint_times)
+        times.extend(self._log_times)
+        return times
+
+    def _times(self) -> Iterator[Time]:
+        if self.retention == RETENTION_FINAL:
+            return iter([self.current_time])
+        times = self._recorded_times()
+        times.append(self.current_time)
+        return iter(sorted(set(times)))
+
+    def _recorded(self, time: Time) -> bool:
+        """
+        Whether a state was recorded at exactly the given time, without the
+        current one
+        """
+        for times in (self._log_times, self._checkpoint_times):
+            index = bisect_left(times, time)
+            if index < len(times) and times[index] == time:
+                return True
+        return self._past is not None and self._past._recorded(time)
+
+    def __getitem__(self, time: Time) -> "State":
+        if time != self.current_time and (
+            self.retention == RETENTION_FINAL or not self._recorded(time)
+        ):
+            raise KeyError(time)
+        return self.state_at(time)
+
+    def __iter__(self) -> Iterator[Time]:
+        return self._times()
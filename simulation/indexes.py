@@ -0,0 +1,376 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from copy import copy, deepcopy
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from simulation.types import Time, Weight
+
+
+class PendingIndex:
+    """
+    Scheduled objects that are still to come, by class and by time. Objects
+    are indexed under every class in their MRO, so lookups match `isinstance`
+    """
+
+    def __init__(self):
+        self._seq = 0
+        self._now = None
+        self._entries: Dict[int, Tuple[Time, int, object]] = {}
+        self._by_class: Dict[type, Dict[int, object]] = defaultdict(dict)
+        self._by_time: Dict[Time, Dict[int, object]] = {}
+        self._counts: Dict[Time, Counter] = {}
+        self._times: List[Time] = []
+
+    def add(self, time: Time, item):
+        if self._now is not None and time < self._now:
+            return  # Already in the past, so it will never happen
+        key = id(item)
+        self._entries[key] = (time, self._seq, item)
+        self._seq += 1
+        for cls in type(item).__mro__:
+            self._by_class[cls][key] = item
+        if time not in self._by_time:
+            self._by_time[time] = {}
+            self._counts[time] = Counter()
+            heapq.heappush(self._times, time)
+        self._by_time[time][key] = item
+        self._counts[time].update(type(item).__mro__)
+
+    def discard(self, item):
+        try:
+            time, _, _ = self._entries.pop(id(item))
+        except KeyError:
+            return
+        self._remove(id(item), item)
+        del self._by_time[time][id(item)]
+        self._counts[time].subtract(type(item).__mro__)
+
+    def _remove(self, key: int, item):
+        for cls in type(item).__mro__:
+            del self._by_class[cls][key]
+
+    def expire(self, now: Time):
+        """
+        Drop everything scheduled before the given time
+        """
+        self._now = now
+        while self._times and self._times[0] < now:
+            time = heapq.heappop(self._times)
+            for key, item in self._by_time.pop(time).items():
+                del self._entries[key]
+                self._remove(key, item)
+            del self._counts[time]
+
+    def items(self, of_type: type = object) -> List:
+        entries = [self._entries[key] for key in self._by_class.get(of_type, ())]
+        entries.sort(key=lambda e: (e[0], -e[2].weight, e[1]))
+        return [item for _, _, item in entries if not item.started]
+
+    def time_of(self, item) -> Optional[Time]:
+        entry = self._entries.get(id(item))
+        if entry is not None:
+            return entry[0]
+
+    def contains(self, of_type: type) -> bool:
+        return any(not i.started for i in self._by_class.get(of_type, {}).values())
+
+    def count(self, of_type: type = object, time: Optional[Time] = None) -> int:
+        if time is None:
+            return len(self._by_class.get(of_type, ()))
+        try:
+            return self._counts[time][of_type]
+        except KeyError:
+            return 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> dict:
+        # Items are keyed by their id(), which doesn't survive copying
+        entries = sorted(self._entries.values(), key=lambda e: e[1])
+        return {"now": self._now, "entries": [(t, i) for t, _, i in entries]}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+        for time, item in state["entries"]:
+            self.add(time=time, item=item)
+        self._now = state["now"]
+
+
+class SharedPast:
+    """
+    Keeps the entries that never change again in frozen parts, which copies
+    share instead of copying them. Every frozen part holds the entries
+    before a time and points to the part before it. A part is merged with
+    the one before it as long as that one isn't larger, so there are
+    O(log n) parts and every entry is merged O(log n) times
+    """
+
+    _past: Optional["SharedPast"] = None  # Frozen part before `_since`
+    _since: Time = -float("inf")
+
+    def share_before(self, time: Time):
+        """
+        Freeze the entries before the given time, they must never change again
+        """
+        if time <= self._since:
+            return
+        past = self._split(time)
+        self._since = time
+        if not past._size():
+            return
+        while past._past is not None and past._past._size() <= past._size():
+            past = past._past._joined(past)
+        self._past = past
+
+    def _split(self, time: Time) -> "SharedPast":
+        """
+        Move the entries before the time to a copy with the current past
+        """
+        raise NotImplementedError
+
+    def _joined(self, newer: "SharedPast") -> "SharedPast":
+        """
+        Copy with the entries of this part followed by those of a newer one
+        """
+        raise NotImplementedError
+
+    def _size(self) -> int:
+        """
+        Number of entries outside of the past
+        """
+        raise NotImplementedError
+
+    def _drop_past(self, before: Time):
+        if self._past is not None and before >= self._since:
+            self._past = None
+
+    def __deepcopy__(self, memo: dict) -> "SharedPast":
+        # The past never changes, so copies share it
+        other = self.__class__.__new__(self.__class__)
+        memo[id(self)] = other
+        for name, value in self.__dict__.items():
+            other.__dict__[name] = value if name == "_past" else deepcopy(value, memo)
+        return other
+
+
+Key = Tuple[Time, Weight, int]
+
+
+class TimeIndex(SharedPast):
+    """
+    Every object ever added, sorted by time, weight and insertion order, per
+    class. Objects are only stored under their own class, queries for a class
+    also cover its subclasses. Range queries take O(c log n + k log c) for c
+    matching classes.
+
+    Discarded objects are skipped until they make up half of their class,
+    then they are dropped in one go, so discarding takes O(log n) amortized
+    """
+
+    def __init__(self):
+        self._seq = 0
+        self._keys: Dict[type, List[Key]] = {}
+        self._items: Dict[type, List[object]] = {}
+        self._matches: Dict[type, List[type]] = {}  # Indexed subclasses by type
+        # Discarded objects by (id, time), and their times in order, per class
+        self._discarded: Dict[type, Set[Tuple[int, Time]]] = {}
+        self._discarded_times: Dict[type, List[Time]] = {}
+
+    def add(self, time: Time, item):
+        key = (time, -item.weight, self._seq)
+        self._seq += 1
+        cls = type(item)
+        try:
+            keys = self._keys[cls]
+            items = self._items[cls]
+        except KeyError:
+            keys = self._keys[cls] = []
+            items = self._items[cls] = []
+            self._matches.clear()
+        if (id(item), time) in self._discarded.get(cls, ()):
+            self._compact(cls)  # Added again, so the old entry has to go first
+        if not keys or keys[-1] < key:
+            keys.append(key)  # Mostly added in time order
+            items.append(item)
+        else:
+            index = bisect_right(keys, key)
+            keys.insert(index, key)
+            items.insert(index, item)
+
+    def __getstate__(self) -> dict:
+        # Discarded objects are tracked by id(), which doesn't survive copying
+        for cls in list(self._discarded):
+            self._compact(cls)
+        state = self.__dict__.copy()
+        state["_matches"] = {}
+        return state
+
+    def __deepcopy__(self, memo: dict) -> "TimeIndex":
+        # The keys are immutable and the past is shared, so only the items
+        # need copying
+        state = self.__getstate__()
+        index = self.__class__.__new__(self.__class__)
+        memo[id(self)] = index
+        index.__dict__.update(state)
+        index._discarded, index._discarded_times = {}, {}
+        index._keys = {cls: list(keys) for cls, keys in self._keys.items()}
+        index._items = {
+            cls: [deepcopy(item, memo) for item in items]
+            for cls, items in self._items.items()
+        }
+        return index
+
+    def _split(self, time: Time) -> "TimeIndex":
+        for cls in list(self._discarded):
+            self._compact(cls)
+        past = copy(self)
+        past._keys, past._items, past._matches = {}, {}, {}
+        past._discarded, past._discarded_times = {}, {}
+        for cls, keys in self._keys.items():
+            index = bisect_left(keys, (time,))
+            if index:
+                past._keys[cls] = keys[:index]
+                past._items[cls] = self._items[cls][:index]
+                del keys[:index]
+                del self._items[cls][:index]
+        return past
+
+    def _joined(self, newer: "TimeIndex") -> "TimeIndex":
+        past = copy(newer)
+        past._past, past._since, past._matches = self._past, self._since, {}
+        past._keys = {cls: list(keys) for cls, keys in self._keys.items()}
+        past._items = {cls: list(items) for cls, items in self._items.items()}
+        for cls, keys in newer._keys.items():
+            past._keys.setdefault(cls, []).extend(keys)
+            past._items.setdefault(cls, []).extend(newer._items[cls])
+        return past
+
+    def _size(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+    def _classes(self, of_type: type) -> List[type]:
+        try:
+            return self._matches[of_type]
+        except KeyError:
+            pass
+        classes = self._matches[of_type] = [
+            cls for cls in self._keys if issubclass(cls, of_type)
+        ]
+        return classes
+
+    def _is_discarded(self, cls: type, key: Key, item) -> bool:
+        discarded = self._discarded.get(cls)
+        return bool(discarded) and (id(item), key[0]) in discarded
+
+    def discard(self, time: Time, item):
+        cls = type(item)
+        discarded = self._discarded.setdefault(cls, set())
+        if (id(item), time) in discarded:
+            return
+        discarded.add((id(item), time))
+        insort(self._discarded_times.setdefault(cls, []), time)
+        if len(discarded) * 2 > len(self._keys.get(cls, ())):
+            self._compact(cls)
+
+    def _compact(self, cls: type):
+        discarded = self._discarded.pop(cls, None)
+        self._discarded_times.pop(cls, None)
+        if not discarded:
+            return
+        entries = [
+            (key, item)
+            for key, item in zip(self._keys[cls], self._items[cls])
+            if (id(item), key[0]) not in discarded
+        ]
+        self._keys[cls] = [key for key, _ in entries]
+        self._items[cls] = [item for _, item in entries]
+
+    def trim(self, before: Time):
+        """
+        Forget items before the given time. They are dropped once they make up
+        half of their class, so trimming takes O(1) amortized, and queries
+        may still find them until then
+        """
+        self._drop_past(before)
+        for cls, keys in self._keys.items():
+            index = bisect_left(keys, (before,))
+            if index and index * 2 >= len(keys):
+                self._compact(cls)
+                keys = self._keys[cls]
+                index = bisect_left(keys, (before,))
+                del keys[:index]
+                del self._items[cls][:index]
+
+    def last(self, of_type: type = object) -> Optional[Tuple[Time, object]]:
+        """
+        Item at the latest time. With several items at that time, the one
+        with the highest weight that was added first
+        """
+        last = None
+        for cls in self._classes(of_type):
+            keys, items = self._keys[cls], self._items[cls]
+            index = len(keys) - 1
+            while index >= 0 and self._is_discarded(cls, keys[index], items[index]):
+                index -= 1
+            if index < 0:
+                continue
+            index = bisect_left(keys, (keys[index][0],))
+            while self._is_discarded(cls, keys[index], items[index]):
+                index += 1
+            time, weight, seq = keys[index]
+            if last is None or (-time, weight, seq) < last[0]:
+                last = (-time, weight, seq), items[index]
+        if last is not None:
+            return -last[0][0], last[1]
+        if self._past is not None:
+            return self._past.last(of_type)
+
+    def between(
+        self, start: Time, end: Time, of_type: type = object
+    ) -> List[Tuple[Time, object]]:
+        """
+        Items from start up to and including end
+        """
+        ranges = []
+        for cls in self._classes(of_type):
+            keys, items = self._keys[cls], self._items[cls]
+            low = bisect_left(keys, (start,))
+            high = bisect_left(keys, (end, float("inf")))
+            if low >= high:
+                continue
+            entries = zip(keys[low:high], items[low:high])
+            discarded = self._discarded.get(cls)
+            if discarded:
+                entries = [e for e in entries if (id(e[1]), e[0][0]) not in discarded]
+            ranges.append(entries)
+        if len(ranges) > 1:
+            entries = heapq.merge(*ranges, key=itemgetter(0))
+        else:
+            entries = ranges[0] if ranges else ()
+        found = [(key[0], item) for key, item in entries]
+        if self._past is not None and start < self._since:
+            return self._past.between(start, end, of_type) + found
+        return found
+
+    def count_since(self, time: Time, of_type: type = object) -> int:
+        count = 0
+        for cls in self._classes(of_type):
+            keys = self._keys[cls]
+            count += len(keys) - bisect_left(keys, (time,))
+            times = self._discarded_times.get(cls)
+            if times:
+                count -= len(times) - bisect_left(times, time)
+        if self._past is not None and time < self._since:
+            count += self._past.count_since(time, of_type)
+        return count
+
+    def __len__(self) -> int:
+        past = len(self._past) if self._past is not None else 0
+        return (
+            past
+            + sum(len(keys) for keys in self._keys.values())
+            - sum(len(discarded) for discarded in self._discarded.values())
+        )
@@ -0,0 +1,150 @@
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from simulation.types import Time
+
+# Phases of the simulation loop that are profiled per class
+PHASE_CHECK = "check"  # Action.ready_to_start
+PHASE_SCHEDULE = "schedule"  # Timeline.schedule_action
+PHASE_SELECT = "select"  # Timeline.get_first_upcoming_event
+PHASE_EXECUTE = "execute"  # Event hook and recording the new state
+
+
+class Observer:
+    """
+    Callbacks around every phase of the simulation loop. Override the ones
+    you need, the others do nothing
+    """
+
+    def before_run(self, sim: "DiscreteSimulation"):
+        pass
+
+    def after_run(self, sim: "DiscreteSimulation"):
+        pass
+
+    def before_check(self, sim: "DiscreteSimulation", action: "Action"):
+        pass
+
+    def after_check(self, sim: "DiscreteSimulation", action: "Action", ready: bool):
+        pass
+
+    def before_schedule(self, sim: "DiscreteSimulation", action: "Action"):
+        pass
+
+    def after_schedule(self, sim: "DiscreteSimulation", action: "Action"):
+        pass
+
+    def before_select(self, sim: "DiscreteSimulation"):
+        pass
+
+    def after_select(
+        self, sim: "DiscreteSimulation", time: Optional[Time], event: Optional["Event"]
+    ):
+        pass
+
+    def before_execute(self, sim: "DiscreteSimulation", time: Time, event: "Event"):
+        pass
+
+    def after_execute(
+        self, sim: "DiscreteSimulation", time: Time, event: "Event", state: "State"
+    ):
+        pass
+
+
+class PhaseStats:
+    calls: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "mean": self.seconds / self.calls if self.calls else 0.0,
+        }
+
+
+class Profiler(Observer):
+    """
+    Call counts and wall time per phase and Action or Event class, plus the
+    number of entries in the event queue whenever the next event is selected
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, PhaseStats]] = {}
+        self.queue_samples = 0
+        self.queue_total = 0
+        self.queue_max = 0
+        self._start = 0.0
+
+    def _begin(self, *args, **kwargs):
+        self._start = perf_counter()
+
+    def _end(self, phase: str, obj):
+        seconds = perf_counter() - self._start
+        by_name = self.stats.setdefault(phase, {})
+        name = obj.__class__.__name__ if obj is not None else "None"
+        stats = by_name.get(name)
+        if stats is None:
+            stats = by_name[name] = PhaseStats()
+        stats.add(seconds)
+
+    before_check = before_schedule = before_execute = _begin
+
+    def after_check(self, sim, action, ready):
+        self._end(PHASE_CHECK, action)
+
+    def after_schedule(self, sim, action):
+        self._end(PHASE_SCHEDULE, action)
+
+    def before_select(self, sim):
+        size = len(sim.timeline.pending)
+        self.queue_samples += 1
+        self.queue_total += size
+        self.queue_max = max(self.queue_max, size)
+        self._start = perf_counter()
+
+    def after_select(self, sim, time, event):
+        self._end(PHASE_SELECT, event)
+
+    def after_execute(self, sim, time, event, state):
+        self._end(PHASE_EXECUTE, event)
+
+    def as_dict(self) -> dict:
+        profile = {
+            phase: {name: s.as_dict() for name, s in by_name.items()}
+            for phase, by_name in self.stats.items()
+        }
+        profile["queue"] = {
+            "samples": self.queue_samples,
+            "mean": self.queue_total / self.queue_samples if self.queue_samples else 0,
+            "max": self.queue_max,
+        }
+        return profile
+
+    def table(self) -> str:
+        rows: List[tuple] = [
+            (phase, name, s.calls, s.seconds)
+            for phase, by_name in self.stats.items()
+            for name, s in by_name.items()
+        ]
+        rows.sort(key=lambda r: -r[3])
+        lines = [
+            "{:<10} {:<32} {:>10} {:>12} {:>12}".format(
+                "phase", "class", "calls", "seconds", "us/call"
+            )
+        ]
+        for phase, name, calls, seconds in rows:
+            lines.append(
+                "{:<10} {:<32} {:>10} {:>12.6f} {:>12.2f}".format(
+                    phase, name, calls, seconds, seconds / calls * 1e6
+                )
+            )
+        queue = self.as_dict()["queue"]
+        lines.append(
+            "Queue size: mean {:.1f}, max {}".format(queue["mean"], queue["max"])
+        )
+        return "\n".join(lines)
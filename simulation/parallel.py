@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from simulation.batching import (
+    BatchedSimulation,
+    HookResult,
+    OverlayState,
+    Replay,
+    SerialOnly,
+    conflict_free,
+    same_random_states,
+)
+from simulation.checkpoint import random_states, restore_random_states
+from simulation.framework import Event, State, Step
+
+
+def run_hooks(events: List[Event], state: State) -> List[HookResult]:
+    """
+    Run hooks on overlays of the same state. Module level, so process pools
+    can call it
+    """
+    results = []
+    for event in events:
+        overlay = OverlayState(state, batched=True)
+        before = random_states()
+        try:
+            event.hook(state=overlay)
+        except SerialOnly:
+            results.append((None, None))
+            continue
+        if same_random_states(before, random_states()):
+            results.append((overlay.changes, overlay.reads))
+        else:
+            results.append((None, None))
+    return results
+
+
+class ParallelDiscreteSimulation(BatchedSimulation):
+    """
+    Runs the hooks of events due at the same time on a thread or process
+    pool. Events that declare `reads` and `writes` are batched unless they
+    read what an event before them sets, events that are only `concurrent`
+    are batched as they come. Either way the keys a hook actually read are
+    recorded, and the changes are only kept up to the first hook that read
+    what an earlier one in the batch set or drew random numbers. That event
+    runs again once the ones before it are applied, so conflicting events
+    fall back to serial execution and the result matches DiscreteSimulation
+    exactly. Random numbers are only detected when they come from the random
+    streams of the state or the global generators of `random` and NumPy.
+
+    Batched hooks run on an OverlayState, so they should only change the
+    state through `set`. With processes, the events and the state have to be
+    picklable, and hooks don't see changes to the event objects in the
+    simulation
+    """
+
+    executor: str = "thread"  # "thread" or "process"
+    workers: Optional[int] = None
+
+    def __init__(
+        self, *args, executor: str = "thread", workers: Optional[int] = None, **kwargs
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError("Unknown executor {}".format(executor))
+        self.executor = executor
+        self.workers = workers
+        super(ParallelDiscreteSimulation, self).__init__(*args, **kwargs)
+
+    def _pool(self) -> Executor:
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def iter_run(self) -> Iterator[Step]:
+        self._begin_run()
+        try:
+            with self._pool() as pool:
+                while self._running():
+                    self._schedule_available_actions()
+                    event_occurrence = self._next_event()
+                    if event_occurrence is None:
+                        break
+                    new_time, event = event_occurrence
+                    self._before_execute(new_time, event)
+                    state = self.timeline.current_state
+                    changes = self._precomputed_changes(new_time, event)
+                    if changes is None:
+                        batch = self._batch_at(new_time, event)
+                        if len(batch) > 1:
+                            results = self._run_batch(pool, batch, state)
+                            self._keep(new_time, batch, results)
+                            changes = results[0] if results else None
+                    if changes is None:
+                        new_state = state.apply(event)
+                    else:
+                        new_state = state.apply(Replay(event, changes))
+                    yield self._record(new_time, event, new_state)
+        finally:
+            self._end_run()
+
+    def _run_batch(
+        self, pool: Executor, batch: List[Event], state: State
+    ) -> List[dict]:
+        """
+        Changes of the leading events in the batch that don't conflict. Empty
+        when the first one has to run on its own
+        """
+        workers = self.workers or os.cpu_count() or 1
+        size = -(-len(batch) // workers)  # One chunk per worker
+        before = random_states()
+        futures = [
+            pool.submit(run_hooks, batch[i : i + size], state)
+            for i in range(0, len(batch), size)
+        ]
+        results = [r for f in futures for r in f.result()]
+        if self._unclear_draws([changes for changes, _ in results], before):
+            restore_random_states(before)
+            cut = [e for e, (changes, _) in zip(batch, results) if changes is None]
+            again = iter(run_hooks(cut, state))
+            results = [r if r[0] is not None else next(again) for r in results]
+        self._drew_random(batch, [changes for changes, _ in results], before)
+        return [changes for changes, _ in results[: conflict_free(results)]]
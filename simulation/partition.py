@@ -0,0 +1,266 @@
+import multiprocessing
+from typing import Dict, List, NamedTuple, Tuple
+
+from simulation.framework import (
+    DiscreteSimulation,
+    Event,
+    SimulationError,
+    State,
+    logger,
+)
+from simulation.types import Time, Timedelta
+
+INFINITY = float("inf")
+
+
+class Message(NamedTuple):
+    time: Time  # When the event happens at the target
+    source: int  # Position of the sending logical process
+    seq: int  # Order in which the source sent it
+    target: str
+    event: Event
+
+
+class PartitionState(State):
+    """
+    State of a logical process. Hooks send events to other logical processes
+    with `send`
+    """
+
+    outbox: List[Tuple[str, Event, Timedelta]] = None
+
+    def __init__(self, *args, **kwargs):
+        super(PartitionState, self).__init__(*args, **kwargs)
+        self.outbox = []
+
+    def send(self, target: str, event: Event, delay: Timedelta) -> "PartitionState":
+        """
+        Schedule an event on another logical process, `delay` after now. The
+        delay can't be shorter than the lookahead of the sender
+        """
+        self.outbox.append((target, event, delay))
+        return self
+
+
+class LogicalProcess:
+    """
+    Part of a partitioned model with its own simulation, so its own Timeline
+    and State. `lookahead` is the shortest delay of the messages it sends
+    """
+
+    def __init__(self, name: str, sim: DiscreteSimulation, lookahead: Timedelta):
+        if lookahead <= 0:
+            raise ValueError("The lookahead of {} has to be positive".format(name))
+        if not isinstance(sim.timeline.current_state, PartitionState):
+            raise ValueError(
+                "The simulation of {} needs state_factory=PartitionState".format(name)
+            )
+        self.name = name
+        self.sim = sim
+        self.lookahead = lookahead
+        self.position = 0  # Set by the partitioned simulation
+        self._sent = 0
+        self._scheduled = False  # Whether actions were scheduled since the last event
+
+    @property
+    def state(self) -> State:
+        return self.sim.timeline.current_state
+
+    def start(self):
+        self.sim._begin_run()
+
+    def finish(self):
+        self.sim._end_run()
+
+    def advance(
+        self, until: Time, messages: List[Message], final: bool = False
+    ) -> Tuple[List[Message], Time]:
+        """
+        Schedule the messages, then run the events before `until`. A final
+        window also runs the first event at `until`, as a simulation runs the
+        first event at its max duration. Returns the messages sent on the way
+        and the time of the next event
+        """
+        sim = self.sim
+        timeline = sim.timeline
+        for message in messages:
+            timeline.schedule_event(event=message.event, time=message.time)
+        sent = []
+        while True:
+            if not self._scheduled:
+                sim._schedule_available_actions()
+                self._scheduled = True
+            event_occurrence = timeline.get_first_upcoming_event()
+            if event_occurrence is None:
+                return sent, INFINITY
+            time, event = event_occurrence
+            if time > until or (
+                time == until and (not final or timeline.current_time >= until)
+            ):
+                return sent, time
+            sim._before_execute(time, event)
+            state = timeline.current_state
+            new_state = state.apply(event)
+            for target, message_event, delay in new_state.outbox:
+                if delay < self.lookahead:
+                    raise SimulationError(
+                        "{} sent {} with delay {}, below its lookahead {}".format(
+                            self.name, message_event, delay, self.lookahead
+                        )
+                    )
+                sent.append(
+                    Message(
+                        time + delay, self.position, self._sent, target, message_event
+                    )
+                )
+                self._sent += 1
+            state.outbox = []
+            new_state.outbox = []
+            sim._record(time, event, new_state)
+            self._scheduled = False
+
+
+def _serve(process: LogicalProcess, connection):
+    """
+    Runs a logical process in a worker, one window per request
+    """
+    process.start()
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        try:
+            connection.send(process.advance(*request))
+        except Exception as error:
+            connection.send(error)  # Raised again in the coordinator
+            break
+    process.finish()
+    connection.send(process)
+    connection.close()
+
+
+class PartitionedSimulation:
+    """
+    Runs logical processes in windows with conservative synchronization. A
+    window ends at the earliest next event time plus lookahead of any
+    process, so no message sent in it can arrive inside it, and every
+    process runs its events up to there independently. Messages are
+    delivered at the barrier between windows in order of time, sender and
+    sending order, so the result is the same whether the processes run
+    one after the other or each in its own OS process.
+
+    Every event before `max_duration` runs, and like in a single simulation
+    the first event of every process at exactly `max_duration` runs too, in
+    a last window of its own. In parallel, the processes and
+    the events they send have to be picklable
+    """
+
+    def __init__(
+        self,
+        processes: List[LogicalProcess],
+        max_duration: Time,
+        parallel: bool = False,
+    ):
+        names = [p.name for p in processes]
+        if len(set(names)) != len(names):
+            raise ValueError("Logical processes need unique names")
+        self.processes = processes
+        for position, process in enumerate(processes):
+            process.position = position
+        self.max_duration = max_duration
+        self.parallel = parallel
+        self.windows = 0
+
+    def __getitem__(self, name: str) -> LogicalProcess:
+        for process in self.processes:
+            if process.name == name:
+                return process
+        raise KeyError(name)
+
+    def run(self) -> Dict[str, State]:
+        if self.parallel:
+            self._run_parallel()
+        else:
+            self._run_sequential()
+        return {p.name: p.state for p in self.processes}
+
+    def _run_sequential(self):
+        for process in self.processes:
+            process.start()
+        try:
+            self._run_windows(
+                lambda requests: [
+                    p.advance(*r) for p, r in zip(self.processes, requests)
+                ]
+            )
+        finally:
+            for process in self.processes:
+                process.finish()
+
+    def _run_parallel(self):
+        context = multiprocessing.get_context()
+        connections, workers = [], []
+        for process in self.processes:
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=_serve, args=(process, worker_connection))
+            worker.start()
+            connections.append(connection)
+            workers.append(worker)
+
+        def advance(requests: List[tuple]) -> List[Tuple[List[Message], Time]]:
+            for connection, request in zip(connections, requests):
+                connection.send(request)
+            results = [connection.recv() for connection in connections]
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            return results
+
+        try:
+            self._run_windows(advance)
+            for connection in connections:
+                connection.send(None)
+            self.processes = [connection.recv() for connection in connections]
+        except BaseException:
+            for worker in workers:
+                worker.terminate()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+
+    def _run_windows(self, advance):
+        """
+        `advance` runs every process up to a time with its messages, and
+        returns what they sent and their next event times
+        """
+        positions = {p.name: i for i, p in enumerate(self.processes)}
+        inboxes: List[List[Message]] = [[] for _ in self.processes]
+        results = advance([(-INFINITY, []) for _ in self.processes])
+        while True:
+            for sent, _ in results:
+                for message in sent:
+                    if message.target not in positions:
+                        raise SimulationError(
+                            "Message {} for unknown process".format(message)
+                        )
+                    inboxes[positions[message.target]].append(message)
+            next_times = [
+                min([next_time] + [m.time for m in inbox])
+                for (_, next_time), inbox in zip(results, inboxes)
+            ]
+            if min(next_times) > self.max_duration:
+                break
+            # Messages sent in the last window arrive after the max duration
+            final = min(next_times) == self.max_duration
+            until = min(
+                min(t + p.lookahead for t, p in zip(next_times, self.processes)),
+                self.max_duration,
+            )
+            requests = [(until, sorted(inbox), final) for inbox in inboxes]
+            inboxes = [[] for _ in self.processes]
+            self.windows += 1
+            logger.debug("Running window {} until {}".format(self.windows, until))
+            results = advance(requests)
+            if final:
+                break
@@ -0,0 +1,113 @@
+from collections.abc import Mapping
+from typing import Iterator, List, Optional
+
+from simulation.framework import Action, Event, State
+
+
+class MergedValues(Mapping):
+    """
+    Read-only view of the values of a persistent state, without merging its
+    base and overlay into a new dict
+    """
+
+    def __init__(self, base: dict, overlay: dict):
+        self._base = base
+        self._overlay = overlay
+
+    def __getitem__(self, key):
+        try:
+            return self._overlay[key]
+        except KeyError:
+            return self._base[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._overlay or key in self._base
+
+    def __iter__(self) -> Iterator:
+        yield from self._base
+        yield from (k for k in self._overlay if k not in self._base)
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(1 for k in self._overlay if k not in self._base)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class PersistentState(State):
+    """
+    State that shares its values with the states derived from it. Every
+    version keeps a shared, never mutated base dict and a small overlay with
+    the values set since that base was made. Values are shared by reference,
+    so they should be replaced through `set` instead of mutated in place.
+    `values` is a read-only view, use `set` to change them
+    """
+
+    overlay_size: int = 32  # Minimum overlay size before flattening
+
+    _base: dict = None
+    _overlay: dict = None
+    _owns_events: bool = True
+
+    def __init__(
+        self,
+        values: Optional[dict] = None,
+        active_events: List[Action] = None,
+        completed_events: List[Action] = None,
+    ):
+        self._base = dict(values or {})
+        self._overlay = {}
+        self.active_events = active_events or []
+        self.completed_events = completed_events or []
+        self.changes = {}
+
+    @property
+    def values(self) -> MergedValues:
+        return MergedValues(self._base, self._overlay)
+
+    @values.setter
+    def values(self, values: dict):
+        self._base = dict(values)
+        self._overlay = {}
+
+    def get(self, key, default=None):
+        try:
+            return self._overlay[key]
+        except KeyError:
+            return self._base.get(key, default)
+
+    def set(self, key, value) -> "PersistentState":
+        self._overlay[key] = value
+        self.changes[key] = value
+        return self
+
+    def derive(self) -> "PersistentState":
+        """
+        Create the next version of this state. The overlay is flattened into a
+        new base once it outgrows the square root of the base size, which
+        keeps the amortized cost per version at O(sqrt(n))
+        """
+        state = self.__class__.__new__(self.__class__)
+        limit = max(self.overlay_size, int(len(self._base) ** 0.5))
+        if len(self._overlay) > limit:
+            state._base = {**self._base, **self._overlay}
+            state._overlay = {}
+        else:
+            state._base = self._base
+            state._overlay = dict(self._overlay)
+        state.active_events = self.active_events
+        state.completed_events = self.completed_events
+        state.streams = self.streams
+        state._owns_events = False
+        state.changes = {}
+        return state
+
+    def apply(self, event: Event) -> "PersistentState":
+        return event(state=self.derive())
+
+    def complete_event(self, event: Action) -> "PersistentState":
+        if not self._owns_events:
+            self.active_events = list(self.active_events)
+            self.completed_events = list(self.completed_events)
+            self._owns_events = True
+        return super(PersistentState, self).complete_event(event)
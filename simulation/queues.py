@@ -0,0 +1,220 @@
+import heapq
+from bisect import insort
+from typing import Iterator, List, NamedTuple, Optional, Set
+
+from simulation.types import Time, Weight
+
+
+class QueueEntry(NamedTuple):
+    """
+    Pending item in an EventQueue. Entries sort by time, descending weight and
+    insertion order
+    """
+
+    time: Time
+    priority: Weight  # Negated weight, so high weight sorts first
+    seq: int
+    item: object
+
+
+class EventQueue:
+    """
+    Future event list of a Timeline. Cancelled entries are skipped when they
+    come up, and dropped all at once when they make up half of the queue
+    """
+
+    min_compaction = 64  # Don't compact small queues over and over
+
+    def __init__(self):
+        self._seq = 0
+        self._cancelled: Set[int] = set()
+
+    def push(self, time: Time, weight: Weight, item) -> QueueEntry:
+        entry = QueueEntry(time, -weight, self._seq, item)
+        self._seq += 1
+        self._push(entry)
+        return entry
+
+    def cancel(self, entry: QueueEntry):
+        self._cancelled.add(entry.seq)
+        cancelled = len(self._cancelled)
+        if cancelled >= self.min_compaction and 2 * cancelled >= len(self):
+            self.compact()
+
+    def compact(self):
+        """
+        Remove all cancelled entries
+        """
+        if self._cancelled:
+            self._compact([e for e in self if e.seq not in self._cancelled])
+            self._cancelled.clear()
+
+    def peek(self) -> Optional[QueueEntry]:
+        while (entry := self._peek()) is not None and entry.seq in self._cancelled:
+            self._pop()
+            self._cancelled.discard(entry.seq)
+        return entry
+
+    def pop(self) -> QueueEntry:
+        entry = self._pop()
+        while entry.seq in self._cancelled:
+            self._cancelled.discard(entry.seq)
+            entry = self._pop()
+        return entry
+
+    def _push(self, entry: QueueEntry):
+        raise NotImplementedError
+
+    def _peek(self) -> Optional[QueueEntry]:
+        raise NotImplementedError
+
+    def _pop(self) -> QueueEntry:
+        raise NotImplementedError
+
+    def _compact(self, entries: List[QueueEntry]):
+        raise NotImplementedError
+
+    def ordered(self) -> List[QueueEntry]:
+        return sorted(e for e in self if e.seq not in self._cancelled)
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+
+class HeapEventQueue(EventQueue):
+    """
+    Binary heap with O(log n) push and pop
+    """
+
+    def __init__(self):
+        super(HeapEventQueue, self).__init__()
+        self._heap: List[QueueEntry] = []
+
+    def _push(self, entry: QueueEntry):
+        heapq.heappush(self._heap, entry)
+
+    def _peek(self) -> Optional[QueueEntry]:
+        if self._heap:
+            return self._heap[0]
+
+    def _pop(self) -> QueueEntry:
+        try:
+            return heapq.heappop(self._heap)
+        except IndexError:
+            raise IndexError("pop from an empty event queue")
+
+    def _compact(self, entries: List[QueueEntry]):
+        heapq.heapify(entries)
+        self._heap = entries
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        return iter(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class CalendarEventQueue(EventQueue):
+    """
+    Calendar queue (Brown, 1988) with amortized O(1) push and pop. Works best
+    for large schedules with evenly spread event times
+    """
+
+    min_buckets = 2
+    sample_size = 25
+
+    def __init__(self, bucket_width: float = 1.0, buckets: int = 2):
+        super(CalendarEventQueue, self).__init__()
+        self._size = 0
+        self._setup(max(buckets, self.min_buckets), bucket_width)
+
+    def _setup(self, buckets: int, width: float):
+        self._buckets: List[List[QueueEntry]] = [[] for _ in range(buckets)]
+        self._width = width
+        self._day = None  # Virtual bucket number the cursor points at
+
+    def _bucket_number(self, time: Time) -> int:
+        return int(time // self._width)
+
+    def _push(self, entry: QueueEntry):
+        day = self._bucket_number(entry.time)
+        insort(self._buckets[day % len(self._buckets)], entry)
+        self._size += 1
+        if self._day is not None and day < self._day:
+            self._day = day
+        if self._size > 2 * len(self._buckets):
+            self._resize(2 * len(self._buckets))
+
+    def _locate(self) -> Optional[List[QueueEntry]]:
+        if not self._size:
+            return None
+        nbuckets = len(self._buckets)
+        if self._day is not None:
+            day = self._day
+            for _ in range(nbuckets):
+                bucket = self._buckets[day % nbuckets]
+                if bucket and self._bucket_number(bucket[0].time) <= day:
+                    self._day = day
+                    return bucket
+                day += 1
+        # Nothing within a year of the cursor; jump to the earliest entry
+        bucket = min((b for b in self._buckets if b), key=lambda b: b[0])
+        self._day = self._bucket_number(bucket[0].time)
+        return bucket
+
+    def _peek(self) -> Optional[QueueEntry]:
+        bucket = self._locate()
+        if bucket:
+            return bucket[0]
+
+    def _pop(self) -> QueueEntry:
+        bucket = self._locate()
+        if bucket is None:
+            raise IndexError("pop from an empty event queue")
+        entry = bucket.pop(0)
+        self._size -= 1
+        if (
+            len(self._buckets) > self.min_buckets
+            and self._size < len(self._buckets) // 2
+        ):
+            self._resize(len(self._buckets) // 2)
+        return entry
+
+    def _compact(self, entries: List[QueueEntry]):
+        self._size = len(entries)
+        self._rebuild(entries, len(self._buckets))
+
+    def _resize(self, buckets: int):
+        self._rebuild(list(self), buckets)
+
+    def _rebuild(self, entries: List[QueueEntry], buckets: int):
+        self._setup(max(buckets, self.min_buckets), self._width)
+        self._width = self._estimate_width(entries)
+        for entry in entries:
+            day = self._bucket_number(entry.time)
+            self._buckets[day % len(self._buckets)].append(entry)
+        for bucket in self._buckets:
+            bucket.sort()
+
+    def _estimate_width(self, entries: List[QueueEntry]) -> float:
+        sample = [e.time for e in heapq.nsmallest(self.sample_size, entries)]
+        gaps = [b - a for a, b in zip(sample, sample[1:]) if b > a]
+        if not gaps:
+            return self._width
+        average = sum(gaps) / len(gaps)
+        # Ignore outliers, as suggested in the original paper
+        gaps = [g for g in gaps if g <= 2 * average] or gaps
+        return 3 * sum(gaps) / len(gaps)
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        for bucket in self._buckets:
+            yield from bucket
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+import sys
+from array import array
+from heapq import merge
+from math import floor
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from simulation.observers import Observer
+from simulation.types import Time
+
+RECORDING_VERSION = 1
+
+# NumPy dtypes of the array typecodes a column can have
+DTYPES = {"b": "i1", "h": "i2", "i": "i4", "q": "i8", "f": "f4", "d": "f8"}
+
+
+class Column:
+    """
+    Times and values of one recorded state key
+    """
+
+    def __init__(self, typecode: str = "d"):
+        if typecode not in DTYPES:
+            raise ValueError("Unsupported typecode {}".format(typecode))
+        self.times = array("d")
+        self.values = array(typecode)
+        self.seen = 0  # Number of changes, recorded or not
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class Recorder(Observer):
+    """
+    Records the values of selected state keys whenever an event changes them.
+    Only the recorded columns are kept in memory, so it doesn't need the
+    history of the timeline.
+
+    `every` keeps only every n-th change of a key. `bin_width` keeps the last
+    value in every bin of that width, at the start time of the bin
+    """
+
+    def __init__(
+        self,
+        keys: Union[Iterable, Dict[object, str]],
+        every: Optional[int] = None,
+        bin_width: Optional[Time] = None,
+    ):
+        if not isinstance(keys, dict):
+            keys = {k: "d" for k in keys}
+        self.columns: Dict[object, Column] = {k: Column(t) for k, t in keys.items()}
+        self.every = every
+        self.bin_width = bin_width
+        self._timeline = None  # Timeline that was recorded, to notice resumed runs
+
+    def before_run(self, sim):
+        if sim.timeline is self._timeline:
+            return  # Resumed run
+        self._timeline = sim.timeline
+        for key, column in self.columns.items():
+            self.columns[key] = Column(column.values.typecode)
+        state = sim.timeline.current_state
+        for key in self.columns:
+            if state.get(key) is not None:
+                self.append(key, sim.timeline.current_time, state.get(key))
+
+    def after_execute(self, sim, time, event, state):
+        changes = state.changes
+        for key in self.columns:
+            if key in changes:
+                self.append(key, time, changes[key])
+
+    def append(self, key, time: Time, value):
+        column = self.columns[key]
+        column.seen += 1
+        if self.every and (column.seen - 1) % self.every:
+            return
+        if self.bin_width:
+            time = floor(time / self.bin_width) * self.bin_width
+            if column.times and column.times[-1] == time:
+                column.values[-1] = value
+                return
+        column.times.append(time)
+        column.values.append(value)
+
+    def __getitem__(self, key) -> Tuple[array, array]:
+        column = self.columns[key]
+        return column.times, column.values
+
+    def to_numpy(self, key):
+        """
+        Times and values of a key as NumPy arrays. They are copies, as arrays
+        that share memory with the recorder would stop it from growing
+        """
+        import numpy as np
+
+        column = self.columns[key]
+        return (
+            np.frombuffer(column.times, dtype="f8").copy(),
+            np.frombuffer(column.values, dtype=DTYPES[column.values.typecode]).copy(),
+        )
+
+    def to_csv(self, path: str):
+        """
+        One row per recorded value, in time order
+        """
+        rows = merge(
+            *(
+                ((t, str(key), v) for t, v in zip(c.times, c.values))
+                for key, c in self.columns.items()
+            ),
+            key=lambda r: r[0],
+        )
+        with open(path, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(["time", "key", "value"])
+            writer.writerows(rows)
+
+    def save(self, path: str):
+        """
+        Write every column to a directory of raw files that `load_recording`
+        can memory map
+        """
+        os.makedirs(path, exist_ok=True)
+        columns = {}
+        for i, (key, column) in enumerate(self.columns.items()):
+            for part, values in (("times", column.times), ("values", column.values)):
+                with open(os.path.join(path, "{}.{}.bin".format(i, part)), "wb") as fp:
+                    values.tofile(fp)
+            columns[str(key)] = {
+                "index": i,
+                "length": len(column),
+                "dtype": DTYPES[column.values.typecode],
+            }
+        header = {
+            "version": RECORDING_VERSION,
+            "byteorder": sys.byteorder,
+            "columns": columns,
+        }
+        with open(os.path.join(path, "header.json"), "w") as fp:
+            json.dump(header, fp)
+
+
+def load_recording(path: str) -> Dict[str, tuple]:
+    """
+    Memory mapped times and values of every key in a saved recording
+    """
+    import numpy as np
+
+    with open(os.path.join(path, "header.json")) as fp:
+        header = json.load(fp)
+    if header["version"] != RECORDING_VERSION:
+        raise ValueError("Unsupported recording version {}".format(header["version"]))
+    prefix = "<" if header["byteorder"] == "little" else ">"
+
+    def load(index: int, part: str, dtype: str, length: int):
+        dtype = np.dtype(prefix + dtype)
+        if not length:
+            return np.empty(0, dtype=dtype)  # Empty files can't be memory mapped
+        return np.memmap(
+            os.path.join(path, "{}.{}.bin".format(index, part)),
+            dtype=dtype,
+            mode="r",
+            shape=(length,),
+        )
+
+    return {
+        key: (
+            load(c["index"], "times", "f8", c["length"]),
+            load(c["index"], "values", c["dtype"], c["length"]),
+        )
+        for key, c in header["columns"].items()
+    }
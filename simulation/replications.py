@@ -0,0 +1,189 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from numbers import Number
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from simulation.framework import DiscreteSimulation
+from simulation.statistics import Summary, summarize
+from simulation.types import Time
+
+Reducer = Callable[[DiscreteSimulation], dict]
+
+# Why no more replications were run
+STOP_REPLICATIONS = "replications"  # All of them ran
+STOP_PRECISION = "precision"
+
+
+class ReplicationResult(NamedTuple):
+    seed: int  # Lane index for lockstep runs, whose lanes share one generator
+    values: dict
+    stop_reason: Optional[str] = None
+    warmup_cutoff: Optional[Time] = None
+
+
+class Replications:
+    """
+    Results of running the same model with different seeds
+    """
+
+    results: List[ReplicationResult] = None
+    stop_reason: Optional[str] = None  # Why no more replications were run
+
+    def __init__(
+        self,
+        results: List[ReplicationResult],
+        confidence: float = 0.95,
+        stop_reason: Optional[str] = None,
+    ):
+        self.results = results
+        self.confidence = confidence
+        self.stop_reason = stop_reason
+
+    def values(self, key) -> List:
+        return [r.values[key] for r in self.results if key in r.values]
+
+    def summary(self, keys: Optional[Sequence] = None) -> Dict[object, Summary]:
+        """
+        Mean and confidence interval per numeric value
+        """
+        if keys is None:
+            keys = []
+            for result in self.results:
+                keys.extend(k for k in result.values if k not in keys)
+        summaries = {}
+        for key in keys:
+            values = self.values(key)
+            if values and all(isinstance(v, Number) for v in values):
+                summaries[key] = summarize(values, confidence=self.confidence)
+        return summaries
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+
+def derive_seeds(seed: int, n: int) -> List[int]:
+    """
+    Independent looking, reproducible seeds for n replications
+    """
+    rng = random.Random(seed)
+    return [rng.getrandbits(63) for _ in range(n)]
+
+
+def final_values(sim: DiscreteSimulation, keys: Optional[Sequence] = None) -> dict:
+    values = sim.timeline.current_state.values
+    if keys is None:
+        return dict(values)
+    return {k: values[k] for k in keys if k in values}
+
+
+def run_replication(
+    factory: Callable[[int], DiscreteSimulation],
+    seed: int,
+    reducer: Optional[Reducer] = None,
+    keys: Optional[Sequence] = None,
+) -> ReplicationResult:
+    """
+    Build a simulation for the seed, run it and keep only the reduced result
+    """
+    random.seed(seed)
+    sim = factory(seed)
+    sim.run()
+    values = reducer(sim) if reducer is not None else final_values(sim, keys)
+    return ReplicationResult(
+        seed=seed,
+        values=values,
+        stop_reason=sim.stop_reason,
+        warmup_cutoff=sim.warmup_cutoff,
+    )
+
+
+def run_replications(
+    factory: Callable[[int], DiscreteSimulation],
+    n: Optional[int] = None,
+    seeds: Optional[Sequence[int]] = None,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    reducer: Optional[Reducer] = None,
+    keys: Optional[Sequence] = None,
+    seed: int = 0,
+    confidence: float = 0.95,
+    precision: Optional[float] = None,
+    precision_keys: Optional[Sequence] = None,
+    min_replications: int = 3,
+) -> Replications:
+    """
+    Run a model once per seed on a process pool. The factory gets the seed and
+    returns a simulation that is ready to run; the global random module is
+    seeded with it as well. Factory and reducer have to be picklable, so
+    module level functions. Use 1 worker to run in this process.
+
+    With `precision`, replications are run a round of one per worker at a
+    time, and no more are started once the confidence interval of every
+    numeric value (or of `precision_keys`) is narrower than that fraction of
+    its mean. Then n or the seeds are the maximum
+    """
+    if seeds is None:
+        if n is None:
+            raise ValueError("Either the number of replications or seeds is needed")
+        seeds = derive_seeds(seed, n)
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    run = partial(run_replication, factory, reducer=reducer, keys=keys)
+    if precision is not None:
+        return _run_until_precise(
+            run, seeds, workers, confidence, precision, precision_keys, min_replications
+        )
+    if workers == 1:
+        results = [run(s) for s in seeds]
+    else:
+        chunksize = chunksize or max(1, len(seeds) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, seeds, chunksize=chunksize))
+    return Replications(
+        results=results, confidence=confidence, stop_reason=STOP_REPLICATIONS
+    )
+
+
+def _precise(
+    replications: Replications, precision: float, keys: Optional[Sequence]
+) -> bool:
+    summaries = replications.summary(keys)
+    return bool(summaries) and all(
+        s.relative_half_width <= precision for s in summaries.values()
+    )
+
+
+def _run_until_precise(
+    run: Callable[[int], ReplicationResult],
+    seeds: List[int],
+    workers: int,
+    confidence: float,
+    precision: float,
+    keys: Optional[Sequence],
+    min_replications: int,
+) -> Replications:
+    replications = Replications(
+        results=[], confidence=confidence, stop_reason=STOP_REPLICATIONS
+    )
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for start in range(0, len(seeds), workers):
+            round_seeds = seeds[start : start + workers]
+            if executor is None:
+                replications.results.extend(run(s) for s in round_seeds)
+            else:
+                replications.results.extend(executor.map(run, round_seeds))
+            if len(replications) >= min_replications and _precise(
+                replications, precision, keys
+            ):
+                replications.stop_reason = STOP_PRECISION
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return replications
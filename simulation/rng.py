@@ -0,0 +1,103 @@
+import hashlib
+from copy import deepcopy
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+
+class RandomStream:
+    """
+    Variates of one substream. Every kind of variate is generated a block at
+    a time and handed out one by one, which is much faster than drawing them
+    separately. Not thread-safe, batched engines run the hooks that use it
+    one at a time
+    """
+
+    def __init__(self, generator: np.random.Generator, block_size: int = 1024):
+        self.generator = generator
+        self.block_size = block_size
+        self._blocks: Dict[tuple, Iterator] = {}
+
+    def _next(self, key: tuple):
+        try:
+            return next(self._blocks[key])
+        except (KeyError, StopIteration):
+            method, *args = key
+            block = getattr(self.generator, method)(*args, size=self.block_size)
+            block = self._blocks[key] = iter(block.tolist())
+            return next(block)
+
+    def random(self) -> float:
+        """
+        Uniform in [0, 1)
+        """
+        return self._next(("random",))
+
+    def uniform(self, low: float = 0.0, high: float = 1.0) -> float:
+        return low + (high - low) * self.random()
+
+    def randint(self, low: int, high: int) -> int:
+        """
+        Integer from low up to and including high, like random.randint
+        """
+        return self._next(("integers", low, high + 1))
+
+    def choice(self, options: Sequence):
+        return options[self.randint(0, len(options) - 1)]
+
+    def normal(self, mean: float = 0.0, sigma: float = 1.0) -> float:
+        return mean + sigma * self._next(("standard_normal",))
+
+    def exponential(self, scale: float = 1.0) -> float:
+        return scale * self._next(("standard_exponential",))
+
+
+class RandomStreams:
+    """
+    Independent random streams by name, for example one per event or action
+    type. The seed of a stream only depends on the seed and its name, so a
+    stream gives the same variates no matter how the events that use it
+    interleave with others. Scenarios compared with the same seed get common
+    random numbers.
+
+    States share the streams of their simulation instead of copying them,
+    use `copy` for an independent copy at the same positions
+    """
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = 1024):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.block_size = block_size
+        self._streams: Dict[str, RandomStream] = {}
+
+    @property
+    def seed(self) -> int:
+        return self.seed_sequence.entropy
+
+    def __getitem__(self, name: str) -> RandomStream:
+        try:
+            return self._streams[name]
+        except KeyError:
+            pass
+        stream = self._streams[name] = RandomStream(
+            np.random.default_rng(self._seed_sequence_of(name)),
+            block_size=self.block_size,
+        )
+        return stream
+
+    def _seed_sequence_of(self, name: str) -> np.random.SeedSequence:
+        # hash() of strings differs between processes, so it can't be used
+        key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "little")
+        return np.random.SeedSequence(
+            self.seed_sequence.entropy,
+            spawn_key=self.seed_sequence.spawn_key + (key,),
+        )
+
+    def copy(self) -> "RandomStreams":
+        streams = self.__class__.__new__(self.__class__)
+        streams.seed_sequence = self.seed_sequence
+        streams.block_size = self.block_size
+        streams._streams = deepcopy(self._streams)
+        return streams
+
+    def __deepcopy__(self, memo: dict) -> "RandomStreams":
+        return self  # Every state of a simulation uses the same streams
@@ -0,0 +1,56 @@
+from math import pi, sqrt, tan
+from statistics import NormalDist, fmean, stdev
+from typing import NamedTuple, Sequence
+
+
+class Summary(NamedTuple):
+    n: int
+    mean: float
+    stdev: float
+    half_width: float  # Half width of the confidence interval of the mean
+
+    @property
+    def low(self) -> float:
+        return self.mean - self.half_width
+
+    @property
+    def high(self) -> float:
+        return self.mean + self.half_width
+
+    @property
+    def relative_half_width(self) -> float:
+        return self.half_width / abs(self.mean) if self.mean else float("inf")
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Quantile of Student's t distribution. Exact for 1 and 2 degrees of
+    freedom, Cornish-Fisher expansion (Abramowitz & Stegun 26.7.5) otherwise
+    """
+    if df == 1:
+        return tan(pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def summarize(values: Sequence[float], confidence: float = 0.95) -> Summary:
+    """
+    Mean with a Student t confidence interval
+    """
+    n = len(values)
+    if not n:
+        raise ValueError("Can't summarize an empty sequence")
+    mean = fmean(values)
+    if n == 1:
+        return Summary(n=1, mean=mean, stdev=0.0, half_width=float("inf"))
+    deviation = stdev(values, xbar=mean)
+    quantile = t_quantile((1 + confidence) / 2, n - 1)
+    return Summary(
+        n=n, mean=mean, stdev=deviation, half_width=quantile * deviation / sqrt(n)
+    )
@@ -0,0 +1,256 @@
+from array import array
+from typing import Callable, Iterable, Optional
+
+from simulation.statistics import Summary, summarize
+from simulation.types import Time
+
+# Why a run stopped, besides the reason of a StopCondition
+STOP_MAX_DURATION = "max duration"
+STOP_NO_EVENTS = "no events"
+
+
+class StopCondition:
+    """
+    Decides after every executed event whether the run can stop
+    """
+
+    reason: str = "stop condition"
+
+    def before_run(self, sim: "DiscreteSimulation"):
+        """
+        Forget what was seen in earlier runs
+        """
+
+    def update(self, sim: "DiscreteSimulation", time: Time, event, state) -> bool:
+        raise NotImplementedError()
+
+
+class Predicate(StopCondition):
+    """
+    Stops as soon as a function of the state is true. With `keys`, it's only
+    evaluated after an event set one of them
+    """
+
+    reason = "predicate"
+
+    def __init__(
+        self,
+        predicate: Callable[["State"], bool],
+        keys: Optional[Iterable] = None,
+        reason: Optional[str] = None,
+    ):
+        self.predicate = predicate
+        self.keys = frozenset(keys) if keys is not None else None
+        if reason is not None:
+            self.reason = reason
+
+    def update(self, sim, time, event, state) -> bool:
+        if self.keys is not None and self.keys.isdisjoint(state.changes):
+            return False
+        return bool(self.predicate(state))
+
+
+class Observations:
+    """
+    Values an event set for one state key, with their times. Running sums of
+    the values and of the means of every `batch_size` of them are kept as
+    they come in, so the detectors don't go over all values again
+    """
+
+    def __init__(self, key, batch_size: int = 5):
+        self.key = key
+        self.batch_size = batch_size
+        self.clear()
+
+    def clear(self):
+        self.times = array("d")
+        self.values = array("d")
+        # Sums of the first i values, batch means and squared batch means
+        self.sums = array("d", [0.0])
+        self.mean_sums = array("d", [0.0])
+        self.square_sums = array("d", [0.0])
+
+    def update(self, time: Time, state) -> bool:
+        """
+        Whether there is a new observation
+        """
+        if self.key not in state.changes:
+            return False
+        value = state.changes[self.key]
+        self.times.append(time)
+        self.values.append(value)
+        sums = self.sums
+        sums.append(sums[-1] + value)
+        size = self.batch_size
+        if len(self.values) % size == 0:
+            mean = (sums[-1] - sums[-1 - size]) / size
+            self.mean_sums.append(self.mean_sums[-1] + mean)
+            self.square_sums.append(self.square_sums[-1] + mean * mean)
+        return True
+
+    def mser(self) -> Optional[int]:
+        """
+        Warm-up cutoff by the MSER rule, see `mser`
+        """
+        cutoff = _mser(self.mean_sums, self.square_sums)
+        return cutoff * self.batch_size if cutoff is not None else None
+
+    def batch_means(
+        self, start: int = 0, batches: int = 20, confidence: float = 0.95
+    ) -> Summary:
+        """
+        Like `batch_means` of the values from `start` on
+        """
+        return _batch_means(
+            self.sums, start, len(self.values), batches, confidence=confidence
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _prefix_sums(values) -> array:
+    sums = array("d", [0.0])
+    for value in values:
+        sums.append(sums[-1] + value)
+    return sums
+
+
+def _mser(mean_sums, square_sums) -> Optional[int]:
+    """
+    MSER cutoff in batches, from the running sums of the batch means and
+    their squares
+    """
+    batches = len(mean_sums) - 1
+    if batches < 2:
+        return None
+    total, squares = mean_sums[-1], square_sums[-1]
+    best, best_cutoff = float("inf"), 0
+    for d in range(batches // 2 + 1):
+        k = batches - d
+        rest = total - mean_sums[d]
+        error = (squares - square_sums[d] - rest * rest / k) / (k * k)
+        if error < best:
+            best, best_cutoff = error, d
+    return best_cutoff if best_cutoff < batches // 2 else None
+
+
+def mser(values, batch_size: int = 5) -> Optional[int]:
+    """
+    Number of leading values to drop as warm-up, by the MSER-5 rule: the
+    cutoff that minimizes the squared standard error of the mean of the rest,
+    over batches of 5. None while the minimum is in the second half, which
+    means the data doesn't show a steady state yet
+    """
+    batches = len(values) // batch_size
+    means = [
+        sum(values[i * batch_size : (i + 1) * batch_size]) / batch_size
+        for i in range(batches)
+    ]
+    cutoff = _mser(_prefix_sums(means), _prefix_sums(m * m for m in means))
+    return cutoff * batch_size if cutoff is not None else None
+
+
+def _batch_means(
+    sums, start: int, end: int, batches: int, confidence: float
+) -> Summary:
+    size = (end - start) // batches
+    if not size:
+        raise ValueError("Need at least {} values".format(batches))
+    start = end - size * batches
+    means = [
+        (sums[start + (i + 1) * size] - sums[start + i * size]) / size
+        for i in range(batches)
+    ]
+    return summarize(means, confidence=confidence)
+
+
+def batch_means(values, batches: int = 20, confidence: float = 0.95) -> Summary:
+    """
+    Confidence interval of the mean of correlated values, from the means of
+    consecutive batches. Leading values that don't fill a batch are dropped
+    """
+    return _batch_means(
+        _prefix_sums(values), 0, len(values), batches, confidence=confidence
+    )
+
+
+class SteadyState(StopCondition):
+    """
+    Stops when MSER-5 finds the end of the warm-up of a key, which is then
+    recorded as the warm-up cutoff of the simulation. Checked every
+    `check_every` observations
+    """
+
+    reason = "steady state"
+
+    def __init__(self, key, min_observations: int = 100, check_every: int = 50):
+        self.observations = Observations(key)
+        self.min_observations = min_observations
+        self.check_every = check_every
+
+    def before_run(self, sim):
+        self.observations.clear()
+
+    def update(self, sim, time, event, state) -> bool:
+        observations = self.observations
+        if not observations.update(time, state):
+            return False
+        n = len(observations)
+        if n < self.min_observations or n % self.check_every:
+            return False
+        cutoff = observations.mser()
+        if cutoff is None:
+            return False
+        sim.warmup_cutoff = observations.times[cutoff]
+        return True
+
+
+class Precision(StopCondition):
+    """
+    Stops when the batch means confidence interval of a key, after the
+    MSER-5 warm-up, is narrower than `relative` times its mean. Checked every
+    `check_every` observations
+    """
+
+    reason = "precision"
+    summary: Optional[Summary] = None
+
+    def __init__(
+        self,
+        key,
+        relative: float = 0.05,
+        confidence: float = 0.95,
+        batches: int = 20,
+        min_observations: int = 200,
+        check_every: int = 100,
+    ):
+        self.observations = Observations(key)
+        self.relative = relative
+        self.confidence = confidence
+        self.batches = batches
+        self.min_observations = max(min_observations, batches)
+        self.check_every = check_every
+
+    def before_run(self, sim):
+        self.observations.clear()
+        self.summary = None
+
+    def update(self, sim, time, event, state) -> bool:
+        observations = self.observations
+        if not observations.update(time, state):
+            return False
+        n = len(observations)
+        if n < self.min_observations or n % self.check_every:
+            return False
+        cutoff = observations.mser()
+        if cutoff is None or n - cutoff < self.min_observations:
+            return False
+        summary = observations.batch_means(
+            cutoff, batches=self.batches, confidence=self.confidence
+        )
+        if summary.relative_half_width > self.relative:
+            return False
+        self.summary = summary
+        sim.warmup_cutoff = observations.times[cutoff]
+        return True
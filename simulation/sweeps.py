@@ -0,0 +1,232 @@
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import pickle
+import random
+import sys
+import sysconfig
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from types import FunctionType, ModuleType
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from simulation.framework import DiscreteSimulation
+from simulation.replications import Reducer, derive_seeds, run_replication
+
+SweepFactory = Callable[..., DiscreteSimulation]  # Called as factory(seed, **params)
+
+
+class SweepResult(NamedTuple):
+    params: dict
+    seed: int
+    values: dict
+    key: str  # Cache key of the point and seed
+    cached: bool  # Whether the values came from the cache
+
+
+def grid(**axes: Sequence) -> List[dict]:
+    """
+    Every combination of the values of the axes
+    """
+    names = list(axes)
+    return [
+        dict(zip(names, combination))
+        for combination in itertools.product(*axes.values())
+    ]
+
+
+def sample(
+    n: int, seed: int = 0, **axes: Callable[[random.Random], object]
+) -> List[dict]:
+    """
+    n random points, with every axis drawn by a function of a random generator
+    such as `lambda rng: rng.uniform(0, 1)`
+    """
+    rng = random.Random(seed)
+    return [{name: draw(rng) for name, draw in axes.items()} for _ in range(n)]
+
+
+# Modules from these directories are the standard library or installed
+# packages, which don't change with the model
+LIBRARY_PATHS = tuple(
+    sorted(
+        {
+            os.path.realpath(sysconfig.get_paths()[name])
+            for name in ("stdlib", "platstdlib", "purelib", "platlib")
+        }
+    )
+)
+
+
+def _is_model_code(module: ModuleType) -> bool:
+    if module.__name__.partition(".")[0] == __name__.partition(".")[0]:
+        return True  # The engine itself, wherever it's installed
+    path = getattr(module, "__file__", None)
+    return path is not None and not os.path.realpath(path).startswith(LIBRARY_PATHS)
+
+
+def _model_modules(module: ModuleType) -> List[ModuleType]:
+    """
+    The module and every module of the model or the engine it imports,
+    directly or through the modules it imports
+    """
+    found = {}
+    todo = [module]
+    while todo:
+        current = todo.pop()
+        if current.__name__ in found:
+            continue
+        found[current.__name__] = current
+        for value in vars(current).values():
+            if isinstance(value, (type, FunctionType)):
+                value = sys.modules.get(value.__module__)
+            if isinstance(value, ModuleType) and _is_model_code(value):
+                todo.append(value)
+    return [found[name] for name in sorted(found)]
+
+
+def model_fingerprint(factory: SweepFactory) -> str:
+    """
+    Hash of the source of the module that defines the factory and of the
+    model and engine modules it imports, so results are invalidated when the
+    model or the engine changes. Imports inside functions aren't followed,
+    pass a version to sweeps that depend on them
+    """
+    module = inspect.getmodule(factory)
+    if module is None:
+        module = sys.modules.get(factory.__module__)
+    content = hashlib.sha256()
+    for m in _model_modules(module) if module is not None else []:
+        try:
+            source = inspect.getsource(m)
+        except (OSError, TypeError):
+            source = ""
+        content.update("{}\0{}\0".format(m.__name__, source).encode())
+    content.update("{}.{}".format(factory.__module__, factory.__qualname__).encode())
+    return content.hexdigest()
+
+
+def cache_key(params: dict, seed: int, version: str) -> str:
+    """
+    Content address of a result. Parameters have to be JSON values, anything
+    else has no stable content to address it by
+    """
+    try:
+        content = json.dumps(
+            {"params": params, "seed": seed, "version": version}, sort_keys=True
+        )
+    except TypeError as e:
+        raise TypeError(
+            "Sweep parameters have to be JSON values, pass numbers, strings, "
+            "lists or dicts and build other objects in the factory: {}".format(e)
+        )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Results on disk, one file per key
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], "{}.pickle".format(key))
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._file(key), "rb") as fp:
+                return pickle.load(fp)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key: str, values: dict):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as fp:
+            pickle.dump(values, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+
+def iter_sweep(
+    factory: SweepFactory,
+    points: Iterable[dict],
+    replications: int = 1,
+    seed: int = 0,
+    cache: Optional[str] = None,
+    version: Optional[str] = None,
+    workers: Optional[int] = None,
+    reducer: Optional[Reducer] = None,
+    keys: Optional[Sequence] = None,
+) -> Iterator[SweepResult]:
+    """
+    Run every point with the same seeds, yielding results as they finish.
+    Cached results come first; only the other runs are computed, on a
+    process pool, and cached as soon as they are done. Factory and reducer
+    have to be picklable, so module level functions
+    """
+    version = version if version is not None else model_fingerprint(factory)
+    results = ResultCache(cache) if cache is not None else None
+    seeds = derive_seeds(seed, replications)
+    todo = []
+    for params in points:
+        for s in seeds:
+            key = cache_key(params, s, version)
+            values = results.get(key) if results is not None else None
+            if values is not None:
+                yield SweepResult(params, s, values, key, cached=True)
+            else:
+                todo.append((params, s, key))
+
+    def done(params: dict, s: int, key: str, values: dict) -> SweepResult:
+        if results is not None:
+            results.put(key, values)
+        return SweepResult(params, s, values, key, cached=False)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for params, s, key in todo:
+            result = run_replication(partial(factory, **params), s, reducer, keys)
+            yield done(params, s, key, result.values)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                run_replication, partial(factory, **params), s, reducer, keys
+            ): (params, s, key)
+            for params, s, key in todo
+        }
+        for future in as_completed(futures):
+            yield done(*futures[future], future.result().values)
+
+
+def run_sweep(
+    factory: SweepFactory, points: Iterable[dict], **kwargs
+) -> List[SweepResult]:
+    """
+    All results of a sweep, in the order of the points and seeds
+    """
+    points = list(points)
+    position = {id(params): i for i, params in enumerate(points)}
+    seeds = derive_seeds(kwargs.get("seed", 0), kwargs.get("replications", 1))
+    seed_position = {s: i for i, s in enumerate(seeds)}
+    return sorted(
+        iter_sweep(factory, points, **kwargs),
+        key=lambda r: (position[id(r.params)], seed_position[r.seed]),
+    )
@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+from array import array
+from numbers import Real
+from typing import Dict, Iterable, List
+
+from simulation.framework import Step
+
+BINARY_TRACE_VERSION = 1
+
+# Column files of a binary trace with their array typecodes and NumPy dtypes
+EVENT_COLUMNS = {"time": ("d", "f8"), "event": ("I", "u4")}
+CHANGE_COLUMNS = {
+    "step": ("Q", "u8"),  # Index of the step that made the change
+    "key": ("I", "u4"),
+    "value": ("d", "f8"),
+}
+
+
+class TraceWriter:
+    """
+    Writes simulation steps to disk in batches, so traces of any length only
+    need a constant amount of memory
+    """
+
+    def __init__(self, path: str, batch_size: int = 4096):
+        self.path = path
+        self.batch_size = batch_size
+        self.steps = 0
+        self._pending = 0
+
+    def write(self, step: Step):
+        self._add(step)
+        self.steps += 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def write_all(self, steps: Iterable[Step]):
+        for step in steps:
+            self.write(step)
+
+    def _add(self, step: Step):
+        raise NotImplementedError
+
+    def flush(self):
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class JsonlTraceWriter(TraceWriter):
+    """
+    One JSON object per line for every step. Values that JSON doesn't know are
+    written as strings
+    """
+
+    def __init__(self, path: str, batch_size: int = 4096):
+        super(JsonlTraceWriter, self).__init__(path=path, batch_size=batch_size)
+        self._file = open(path, "w")
+        self._lines: List[str] = []
+
+    def _add(self, step: Step):
+        record = {
+            "time": step.time,
+            "event": step.event.name,
+            "id": step.event.id,
+            "changes": step.changes,
+        }
+        self._lines.append(json.dumps(record, default=str))
+
+    def flush(self):
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._lines = []
+        self._file.flush()
+        super(JsonlTraceWriter, self).flush()
+
+    def close(self):
+        super(JsonlTraceWriter, self).close()
+        self._file.close()
+
+
+class BinaryTraceWriter(TraceWriter):
+    """
+    Columnar trace in a directory: one file of fixed size values per column
+    plus a JSON header with the event and key names, so every column can be
+    memory mapped. Only numeric values can be stored
+    """
+
+    def __init__(self, path: str, batch_size: int = 4096):
+        super(BinaryTraceWriter, self).__init__(path=path, batch_size=batch_size)
+        os.makedirs(path, exist_ok=True)
+        self.events: Dict[str, int] = {}
+        self.keys: Dict[str, int] = {}
+        self.changes = 0
+        columns = {**EVENT_COLUMNS, **CHANGE_COLUMNS}
+        self._buffers = {c: array(t) for c, (t, _) in columns.items()}
+        self._files = {c: open(self._column_path(c), "wb") for c in columns}
+
+    def _column_path(self, column: str) -> str:
+        return os.path.join(self.path, "{}.bin".format(column))
+
+    @staticmethod
+    def _code(names: Dict[str, int], name) -> int:
+        try:
+            return names[name]
+        except KeyError:
+            names[name] = len(names)
+            return names[name]
+
+    def _add(self, step: Step):
+        # Check every value first, a refused step mustn't leave the columns
+        # with different lengths
+        for key, value in step.changes.items():
+            if not isinstance(value, Real):
+                raise TypeError(
+                    "Can't write {!r} of {} to a binary trace, use a JSONL "
+                    "trace for non numeric values".format(value, key)
+                )
+        self._buffers["time"].append(step.time)
+        self._buffers["event"].append(self._code(self.events, step.event.name))
+        for key, value in step.changes.items():
+            self._buffers["step"].append(self.steps)
+            self._buffers["key"].append(self._code(self.keys, str(key)))
+            self._buffers["value"].append(value)
+            self.changes += 1
+
+    def flush(self):
+        for column, buffer in self._buffers.items():
+            buffer.tofile(self._files[column])
+            del buffer[:]
+            self._files[column].flush()
+        self._write_header()
+        super(BinaryTraceWriter, self).flush()
+
+    def _write_header(self):
+        header = {
+            "version": BINARY_TRACE_VERSION,
+            "byteorder": sys.byteorder,
+            "steps": self.steps,
+            "changes": self.changes,
+            "events": list(self.events),
+            "keys": list(self.keys),
+            "columns": {
+                c: d for c, (_, d) in {**EVENT_COLUMNS, **CHANGE_COLUMNS}.items()
+            },
+        }
+        with open(os.path.join(self.path, "header.json"), "w") as fp:
+            json.dump(header, fp)
+
+    def close(self):
+        super(BinaryTraceWriter, self).close()
+        for fp in self._files.values():
+            fp.close()
+
+
+class BinaryTrace:
+    """
+    Memory mapped columns of a trace written by BinaryTraceWriter
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        with open(os.path.join(path, "header.json")) as fp:
+            header = json.load(fp)
+        if header["version"] != BINARY_TRACE_VERSION:
+            raise ValueError(
+                "Unsupported binary trace version {}".format(header["version"])
+            )
+        self.events: List[str] = header["events"]
+        self.keys: List[str] = header["keys"]
+        prefix = "<" if header["byteorder"] == "little" else ">"
+        self.columns = {}
+        for column, dtype in header["columns"].items():
+            dtype = np.dtype(prefix + dtype)
+            count = header["steps"] if column in EVENT_COLUMNS else header["changes"]
+            if not count:
+                # Empty files can't be memory mapped
+                self.columns[column] = np.empty(0, dtype=dtype)
+                continue
+            self.columns[column] = np.memmap(
+                os.path.join(path, "{}.bin".format(column)),
+                dtype=dtype,
+                mode="r",
+                shape=(count,),
+            )
+
+    def __getitem__(self, column: str):
+        return self.columns[column]
+
+    def values(self, key: str):
+        """
+        Times and values of every change to the given key
+        """
+        changes = self.columns["key"] == self.keys.index(key)
+        steps = self.columns["step"][changes]
+        return self.columns["time"][steps], self.columns["value"][changes]
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+
+class ActionTriggers:
+    """
+    Decides which actions need their readiness checked. Actions that declare
+    the state keys (`depends_on`) or event types (`triggered_by`) their
+    readiness depends on are only checked after one of those changed or
+    executed. Other actions are checked every time
+    """
+
+    def __init__(self, actions: List["Action"]):
+        self.actions = actions
+        self._always: List[int] = []
+        self._by_key: Dict[object, List[int]] = defaultdict(list)
+        self._by_event_type: Dict[type, List[int]] = defaultdict(list)
+        for position, action in enumerate(actions):
+            if action.depends_on is None and not action.triggered_by:
+                self._always.append(position)
+                continue
+            for key in action.depends_on or ():
+                self._by_key[key].append(position)
+            for event_type in action.triggered_by:
+                self._by_event_type[event_type].append(position)
+        self._check_all = True
+        self._dirty_keys: Set = set()
+        self._executed_types: Set[type] = set()
+
+    def mark(self, event: "Event", changes: Iterable):
+        """
+        Register an executed event and the state keys it set
+        """
+        self._dirty_keys.update(changes)
+        self._executed_types.add(type(event))
+
+    def due(self) -> List["Action"]:
+        """
+        Actions to check, in the order of the available actions
+        """
+        if self._check_all or len(self._always) == len(self.actions):
+            self._check_all = False
+            self._dirty_keys.clear()
+            self._executed_types.clear()
+            return self.actions
+        positions = set(self._always)
+        for key in self._dirty_keys:
+            positions.update(self._by_key.get(key, ()))
+        for executed_type in self._executed_types:
+            for cls in executed_type.__mro__:
+                positions.update(self._by_event_type.get(cls, ()))
+        self._dirty_keys.clear()
+        self._executed_types.clear()
+        return [self.actions[p] for p in sorted(positions)]
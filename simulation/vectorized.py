@@ -0,0 +1,214 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from simulation.framework import Action, DiscreteSimulation, Event, logger
+from simulation.replications import (
+    ReplicationResult,
+    Replications,
+    run_replications,
+)
+from simulation.types import Time
+
+
+class VectorState:
+    """
+    Values of all lanes of a lockstep simulation, one array element per lane
+    """
+
+    values: Dict[str, np.ndarray] = None
+
+    def __init__(self, values: dict, lanes: int, rng: np.random.Generator):
+        self.lanes = lanes
+        self.rng = rng
+        self.values = {k: np.full(lanes, v) for k, v in values.items()}
+
+    def get(self, key, default=None) -> np.ndarray:
+        return self.values.get(key, default)
+
+    def set(self, key, value, mask: Optional[np.ndarray] = None) -> "VectorState":
+        """
+        Set the value for the lanes in the mask, or all lanes without one
+        """
+        if mask is None:
+            self.values[key] = np.broadcast_to(value, (self.lanes,)).copy()
+        else:
+            self.values[key] = np.where(mask, value, self.values[key])
+        return self
+
+    def lane(self, index: int) -> dict:
+        return {k: v[index].item() for k, v in self.values.items()}
+
+
+class VectorTimeline:
+    """
+    Clock and planned actions of every lane
+    """
+
+    def __init__(self, lanes: int):
+        self.lanes = lanes
+        self.current_time = np.zeros(lanes)
+        self._planned: Dict[type, np.ndarray] = {}
+
+    def plan_action(self, action: Action, mask: np.ndarray):
+        for cls in type(action).__mro__:
+            planned = self._planned.setdefault(cls, np.full(self.lanes, -np.inf))
+            planned[mask] = self.current_time[mask]
+
+    def action_already_planned(self, action: Action) -> np.ndarray:
+        # Actions are always planned at the current time of their lane, so
+        # they are to come for as long as the lane's clock doesn't move
+        try:
+            return self._planned[action.__class__] >= self.current_time
+        except KeyError:
+            return np.zeros(self.lanes, dtype=bool)
+
+
+class VectorizedSimulation:
+    """
+    Runs many replications of one model in lockstep, with the state of every
+    replication in a lane of NumPy arrays. Every action needs a
+    `vector_ready(state, timeline)` that returns a boolean array with the
+    lanes it's ready in, and every event a `vector_hook(state, mask)` that
+    only updates the lanes in the mask. Each lane follows the same steps as a
+    DiscreteSimulation would
+    """
+
+    def __init__(
+        self,
+        max_duration: Time,
+        available_actions: List[Action],
+        lanes: int,
+        initial_values: Optional[dict] = None,
+        seed: Optional[int] = None,
+        capacity: int = 8,
+    ):
+        if not self.supports(available_actions):
+            raise TypeError("Not every action and event has a vectorized hook")
+        self.max_duration = max_duration
+        self.actions = sorted(available_actions, reverse=True, key=lambda a: a.weight)
+        self.lanes = lanes
+        self.state = VectorState(
+            values=initial_values or {},
+            lanes=lanes,
+            rng=np.random.default_rng(seed),
+        )
+        self.timeline = VectorTimeline(lanes=lanes)
+        self.kinds: List[Event] = []
+        self._kind_of: Dict[int, int] = {}
+        for action in self.actions:
+            for _, event in action.events:
+                if id(event) not in self._kind_of:
+                    self._kind_of[id(event)] = len(self.kinds)
+                    self.kinds.append(event)
+        self._seq = 0
+        self._times = np.full((lanes, capacity), np.inf)
+        self._kinds = np.full((lanes, capacity), -1)
+        self._weights = np.zeros((lanes, capacity))
+        self._seqs = np.zeros((lanes, capacity), dtype=np.int64)
+        self.events_executed = 0
+
+    @staticmethod
+    def supports(actions: Sequence[Action]) -> bool:
+        return all(
+            getattr(a, "vector_ready", None) is not None
+            and all(getattr(e, "vector_hook", None) is not None for _, e in a.events)
+            for a in actions
+        )
+
+    def _grow(self):
+        lanes, capacity = self._times.shape
+        self._times = np.hstack([self._times, np.full((lanes, capacity), np.inf)])
+        self._kinds = np.hstack([self._kinds, np.full((lanes, capacity), -1)])
+        self._weights = np.hstack([self._weights, np.zeros((lanes, capacity))])
+        self._seqs = np.hstack([self._seqs, np.zeros((lanes, capacity), np.int64)])
+
+    def schedule_action(self, action: Action, mask: np.ndarray):
+        self.timeline.plan_action(action, mask)
+        lanes = np.flatnonzero(mask)
+        for td, event in action.events:
+            free = self._times[lanes] == np.inf
+            if not free.any(axis=1).all():
+                self._grow()
+                free = self._times[lanes] == np.inf
+            slots = free.argmax(axis=1)
+            self._times[lanes, slots] = self.timeline.current_time[lanes] + td
+            self._kinds[lanes, slots] = self._kind_of[id(event)]
+            self._weights[lanes, slots] = event.weight
+            self._seqs[lanes, slots] = self._seq
+            self._seq += 1
+
+    def _next_events(self):
+        """
+        Slot of the next event of every lane: earliest time, then highest
+        weight, then first scheduled
+        """
+        times = self._times.min(axis=1)
+        candidates = self._times == times[:, None]
+        weights = np.where(candidates, self._weights, -np.inf).max(axis=1)
+        candidates &= self._weights == weights[:, None]
+        seqs = np.where(candidates, self._seqs, np.iinfo(np.int64).max)
+        return times, seqs.argmin(axis=1)
+
+    def run(self) -> VectorState:
+        logger.info(
+            "Starting {} lanes with duration {}".format(self.lanes, self.max_duration)
+        )
+        running = self.timeline.current_time < self.max_duration
+        all_lanes = np.arange(self.lanes)
+        while running.any():
+            for action in self.actions:
+                ready = running & action.vector_ready(
+                    state=self.state, timeline=self.timeline
+                )
+                if ready.any():
+                    self.schedule_action(action, ready)
+
+            times, slots = self._next_events()
+            running &= times <= self.max_duration
+            kinds = self._kinds[all_lanes, slots]
+            for kind, event in enumerate(self.kinds):
+                mask = running & (kinds == kind)
+                if mask.any():
+                    self.state = event.vector_hook(state=self.state, mask=mask)
+            self.events_executed += int(running.sum())
+            self._times[all_lanes[running], slots[running]] = np.inf
+            self.timeline.current_time = np.where(
+                running, times, self.timeline.current_time
+            )
+            running &= self.timeline.current_time < self.max_duration
+        return self.state
+
+
+def run_lockstep(
+    factory: Callable[[int], DiscreteSimulation],
+    n: int,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    keys: Optional[Sequence] = None,
+) -> Replications:
+    """
+    Run n replications of a model in lockstep if all of its actions and events
+    are vectorized, and on the scalar engine otherwise. All lanes draw from one
+    generator seeded with the seed, so they have no seeds of their own and the
+    seed of each lockstep result is its lane index instead
+    """
+    sim = factory(seed)
+    if not VectorizedSimulation.supports(sim.available_actions):
+        logger.info("Model isn't vectorized, running replications one by one")
+        return run_replications(factory, n=n, seed=seed, workers=workers, keys=keys)
+    vectorized = VectorizedSimulation(
+        max_duration=sim.max_duration,
+        available_actions=sim.available_actions,
+        lanes=n,
+        initial_values=sim.timeline.current_state.values,
+        seed=seed,
+    )
+    state = vectorized.run()
+    results = []
+    for lane in range(n):
+        values = state.lane(lane)
+        if keys is not None:
+            values = {k: values[k] for k in keys if k in values}
+        results.append(ReplicationResult(seed=lane, values=values))
+    return Replications(results=results)
@@ -1,6 +1,10 @@
-from typing import OrderedDict
+from random import randint
+from typing import Optional, OrderedDict
 from unittest import TestCase as UnitTestCase
 
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.types import Time, Timedelta
+
 
 class TestCase(UnitTestCase):
     @staticmethod
@@ -16,3 +20,65 @@ class TestCase(UnitTestCase):
         if errors:
             raise AssertionError(", ".join(errors))
         return True
+
+    def assertTimeslotsMatch(self, timeslots: OrderedDict, expected: OrderedDict):
+        """
+        Timeslots hold instances of the expected prototypes, in the same order
+        """
+
+        def describe(timeslot) -> list:
+            return [(type(i), i.name, i.weight) for i in timeslot.to_list()]
+
+        self.assertListEqual(list(timeslots), list(expected))
+        for time, timeslot in expected.items():
+            self.assertListEqual(describe(timeslots[time]), describe(timeslot))
+
+
+class RepeatAction(Action):
+    """
+    Starts again as soon as it isn't planned anymore
+    """
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+class FillEvent(Event):
+    """
+    Pours water into the bucket, one unit at a time
+    """
+
+    def amount(self, state) -> int:
+        return 1
+
+    def hook(self, state, *args, **kwargs):
+        return state.set("water", state.get("water") + self.amount(state))
+
+
+class RandomFillEvent(FillEvent):
+    """
+    Pours 1 to 10 units, times the rate if the state has one
+    """
+
+    def amount(self, state) -> int:
+        return state.get("rate", 1) * randint(1, 10)
+
+
+def water_sim(
+    event: Optional[Event] = None,
+    every: Timedelta = 1,
+    max_duration: Time = 20,
+    initial_values: Optional[dict] = None,
+    **kwargs
+) -> DiscreteSimulation:
+    """
+    Bucket that `event` fills every `every` time units, a FillEvent by default
+    """
+    values = {"water": 0}
+    values.update(initial_values or {})
+    return DiscreteSimulation(
+        max_duration=max_duration,
+        available_actions=[RepeatAction(events=[(every, event or FillEvent())])],
+        initial_values=values,
+        **kwargs
+    )
@@ -8,6 +8,7 @@ from simulation.framework import (
     State,
     Timeslot,
 )
+from simulation.queues import CalendarEventQueue
 from tests.helpers import TestCase
 
 
@@ -49,7 +50,7 @@ class TestSimulationFramework(TestCase):
 
     def test_events_are_tracked_on_timeline(self):
         self.sim.run()
-        self.assertOrderedDictEqual(
+        self.assertTimeslotsMatch(
             self.sim.timeline.events,
             OrderedDict(
                 {
@@ -69,7 +70,7 @@ class TestSimulationFramework(TestCase):
 
     def test_actions_are_added_to_timeline(self):
         self.sim.run()
-        self.assertOrderedDictEqual(
+        self.assertTimeslotsMatch(
             self.sim.timeline.actions,
             OrderedDict(
                 {
@@ -87,7 +88,7 @@ class TestSimulationFramework(TestCase):
         a2 = Action(weight=100, events=[(3, e2)], name="high weight action")
         self.sim.available_actions = [a1, a2]
         self.sim.run()
-        self.assertOrderedDictEqual(
+        self.assertTimeslotsMatch(
             self.sim.timeline.events,
             OrderedDict(
                 {
@@ -112,3 +113,16 @@ class TestSimulationFramework(TestCase):
         first_state = self.sim.timeline.states[0]
         second_state = self.sim.timeline.states[3]
         self.assertNotEqual(first_state.values, second_state.values)
+
+    def test_calendar_queue_gives_same_results_as_heap_queue(self):
+        sim = DiscreteSimulation(
+            max_duration=8,
+            available_actions=[self.action],
+            queue_factory=CalendarEventQueue,
+        )
+        sim.run()
+        self.sim.run()
+        self.assertTimeslotsMatch(sim.timeline.events, self.sim.timeline.events)
+        self.assertDictEqual(
+            sim.timeline.current_state.values, self.sim.timeline.current_state.values
+        )
@@ -0,0 +1,48 @@
+import os
+from tempfile import TemporaryDirectory
+
+from benchmarks.models import synthetic_simulation, synthetic_workload
+from benchmarks.runner import (
+    compare,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+from tests.helpers import TestCase
+
+
+class TestSyntheticModel(TestCase):
+    def test_pending_events_are_kept_planned(self):
+        sim = synthetic_simulation(action_types=2, pending=5)
+        steps = sim.iter_run()
+        for _ in range(20):
+            next(steps)
+        self.assertEqual(len(sim.timeline.planned_events), 9)
+
+    def test_state_size(self):
+        sim = synthetic_simulation(state_size=10)
+        self.assertEqual(len(sim.timeline.current_state.values), 10)
+
+
+class TestRunner(TestCase):
+    def test_results_cover_every_phase(self):
+        (result,) = run_benchmarks([synthetic_workload(50)], repeat=1)
+        self.assertEqual(result.name, "synthetic[events=50]")
+        self.assertGreater(result.events_per_second, 0)
+        self.assertGreater(result.peak_memory, 0)
+        self.assertTrue(
+            {"find actions", "schedule", "next event", "apply", "record"}
+            <= set(result.phases)
+        )
+
+    def test_compare_saved_runs(self):
+        results = run_benchmarks(
+            [synthetic_workload(20), synthetic_workload(20, pending=2)], repeat=1
+        )
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            save_results(results, path)
+            loaded = load_results(path)
+        comparisons = compare(old=loaded, new=results[:1])
+        self.assertEqual(len(comparisons), 1)
+        self.assertAlmostEqual(comparisons[0].change, 0)
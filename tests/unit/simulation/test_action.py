@@ -0,0 +1,26 @@
+from unittest.mock import Mock
+
+from simulation.framework import Action, Event
+from tests.helpers import TestCase
+
+
+class TestAction(TestCase):
+    def test_instantiated_action_has_its_own_events(self):
+        e = Event(hook=Mock())
+        a = Action(events=[(3, e)])
+        instance = a.instantiate()
+        self.assertIsNot(instance.events, a.events)
+        self.assertIsNot(instance.events[0][1], e)
+        self.assertNotEqual(instance.events[0][1].id, e.id)
+        self.assertEqual(instance.events[0][0], 3)
+
+    def test_deepcopied_action_instances_have_their_own_events(self):
+        class DeepAction(Action):
+            deepcopy_instances = True
+
+        e = Event(hook=Mock())
+        a = DeepAction(events=[(3, e)])
+        instance = a.instantiate()
+        self.assertIsNot(instance.events[0][1], e)
+        self.assertNotEqual(instance.events[0][1].id, e.id)
+        self.assertNotEqual(instance.id, a.id)
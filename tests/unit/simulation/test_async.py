@@ -0,0 +1,255 @@
+import asyncio
+import random
+
+from simulation.aio import AsyncDiscreteSimulation
+from simulation.batching import OverlayState
+from simulation.forks import run_forks
+from simulation.framework import Action, DiscreteSimulation, Event, State
+from simulation.replications import run_replication
+from tests.helpers import TestCase
+
+
+class InFlight:
+    current = 0
+    peak = 0
+
+
+class MachineEvent(Event):
+    """
+    Finishes a part on its own machine
+    """
+
+    concurrent = True
+    key: str = None
+
+    def hook(self, state, *args, **kwargs):
+        return state.set(self.key, state.get(self.key) + 1)
+
+
+class AsyncMachineEvent(MachineEvent):
+    async def hook(self, state, *args, **kwargs):
+        InFlight.current += 1
+        InFlight.peak = max(InFlight.peak, InFlight.current)
+        await asyncio.sleep(0.001)
+        InFlight.current -= 1
+        return state.set(self.key, state.get(self.key) + 1)
+
+
+class RandomAsyncMachineEvent(MachineEvent):
+    async def hook(self, state, *args, **kwargs):
+        await asyncio.sleep(0.001)
+        return state.set(self.key, state.get(self.key) + random.randint(1, 1000))
+
+
+class RandomMachineEvent(MachineEvent):
+    def hook(self, state, *args, **kwargs):
+        return state.set(self.key, state.get(self.key) + random.randint(1, 1000))
+
+
+class SerialAsyncMachineEvent(AsyncMachineEvent):
+    concurrent = False
+
+
+class ChainEvent(MachineEvent):
+    """
+    Starts from what the machine before it made, without declaring it
+    """
+
+    previous: str = None
+
+    def hook(self, state, *args, **kwargs):
+        return state.set(self.key, state.get(self.previous) + 1)
+
+
+class DeclaredChainEvent(AsyncMachineEvent):
+    previous: str = None
+
+    async def hook(self, state, *args, **kwargs):
+        await super(DeclaredChainEvent, self).hook(state)
+        return state.set(self.key, state.get(self.previous) + 1)
+
+
+class TotalEvent(Event):
+    """
+    Reads what the machines made, so it can't run alongside them
+    """
+
+    def hook(self, state, *args, **kwargs):
+        return state.set("total", sum(state.get("m{}".format(i)) for i in range(8)))
+
+
+class ShiftAction(Action):
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+def shift_model(engine: type, machine: type, **kwargs):
+    machines = [
+        type("Machine{}".format(i), (machine,), {"key": "m{}".format(i)})()
+        for i in range(8)
+    ]
+    events = [(1, e) for e in machines[:4]] + [(1, TotalEvent())]
+    events += [(1, e) for e in machines[4:]]
+    return engine(
+        max_duration=3,
+        available_actions=[ShiftAction(events=events)],
+        initial_values={"total": 0, **{"m{}".format(i): 0 for i in range(8)}},
+        quiet=True,
+        **kwargs
+    )
+
+
+def chain_model(engine: type, machine: type, declare: bool = False):
+    machines = []
+    for i in range(1, 4):
+        key, previous = "m{}".format(i), "m{}".format(i - 1)
+        attributes = {"key": key, "previous": previous}
+        if declare:
+            attributes.update(reads=(previous,), writes=(key,))
+        machines.append(type("Machine{}".format(i), (machine,), attributes)())
+    return engine(
+        max_duration=3,
+        available_actions=[ShiftAction(events=[(1, e) for e in machines])],
+        initial_values={"m{}".format(i): 0 for i in range(4)},
+        quiet=True,
+    )
+
+
+def async_shift_model(seed: int) -> AsyncDiscreteSimulation:
+    return shift_model(AsyncDiscreteSimulation, AsyncMachineEvent)
+
+
+def add_total(sim: DiscreteSimulation, total: int):
+    sim.timeline.current_state.set("total", total)
+
+
+async def collect(sim: AsyncDiscreteSimulation) -> list:
+    return [(step.time, step.event.name) async for step in sim.iter_run_async()]
+
+
+class TestOverlayState(TestCase):
+    def test_reads_through_and_keeps_changes_apart(self):
+        base = State(values={"a": 1, "b": 2})
+        overlay = OverlayState(base)
+        overlay.set("a", 10)
+
+        self.assertEqual(overlay.get("a"), 10)
+        self.assertEqual(overlay.get("b"), 2)
+        self.assertEqual(overlay.values, {"a": 10, "b": 2})
+        self.assertEqual(overlay.changes, {"a": 10})
+        self.assertEqual(base.values, {"a": 1, "b": 2})
+
+
+class TestAsyncSimulation(TestCase):
+    def setUp(self):
+        InFlight.current = InFlight.peak = 0
+
+    def test_matches_sync_engine(self):
+        expected_sim = shift_model(DiscreteSimulation, MachineEvent)
+        expected = [(s.time, s.event.name) for s in expected_sim.iter_run()]
+
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent)
+        steps = asyncio.run(collect(sim))
+
+        self.assertEqual(steps, expected)
+        self.assertEqual(
+            sim.timeline.current_state.values,
+            expected_sim.timeline.current_state.values,
+        )
+        self.assertEqual(sim.timeline.current_state.get("total"), 12)
+
+    def test_runs_concurrent_hooks_together(self):
+        asyncio.run(shift_model(AsyncDiscreteSimulation, AsyncMachineEvent).run_async())
+
+        self.assertEqual(InFlight.peak, 4)  # Up to the event that reads them
+
+    def test_concurrency_is_bounded(self):
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent, max_concurrency=2)
+        asyncio.run(sim.run_async())
+
+        self.assertEqual(InFlight.peak, 2)
+        self.assertEqual(sim.timeline.current_state.get("total"), 12)
+
+    def test_batch_size_is_bounded(self):
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent, max_batch=3)
+        asyncio.run(sim.run_async())
+
+        self.assertEqual(InFlight.peak, 3)
+        self.assertEqual(sim.timeline.current_state.get("total"), 12)
+
+    def test_other_coroutine_hooks_run_one_at_a_time(self):
+        sim = shift_model(AsyncDiscreteSimulation, SerialAsyncMachineEvent)
+        asyncio.run(sim.run_async())
+
+        self.assertEqual(InFlight.peak, 1)
+        self.assertEqual(sim.timeline.current_state.get("total"), 12)
+
+    def test_same_time_event_with_higher_weight_runs_first(self):
+        late_total = TotalEvent(weight=10)
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent)
+        sim.timeline.schedule_event(late_total, time=1)
+        steps = asyncio.run(collect(sim))
+
+        self.assertEqual(steps[0], (1, "TotalEvent"))
+        self.assertEqual(steps[1][0], 1)
+        self.assertEqual(sim.timeline.current_state.get("total"), 12)
+
+    def test_random_hooks_run_one_at_a_time(self):
+        random.seed(3)
+        expected_sim = shift_model(DiscreteSimulation, RandomMachineEvent)
+        expected = [(s.time, s.event.name, s.changes) for s in expected_sim.iter_run()]
+        after = random.random()
+        random.seed(3)
+        sim = shift_model(AsyncDiscreteSimulation, RandomAsyncMachineEvent)
+
+        async def steps() -> list:
+            return [
+                (s.time, s.event.name, s.changes) async for s in sim.iter_run_async()
+            ]
+
+        self.assertEqual(asyncio.run(steps()), expected)
+        self.assertEqual(random.random(), after)
+        self.assertTrue(sim.serial_types)
+        for serial_type in sim.serial_types:
+            self.assertTrue(issubclass(serial_type, RandomAsyncMachineEvent))
+
+    def test_runs_without_an_event_loop(self):
+        expected_sim = shift_model(DiscreteSimulation, MachineEvent)
+        expected = [(s.time, s.event.name) for s in expected_sim.iter_run()]
+
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent)
+        steps = [(s.time, s.event.name) for s in sim.iter_run()]
+        final = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent).run()
+
+        self.assertEqual(steps, expected)
+        self.assertEqual(final.values, expected_sim.timeline.current_state.values)
+        self.assertEqual(InFlight.peak, 4)
+
+    def test_can_be_forked_and_replicated(self):
+        sim = shift_model(AsyncDiscreteSimulation, AsyncMachineEvent)
+        fork = sim.fork()
+        fork.run()
+        results = run_forks(sim, [100, 200], add_total, keys=["m0"], workers=1)
+        replication = run_replication(async_shift_model, seed=1, keys=["total"])
+
+        self.assertEqual(fork.timeline.current_state.get("total"), 12)
+        self.assertEqual(results, [{"m0": 3}, {"m0": 3}])
+        self.assertEqual(replication.values, {"total": 12})
+
+    def test_hooks_that_read_earlier_changes_run_again(self):
+        expected = chain_model(DiscreteSimulation, ChainEvent)
+        expected.run()
+        sim = chain_model(AsyncDiscreteSimulation, ChainEvent)
+        asyncio.run(sim.run_async())
+
+        self.assertEqual(
+            sim.timeline.current_state.values, expected.timeline.current_state.values
+        )
+        self.assertEqual(sim.timeline.current_state.get("m3"), 3)
+
+    def test_declared_reads_keep_hooks_apart(self):
+        sim = chain_model(AsyncDiscreteSimulation, DeclaredChainEvent, declare=True)
+        sim.run()
+
+        self.assertEqual(InFlight.peak, 1)
+        self.assertEqual(sim.timeline.current_state.get("m3"), 3)
@@ -1,6 +1,13 @@
 from copy import deepcopy
 
-from simulation.framework import BaseSimObject
+from simulation.framework import (
+    Action,
+    BaseSimObject,
+    DiscreteSimulation,
+    Event,
+    IdCounter,
+    uuid_id,
+)
 from tests.helpers import TestCase
 
 
@@ -54,3 +61,136 @@ class TestBaseSimObject(TestCase):
         o2 = BaseSimObject(name="test")
         o2.id = o1.id
         self.assertNotEqual(o1, o2)
+
+    def test_instances_get_fresh_ids(self):
+        o1 = BaseSimObject(name="test")
+        o2, o3 = o1.instantiate(), o1.instantiate()
+        self.assertEqual(o2.name, o1.name)
+        self.assertNotEqual(o2, o1)
+        self.assertNotEqual(o2, o3)
+
+    def test_instances_take_ids_from_the_given_counter(self):
+        ids = IdCounter(start=1000)
+        self.assertEqual(BaseSimObject().instantiate(ids).id, 1000)
+        self.assertEqual(ids.next_id, 1001)
+
+    def test_instances_share_attributes_with_their_prototype(self):
+        o1 = BaseSimObject()
+        o1.data = [1, 2, 3]
+        self.assertIs(o1.instantiate().data, o1.data)
+
+    def test_objects_can_opt_out_of_shared_attributes(self):
+        class TestSimClass(BaseSimObject):
+            deepcopy_instances = True
+
+        o1 = TestSimClass()
+        o1.data = [1, 2, 3]
+        o2 = o1.instantiate()
+        self.assertNotEqual(o1.id, o2.id)
+        self.assertIsNot(o2.data, o1.data)
+        self.assertListEqual(o2.data, o1.data)
+
+    def test_ids_are_increasing_integers(self):
+        o1 = BaseSimObject()
+        o2 = BaseSimObject()
+        self.assertIsInstance(o1.id, int)
+        self.assertGreater(o2.id, o1.id)
+
+    def test_objects_are_hashable_by_id(self):
+        o1 = BaseSimObject()
+        o2 = BaseSimObject()
+        instances = {o1.instantiate() for _ in range(3)}
+        self.assertEqual(len({o1, o2, *instances}), 5)
+        self.assertSetEqual({o1, o2, deepcopy(o1)}, {o1, o2})
+        self.assertEqual(hash(o1), hash(o1.id))
+
+    def test_id_factory_can_be_overridden(self):
+        class TestSimClass(BaseSimObject):
+            id_factory = uuid_id
+
+        self.assertIsInstance(TestSimClass().id, str)
+        self.assertEqual(len(TestSimClass().id), 36)
+        self.assertIsInstance(TestSimClass().instantiate(IdCounter()).id, str)
+
+    def test_id_counter_skips_used_ids(self):
+        counter = IdCounter()
+        counter.skip_past(10)
+        self.assertEqual(counter(), 11)
+        counter.skip_past(5)
+        self.assertEqual(counter(), 12)
+
+    def test_class_level_defaults_are_kept(self):
+        class TestSimClass(BaseSimObject):
+            name = "Class name"
+            weight = 3
+
+        o = TestSimClass().instantiate()
+        self.assertEqual(o.name, "Class name")
+        self.assertEqual(o.weight, 3)
+
+    def test_slotted_subclasses_have_no_dict(self):
+        class TestSimClass(BaseSimObject):
+            __slots__ = ()
+
+        o1 = TestSimClass(name="test", weight=2)
+        o2 = o1.instantiate()
+        self.assertDictEqual(o2.__dict__, {})
+        self.assertEqual((o2.name, o2.weight), ("test", 2))
+
+
+class TickEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state
+
+
+class TickAction(Action):
+    events = [(1, TickEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+class EchoAction(TickAction):
+    """
+    Also schedules an event of its own, created outside of instantiate
+    """
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        ready = super(EchoAction, self).ready_to_start(timeline)
+        if ready:
+            timeline.schedule_event(TickEvent(), time=timeline.current_time + 1)
+        return ready
+
+
+class TestSimulationIds(TestCase):
+    def tick_sim(self, action: Action) -> DiscreteSimulation:
+        return DiscreteSimulation(
+            max_duration=5, available_actions=[action], quiet=True
+        )
+
+    def test_executed_instances_are_distinct(self):
+        sim = self.tick_sim(TickAction())
+        sim.run()
+        executed = [e for _, e in sim.timeline.events_between(0, 5, executed=True)]
+        self.assertEqual(len(executed), 5)
+        self.assertEqual(len(set(executed)), 5)
+
+    def test_simulations_dont_reuse_ids(self):
+        action = TickAction()
+        first, second = self.tick_sim(action), self.tick_sim(action)
+        first.run()
+        second.run()
+        ids = [
+            e.id
+            for sim in (first, second)
+            for _, e in sim.timeline.events_between(0, 5)
+        ]
+        self.assertEqual(len(set(ids)), 10)
+        self.assertGreater(min(ids), action.events[0][1].id)
+
+    def test_created_events_dont_share_ids_with_instances(self):
+        sim = self.tick_sim(EchoAction())
+        sim.run()
+        events = [e for _, e in sim.timeline.events_between(0, 6)]
+        self.assertEqual(len(events), 10)
+        self.assertEqual(len({e.id for e in events}), 10)
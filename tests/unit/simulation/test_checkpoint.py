@@ -0,0 +1,110 @@
+import os
+import random
+from functools import partial
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from simulation.checkpoint import CheckpointError, read_checkpoint, write_checkpoint
+from simulation.framework import BaseSimObject, DiscreteSimulation
+from simulation.history import CheckpointHistory
+from simulation.queues import CalendarEventQueue
+from tests.helpers import RandomFillEvent, TestCase, water_sim
+
+
+def random_sim(**kwargs) -> DiscreteSimulation:
+    return water_sim(RandomFillEvent(), **kwargs)
+
+
+class TestCheckpointFile(TestCase):
+    def test_arrays_are_written_out_of_band(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "array.ckpt")
+            write_checkpoint({"levels": np.arange(1000.0)}, path)
+            restored = read_checkpoint(path)
+        np.testing.assert_array_equal(restored["levels"], np.arange(1000.0))
+
+    def test_other_files_are_refused(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "other.ckpt")
+            with open(path, "wb") as fp:
+                fp.write(b"not a checkpoint at all")
+            with self.assertRaises(CheckpointError):
+                read_checkpoint(path)
+
+
+class TestSimulationCheckpoint(TestCase):
+    def test_restored_simulation_continues_identically(self):
+        random.seed(42)
+        expected = random_sim().run().values
+
+        random.seed(42)
+        sim = random_sim()
+        steps = sim.iter_run()
+        for _ in range(7):
+            next(steps)
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sim.ckpt")
+            sim.checkpoint(path)
+            random.seed(0)  # Restoring brings back the random state as well
+            restored = DiscreteSimulation.restore(path)
+        self.assertEqual(restored.timeline.current_time, 7)
+        self.assertDictEqual(restored.run().values, expected)
+        self.assertEqual(len(restored.timeline.states), 21)
+
+    def test_calendar_queue_can_be_restored(self):
+        random.seed(1)
+        sim = random_sim(queue_factory=CalendarEventQueue)
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sim.ckpt")
+            sim.checkpoint(path)
+            restored = DiscreteSimulation.restore(path)
+        random.seed(1)
+        expected = sim.run().values
+        random.seed(1)
+        self.assertDictEqual(restored.run().values, expected)
+
+    def test_periodic_checkpoints(self):
+        random.seed(3)
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sim.ckpt")
+            sim = random_sim(
+                checkpoint_every=5,
+                checkpoint_path=path,
+                history_factory=partial(
+                    CheckpointHistory, every=5, retention="last", keep=5
+                ),
+            )
+            sim.run()
+            restored = DiscreteSimulation.restore(path)
+        self.assertEqual(restored.timeline.current_time, 20)
+        self.assertDictEqual(
+            restored.timeline.current_state.values, sim.timeline.current_state.values
+        )
+
+    def test_periodic_checkpoints_need_a_path(self):
+        with self.assertRaises(ValueError):
+            random_sim(checkpoint_every=5)
+
+    def test_periodic_checkpoints_need_a_bounded_history(self):
+        with self.assertRaisesRegex(ValueError, "CheckpointHistory.*FullHistory"):
+            random_sim(checkpoint_every=5, checkpoint_path="sim.ckpt")
+        with self.assertRaises(ValueError):
+            random_sim(
+                checkpoint_every=5,
+                checkpoint_path="sim.ckpt",
+                history_factory=CheckpointHistory,
+            )
+
+    def test_restored_ids_are_not_reused(self):
+        sim = random_sim()
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sim.ckpt")
+            sim.checkpoint(path)
+            next_id = BaseSimObject.id_factory.next_id
+            self.addCleanup(setattr, BaseSimObject.id_factory, "next_id", next_id)
+            BaseSimObject.id_factory.next_id = 1  # As in a fresh process
+            restored = DiscreteSimulation.restore(path)
+        self.assertGreater(
+            BaseSimObject.id_factory.next_id, restored.available_actions[0].id
+        )
@@ -1,7 +1,7 @@
 from copy import deepcopy
 from unittest.mock import Mock
 
-from simulation.framework import Event
+from simulation.framework import Event, State
 from tests.helpers import TestCase
 
 
@@ -9,3 +9,36 @@ class TestEvent(TestCase):
     def test_copied_events_are_equal(self):
         e = Event(name="testevent", hook=Mock())
         self.assertEqual(e, deepcopy(e))
+
+    def test_instantiated_events_are_not_equal(self):
+        e = Event(name="testevent", hook=Mock())
+        instance = e.instantiate()
+        self.assertNotEqual(e, instance)
+        self.assertEqual(instance.name, "testevent")
+        self.assertIs(instance.hook, e.hook)
+
+    def test_instantiated_event_hook_is_bound_to_instance(self):
+        class TestEvent(Event):
+            def hook(self, state, *args, **kwargs):
+                return self
+
+        e = TestEvent()
+        instance = e.instantiate()
+        self.assertIs(instance(state=State()), instance)
+
+    def test_starting_an_instance_does_not_start_the_prototype(self):
+        e = Event(hook=Mock())
+        e.instantiate()(state=State())
+        self.assertFalse(e.started)
+
+    def test_slotted_event_with_passed_hook(self):
+        class TestEvent(Event):
+            __slots__ = ()
+
+        hook = Mock()
+        e = TestEvent(hook=hook)
+        instance = e.instantiate()
+        instance(state=State())
+        hook.assert_called_once()
+        self.assertTrue(instance.started)
+        self.assertFalse(e.started)
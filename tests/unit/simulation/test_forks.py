@@ -0,0 +1,151 @@
+import random
+
+from simulation.forks import run_forks
+from simulation.framework import DiscreteSimulation
+from simulation.history import CheckpointHistory
+from tests.helpers import RandomFillEvent, RepeatAction, TestCase, water_sim
+
+
+def fill_model(history_factory=None) -> DiscreteSimulation:
+    kwargs = {"history_factory": history_factory} if history_factory else {}
+    return water_sim(
+        RandomFillEvent(),
+        max_duration=10,
+        initial_values={"rate": 1},
+        quiet=True,
+        **kwargs
+    )
+
+
+def set_rate(sim: DiscreteSimulation, rate: int):
+    sim.timeline.current_state.set("rate", rate)
+    sim.max_duration = 20
+
+
+def water(sim: DiscreteSimulation) -> dict:
+    return {"water": sim.timeline.current_state.get("water")}
+
+
+class TestFork(TestCase):
+    def setUp(self):
+        self.sim = fill_model()
+        self.sim.run()
+
+    def test_fork_shares_past_states(self):
+        fork = self.sim.fork()
+        history, fork_history = self.sim.timeline.history, fork.timeline.history
+
+        for time in (0, 1, 5):
+            self.assertIs(fork_history[time], history[time])
+        self.assertIsNot(fork_history[10], history[10])
+        self.assertEqual(fork_history[10].values, history[10].values)
+
+    def test_fork_shares_executed_events(self):
+        fork = self.sim.fork()
+        executed = self.sim.timeline.executed_events.between(0, 10)
+
+        self.assertEqual(fork.timeline.executed_events.between(0, 10), executed)
+        self.assertIs(
+            fork.timeline.executed_events.between(0, 10)[0][1], executed[0][1]
+        )
+        self.assertIs(fork.timeline.events[1], self.sim.timeline.events[1])
+        self.assertIsNot(fork.timeline.events[10], self.sim.timeline.events[10])
+
+    def test_fork_runs_independently(self):
+        fork = self.sim.fork()
+        fork.max_duration = 20
+        fork.run()
+
+        self.assertEqual(self.sim.timeline.current_time, 10)
+        self.assertEqual(len(self.sim.timeline.history), 11)
+        self.assertEqual(fork.timeline.current_time, 20)
+        self.assertEqual(len(fork.timeline.history), 21)
+
+        self.sim.max_duration = 15
+        self.sim.run()
+        self.assertEqual(self.sim.timeline.current_time, 15)
+        self.assertEqual(fork.timeline.current_time, 20)
+
+    def test_fork_shares_checkpoints(self):
+        sim = fill_model(lambda: CheckpointHistory(every=5))
+        sim.run()
+        fork = sim.fork()
+
+        self.assertIs(
+            fork.timeline.history.checkpoints[0].state,
+            sim.timeline.history.checkpoints[0].state,
+        )
+        fork.max_duration = 20
+        fork.run()
+        self.assertEqual(len(sim.timeline.history.checkpoints), 3)
+        self.assertEqual(len(fork.timeline.history.checkpoints), 5)
+
+    def test_forks_of_forks_match_a_single_run(self):
+        random.seed(1)
+        expected = fill_model(lambda: CheckpointHistory(every=5))
+        expected.max_duration = 40
+        expected.run()
+        random.seed(1)
+        sim = fill_model(lambda: CheckpointHistory(every=5))
+        for duration in range(3, 41, 3):
+            sim.max_duration = min(duration, 40)
+            sim.run()
+            sim = sim.fork()
+        sim.max_duration = 40
+        sim.run()
+        timeline = sim.timeline
+
+        self.assertListEqual(list(timeline.history), list(expected.timeline.history))
+        self.assertListEqual(list(timeline.events), list(expected.timeline.events))
+        for time in (0, 4, 12, 27, 40):
+            self.assertEqual(
+                timeline.state_at(time).values, expected.timeline.state_at(time).values
+            )
+        self.assertEqual(
+            [t for t, _ in timeline.executed_events.between(0, 40)],
+            [t for t, _ in expected.timeline.executed_events.between(0, 40)],
+        )
+        self.assertEqual(timeline.executed_events.count_since(10), 31)
+
+    def test_running_actions_are_copied(self):
+        sim = DiscreteSimulation(
+            max_duration=3,
+            available_actions=[
+                RepeatAction(events=[(1, RandomFillEvent()), (5, RandomFillEvent())])
+            ],
+            initial_values={"water": 0, "rate": 1},
+            quiet=True,
+        )
+        sim.run()
+        fork = sim.fork()
+        fork.max_duration = 10
+        fork.run()
+        _, action = fork.timeline.scheduled_actions.between(0, 0)[0]
+        executed = [e for _, e in fork.timeline.executed_events.between(5, 5)]
+
+        self.assertIsNot(action, sim.timeline.scheduled_actions.between(0, 0)[0][1])
+        self.assertIs(action.events[1][1], executed[0])
+        self.assertFalse(
+            sim.timeline.scheduled_actions.between(0, 0)[0][1].events[1][1].started
+        )
+
+
+class TestRunForks(TestCase):
+    def setUp(self):
+        self.sim = fill_model()
+        self.sim.run()
+
+    def test_variants_use_common_random_numbers(self):
+        results = run_forks(self.sim, [1, 2, 3], set_rate, reducer=water, workers=1)
+        before = self.sim.timeline.current_state.get("water")
+        added = [r["water"] - before for r in results]
+
+        self.assertEqual(added[1], 2 * added[0])
+        self.assertEqual(added[2], 3 * added[0])
+        self.assertEqual(self.sim.timeline.current_time, 10)
+
+    def test_workers_match_single_process(self):
+        in_process = run_forks(self.sim, [1, 2], set_rate, keys=["water"], workers=1)
+        forked = run_forks(self.sim, [1, 2], set_rate, keys=["water"], workers=2)
+
+        self.assertEqual(forked, in_process)
@@ -0,0 +1,156 @@
+from simulation.framework import Action, DiscreteSimulation, Event, State
+from simulation.history import CheckpointHistory, FullHistory
+from tests.helpers import TestCase
+
+
+class AddWaterEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("water", state.get("water") + 1)
+
+
+class AddWaterAction(Action):
+    events = [(1, AddWaterEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+def run_with_history(history_factory, max_duration=50) -> DiscreteSimulation:
+    sim = DiscreteSimulation(
+        max_duration=max_duration,
+        available_actions=[AddWaterAction()],
+        initial_values={"water": 0},
+        history_factory=history_factory,
+    )
+    sim.run()
+    return sim
+
+
+class TestFullHistory(TestCase):
+    def test_state_at_returns_last_state_before_time(self):
+        h = FullHistory()
+        s1 = State(values={"water": 1})
+        s2 = State(values={"water": 2})
+        h.record(time=0, state=s1)
+        h.record(time=5, state=s2)
+        self.assertIs(h.state_at(3), s1)
+        self.assertIs(h.state_at(5), s2)
+        self.assertIs(h.state_at(10), s2)
+
+    def test_state_at_raises_error_before_first_state(self):
+        h = FullHistory()
+        h.record(time=0, state=State())
+        with self.assertRaises(KeyError):
+            h.state_at(-1)
+
+    def test_current_state_is_last_recorded_state(self):
+        h = FullHistory()
+        s = State()
+        h.record(time=3, state=s)
+        self.assertEqual(h.current_time, 3)
+        self.assertIs(h.current_state, s)
+
+
+class TestCheckpointHistory(TestCase):
+    def test_unknown_retention_raises_error(self):
+        with self.assertRaises(ValueError):
+            CheckpointHistory(retention="everything")
+
+    def test_last_retention_needs_number_of_events_to_keep(self):
+        with self.assertRaises(ValueError):
+            CheckpointHistory(retention="last")
+
+    def test_current_state_matches_full_history(self):
+        sim = run_with_history(lambda: CheckpointHistory(every=7))
+        self.assertDictEqual(sim.timeline.current_state.values, {"water": 50})
+        self.assertEqual(sim.timeline.current_time, 50)
+
+    def test_states_are_rebuilt_from_checkpoints(self):
+        sim = run_with_history(lambda: CheckpointHistory(every=7))
+        for t in range(51):
+            self.assertEqual(sim.timeline.state_at(t).get("water"), t)
+
+    def test_rebuilt_states_match_full_history(self):
+        full = run_with_history(FullHistory, max_duration=20)
+        rebuilt = run_with_history(lambda: CheckpointHistory(every=3), max_duration=20)
+        for t in range(21):
+            self.assertDictEqual(
+                rebuilt.timeline.state_at(t).values, full.timeline.state_at(t).values
+            )
+        self.assertEqual(full.timeline.state_at(5).get("water"), 5)
+
+    def test_states_can_be_looked_up_by_time(self):
+        sim = run_with_history(lambda: CheckpointHistory(every=7))
+        self.assertEqual(sim.timeline.states[12].get("water"), 12)
+        self.assertListEqual(list(sim.timeline.states), list(range(51)))
+
+    def test_lookups_only_find_recorded_times(self):
+        sim = run_with_history(
+            lambda: CheckpointHistory(every=7, retention="checkpoints")
+        )
+        states = sim.timeline.states
+        self.assertIn(14, states)
+        self.assertIn(50, states)
+        self.assertNotIn(15, states)
+        with self.assertRaises(KeyError):
+            states[15]
+
+        sim = run_with_history(lambda: CheckpointHistory(every=7), max_duration=20)
+        sim.fork()  # Shares the states up to now
+        sim.max_duration = 30
+        sim.run()
+        self.assertTrue(all(t in sim.timeline.states for t in range(31)))
+        self.assertNotIn(2.5, sim.timeline.states)
+        self.assertEqual(sim.timeline.states[12].get("water"), 12)
+
+    def test_checkpoints_are_made_every_interval(self):
+        sim = run_with_history(lambda: CheckpointHistory(every=None, interval=10))
+        checkpoints = sim.timeline.history.checkpoints
+        self.assertListEqual([c.time for c in checkpoints], [0, 10, 20, 30, 40, 50])
+        self.assertEqual(sim.timeline.state_at(25).get("water"), 25)
+
+    def test_rebuilt_states_are_cached(self):
+        sim = run_with_history(lambda: CheckpointHistory(every=7))
+        self.assertIs(sim.timeline.state_at(12), sim.timeline.state_at(12))
+
+    def test_final_retention_only_keeps_current_state(self):
+        sim = run_with_history(lambda: CheckpointHistory(retention="final"))
+        self.assertListEqual(list(sim.timeline.states), [50])
+        self.assertEqual(sim.timeline.history.checkpoints, [])
+        with self.assertRaises(KeyError):
+            sim.timeline.state_at(10)
+
+    def test_last_retention_keeps_last_events(self):
+        sim = run_with_history(
+            lambda: CheckpointHistory(every=5, retention="last", keep=10)
+        )
+        history = sim.timeline.history
+        self.assertLess(len(history.log), 20)
+        for t in range(40, 51):
+            self.assertEqual(sim.timeline.state_at(t).get("water"), t)
+        with self.assertRaises(KeyError):
+            sim.timeline.state_at(5)
+
+    def test_checkpoints_retention_uses_nearest_checkpoint(self):
+        sim = run_with_history(
+            lambda: CheckpointHistory(every=10, retention="checkpoints")
+        )
+        self.assertEqual(sim.timeline.history.log, [])
+        self.assertEqual(sim.timeline.state_at(20).get("water"), 20)
+        self.assertEqual(sim.timeline.state_at(25).get("water"), 20)
+
+    def test_final_retention_forgets_past_events(self):
+        sim = run_with_history(lambda: CheckpointHistory(retention="final"))
+        timeline = sim.timeline
+
+        self.assertLess(len(timeline.events), 5)
+        self.assertLess(len(timeline.actions), 5)
+        self.assertLess(len(timeline.executed_events), 5)
+        self.assertEqual(timeline.current_state.get("water"), 50)
+
+    def test_all_retention_keeps_past_events(self):
+        sim = run_with_history(lambda: CheckpointHistory(retention="all"))
+        timeline = sim.timeline
+
+        self.assertEqual(len(timeline.executed_events), 50)
+        self.assertIn(1, timeline.events)
@@ -0,0 +1,195 @@
+from copy import deepcopy
+
+from simulation.framework import Action, Event
+from simulation.indexes import PendingIndex, TimeIndex
+from tests.helpers import TestCase
+
+
+class SpecialAction(Action):
+    pass
+
+
+class TestPendingIndex(TestCase):
+    def test_index_starts_empty(self):
+        index = PendingIndex()
+        self.assertEqual(len(index), 0)
+        self.assertFalse(index.contains(Action))
+
+    def test_items_are_found_by_their_classes(self):
+        index = PendingIndex()
+        a = SpecialAction()
+        index.add(time=0, item=a)
+        self.assertTrue(index.contains(SpecialAction))
+        self.assertTrue(index.contains(Action))
+        self.assertFalse(index.contains(Event))
+
+    def test_items_are_ordered_by_time_and_weight(self):
+        index = PendingIndex()
+        late = Action()
+        low = Action(weight=0)
+        high = Action(weight=10)
+        index.add(time=5, item=late)
+        index.add(time=1, item=low)
+        index.add(time=1, item=high)
+        self.assertListEqual(index.items(Action), [high, low, late])
+
+    def test_started_items_are_not_listed(self):
+        index = PendingIndex()
+        a = Action()
+        index.add(time=0, item=a)
+        a.started = True
+        self.assertListEqual(index.items(), [])
+        self.assertFalse(index.contains(Action))
+
+    def test_items_are_counted_by_time(self):
+        index = PendingIndex()
+        index.add(time=1, item=Action())
+        index.add(time=1, item=SpecialAction())
+        index.add(time=2, item=SpecialAction())
+        self.assertEqual(index.count(Action), 3)
+        self.assertEqual(index.count(Action, time=1), 2)
+        self.assertEqual(index.count(SpecialAction, time=2), 1)
+        self.assertEqual(index.count(SpecialAction, time=3), 0)
+
+    def test_discarded_items_are_removed(self):
+        index = PendingIndex()
+        a = Action()
+        index.add(time=1, item=a)
+        index.discard(a)
+        self.assertEqual(index.count(Action), 0)
+        self.assertEqual(index.count(Action, time=1), 0)
+        index.discard(a)
+
+    def test_items_before_now_are_expired(self):
+        index = PendingIndex()
+        a1 = Action()
+        a2 = Action()
+        index.add(time=1, item=a1)
+        index.add(time=5, item=a2)
+        index.expire(now=3)
+        self.assertListEqual(index.items(Action), [a2])
+        index.add(time=2, item=Action())
+        self.assertEqual(len(index), 1)
+
+
+class TestTimeIndex(TestCase):
+    def test_last_is_highest_weight_at_latest_time(self):
+        index = TimeIndex()
+        early = Event(hook=print, weight=10)
+        low = Event(hook=print, weight=0)
+        high = Event(hook=print, weight=5)
+        other = Event(hook=print, weight=5)
+        for time, e in ((1, early), (3, low), (3, high), (3, other)):
+            index.add(time=time, item=e)
+        self.assertEqual(index.last(Event), (3, high))
+        self.assertIsNone(index.last(Action))
+
+    def test_between_includes_both_ends(self):
+        index = TimeIndex()
+        actions = [Action() for _ in range(5)]
+        for time, a in enumerate(actions):
+            index.add(time=time, item=a)
+        self.assertListEqual(
+            index.between(1, 3, of_type=Action),
+            [(1, actions[1]), (2, actions[2]), (3, actions[3])],
+        )
+        self.assertListEqual(index.between(6, 9, of_type=Action), [])
+
+    def test_items_added_out_of_order_are_sorted(self):
+        index = TimeIndex()
+        late = Action()
+        early = Action()
+        index.add(time=5, item=late)
+        index.add(time=2, item=early)
+        self.assertListEqual(index.between(0, 10), [(2, early), (5, late)])
+
+    def test_count_since_by_class(self):
+        index = TimeIndex()
+        index.add(time=1, item=SpecialAction())
+        index.add(time=2, item=Action())
+        index.add(time=3, item=SpecialAction())
+        self.assertEqual(index.count_since(2, of_type=Action), 2)
+        self.assertEqual(index.count_since(2, of_type=SpecialAction), 1)
+        self.assertEqual(index.count_since(0, of_type=Event), 0)
+        self.assertEqual(len(index), 3)
+
+    def test_subclasses_are_merged_in_order(self):
+        index = TimeIndex()
+        items = [SpecialAction(), Action(), SpecialAction(weight=3), Action()]
+        for time, a in zip((1, 2, 2, 4), items):
+            index.add(time=time, item=a)
+        self.assertListEqual(
+            index.between(0, 3, of_type=Action),
+            [(1, items[0]), (2, items[2]), (2, items[1])],
+        )
+        self.assertEqual(index.last(Action), (4, items[3]))
+        self.assertEqual(index.last(SpecialAction), (2, items[2]))
+
+    def test_items_are_stored_once(self):
+        index = TimeIndex()
+        index.add(time=1, item=SpecialAction())
+        self.assertListEqual(list(index._keys), [SpecialAction])
+
+    def test_discarded_items_are_skipped_then_compacted(self):
+        index = TimeIndex()
+        actions = [Action() for _ in range(6)]
+        for time, a in enumerate(actions):
+            index.add(time=time, item=a)
+        index.discard(5, actions[5])
+        index.discard(2, actions[2])
+        self.assertEqual(index.last(Action), (4, actions[4]))
+        self.assertEqual(index.count_since(2, of_type=Action), 2)
+        self.assertListEqual(
+            [a for _, a in index.between(0, 5)], [actions[i] for i in (0, 1, 3, 4)]
+        )
+        self.assertEqual(len(index._keys[Action]), 6)
+        index.discard(0, actions[0])
+        index.discard(1, actions[1])
+        self.assertEqual(len(index._keys[Action]), 2)
+        self.assertEqual(len(index), 2)
+
+    def test_discards_survive_copying(self):
+        index = TimeIndex()
+        actions = [Action() for _ in range(4)]
+        for time, a in enumerate(actions):
+            index.add(time=time, item=a)
+        index.discard(3, actions[3])
+        copied = deepcopy(index)
+        copied.discard(2, copied.last(Action)[1])
+        self.assertEqual(copied.last(Action)[0], 1)
+        self.assertEqual(index.last(Action), (2, actions[2]))
+
+    def test_copies_share_the_past(self):
+        index = TimeIndex()
+        actions = [SpecialAction() if t % 2 else Action() for t in range(6)]
+        for time, a in enumerate(actions):
+            index.add(time=time, item=a)
+        index.discard(4, actions[4])
+        index.share_before(3)
+        copied = deepcopy(index)
+        copied.add(time=6, item=Action())
+
+        self.assertIs(copied._past, index._past)
+        self.assertIs(copied.between(0, 2)[1][1], actions[1])
+        self.assertIsNot(copied.between(3, 3)[0][1], actions[3])
+        self.assertListEqual([t for t, _ in index.between(1, 9)], [1, 2, 3, 5])
+        self.assertListEqual([t for t, _ in copied.between(1, 9)], [1, 2, 3, 5, 6])
+        for i in (index, copied):
+            self.assertEqual(i.count_since(2, of_type=SpecialAction), 2)
+            self.assertEqual(i.last(SpecialAction)[0], 5)
+        self.assertEqual((len(index), len(copied)), (5, 6))
+
+    def test_past_is_merged_into_few_parts(self):
+        index = TimeIndex()
+        for time in range(64):
+            index.add(time=time, item=Action())
+            index.share_before(time)
+        parts, past = 0, index._past
+        while past is not None:
+            parts, past = parts + 1, past._past
+
+        self.assertLessEqual(parts, 7)
+        self.assertListEqual([t for t, _ in index.between(0, 63)], list(range(64)))
+        self.assertEqual(index.last(Action)[0], 63)
+        index.trim(63)
+        self.assertIsNone(index._past)
@@ -0,0 +1,104 @@
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.observers import Observer, Profiler
+from tests.helpers import TestCase
+
+
+class WaterEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("water", state.get("water") + 1)
+
+
+class WaterAction(Action):
+    events = [(2, WaterEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+class RecordingObserver(Observer):
+    def __init__(self):
+        self.calls = []
+
+    def before_check(self, sim, action):
+        self.calls.append("before_check")
+
+    def after_check(self, sim, action, ready):
+        self.calls.append(("after_check", ready))
+
+    def before_schedule(self, sim, action):
+        self.calls.append("before_schedule")
+
+    def after_schedule(self, sim, action):
+        self.calls.append("after_schedule")
+
+    def before_select(self, sim):
+        self.calls.append("before_select")
+
+    def after_select(self, sim, time, event):
+        self.calls.append(("after_select", time))
+
+    def before_execute(self, sim, time, event):
+        self.calls.append(("before_execute", time))
+
+    def after_execute(self, sim, time, event, state):
+        self.calls.append(("after_execute", state.get("water")))
+
+
+def water_sim(**kwargs) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=4,
+        available_actions=[WaterAction()],
+        initial_values={"water": 0},
+        **kwargs
+    )
+
+
+class TestObservers(TestCase):
+    def test_callbacks_follow_the_loop(self):
+        observer = RecordingObserver()
+        water_sim(observers=[observer]).run()
+        self.assertListEqual(
+            observer.calls[:8],
+            [
+                "before_check",
+                ("after_check", True),
+                "before_schedule",
+                "after_schedule",
+                "before_select",
+                ("after_select", 2),
+                ("before_execute", 2),
+                ("after_execute", 1),
+            ],
+        )
+        self.assertEqual(observer.calls.count("before_select"), 2)
+
+    def test_observers_dont_change_the_outcome(self):
+        sim = water_sim()
+        sim.add_observer(Profiler())
+        self.assertDictEqual(sim.run().values, water_sim().run().values)
+
+    def test_observers_can_be_removed(self):
+        observer = RecordingObserver()
+        sim = water_sim(observers=[observer])
+        sim.remove_observer(observer)
+        sim.run()
+        self.assertListEqual(observer.calls, [])
+
+
+class TestProfiler(TestCase):
+    def test_counts_per_class(self):
+        profiler = Profiler()
+        water_sim(observers=[profiler]).run()
+        profile = profiler.as_dict()
+        self.assertEqual(profile["execute"]["WaterEvent"]["calls"], 2)
+        self.assertEqual(profile["schedule"]["WaterAction"]["calls"], 2)
+        self.assertEqual(profile["check"]["WaterAction"]["calls"], 2)
+        self.assertEqual(profile["select"]["WaterEvent"]["calls"], 2)
+        self.assertEqual(profile["queue"]["samples"], 2)
+
+    def test_table(self):
+        profiler = Profiler()
+        water_sim(observers=[profiler]).run()
+        table = profiler.table()
+        self.assertIn("WaterEvent", table)
+        self.assertIn("Queue size", table)
@@ -0,0 +1,224 @@
+import random
+import threading
+
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.parallel import ParallelDiscreteSimulation, conflict_free
+from tests.helpers import TestCase
+
+
+class MachineEvent(Event):
+    """
+    Finishes a part on its own machine
+    """
+
+    def __init__(self, key: str):
+        super(MachineEvent, self).__init__(name="Machine {}".format(key))
+        self.key = key
+        self.reads = self.writes = (key,)
+
+    def hook(self, state, *args, **kwargs):
+        return state.set(self.key, state.get(self.key) + 1)
+
+
+class TotalEvent(Event):
+    reads = ("m0", "m1", "m2", "m3", "m4", "m5")
+    writes = ("total",)
+
+    def hook(self, state, *args, **kwargs):
+        return state.set("total", sum(state.get(k) for k in self.reads))
+
+
+class UndeclaredEvent(Event):
+    """
+    Claims to be concurrent, but reads what the machines set
+    """
+
+    concurrent = True
+
+    def hook(self, state, *args, **kwargs):
+        return state.set("seen", state.get("m0") + state.get("m5"))
+
+
+class RandomMachineEvent(MachineEvent):
+    """
+    Finishes a random number of parts
+    """
+
+    def hook(self, state, *args, **kwargs):
+        return state.set(self.key, state.get(self.key) + random.randint(1, 1000))
+
+
+class ShiftAction(Action):
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+def shift_model(engine: type, extra: Event, **kwargs):
+    machines = [MachineEvent("m{}".format(i)) for i in range(6)]
+    events = [(1, e) for e in machines[:3]] + [(1, extra)]
+    events += [(1, e) for e in machines[3:]]
+    return engine(
+        max_duration=5,
+        available_actions=[ShiftAction(events=events)],
+        initial_values={
+            "total": 0,
+            "seen": 0,
+            **{"m{}".format(i): 0 for i in range(6)},
+        },
+        quiet=True,
+        **kwargs
+    )
+
+
+def random_model(engine: type, **kwargs):
+    events = [RandomMachineEvent("m{}".format(i)) for i in range(4)]
+    events.insert(2, MachineEvent("m4"))
+    return engine(
+        max_duration=5,
+        available_actions=[ShiftAction(events=[(1, e) for e in events])],
+        initial_values={"m{}".format(i): 0 for i in range(5)},
+        quiet=True,
+        **kwargs
+    )
+
+
+def run_steps(sim) -> list:
+    return [(s.time, s.event.name, s.changes) for s in sim.iter_run()]
+
+
+class Rendezvous(Event):
+    """
+    Only finishes when another hook runs at the same time
+    """
+
+    barrier: threading.Barrier = None
+    reads = ()
+
+    def hook(self, state, *args, **kwargs):
+        self.barrier.wait(timeout=5)
+        return state.set(self.name, True)
+
+
+class Meeting(Rendezvous):
+    """
+    Waits for another hook the first time, until that one drew its numbers
+    """
+
+    draws = False
+    met = False
+
+    def hook(self, state, *args, **kwargs):
+        first, self.met = not self.met, True
+        if first:
+            self.barrier.wait(timeout=5)
+        value = random.random() if self.draws else True
+        if first:
+            self.barrier.wait(timeout=5)
+        return state.set(self.name, value)
+
+
+class DrawingMeeting(Meeting):
+    draws = True
+
+
+class TestConflictFree(TestCase):
+    def test_stops_at_read_of_earlier_change(self):
+        results = [({"a": 1}, {"a"}), ({"b": 1}, {"c"}), ({"c": 1}, {"a"})]
+
+        self.assertEqual(conflict_free(results), 2)
+
+    def test_reading_everything_conflicts_with_any_change(self):
+        self.assertEqual(conflict_free([({"a": 1}, set()), ({}, None)]), 1)
+        self.assertEqual(conflict_free([({}, None), ({}, None)]), 2)
+
+
+class TestParallelSimulation(TestCase):
+    def assertMatchesSerial(self, extra_type: type, **kwargs):
+        expected_sim = shift_model(DiscreteSimulation, extra_type())
+        expected = run_steps(expected_sim)
+        sim = shift_model(ParallelDiscreteSimulation, extra_type(), **kwargs)
+
+        self.assertEqual(run_steps(sim), expected)
+        self.assertEqual(
+            sim.timeline.current_state.values,
+            expected_sim.timeline.current_state.values,
+        )
+        return sim
+
+    def test_declared_conflicts_run_serially(self):
+        sim = self.assertMatchesSerial(TotalEvent, workers=2)
+
+        self.assertEqual(sim.timeline.current_state.get("total"), 21)
+
+    def test_batches_stop_at_declared_conflicts(self):
+        sim = shift_model(ParallelDiscreteSimulation, TotalEvent())
+        action = sim.available_actions[0].instantiate()
+        sim.timeline.schedule_action(action)
+        batch = sim._batch_at(1, action.events[0][1])
+
+        self.assertEqual(
+            [e.name for e in batch], ["Machine m0", "Machine m1", "Machine m2"]
+        )
+
+    def test_recorded_conflicts_are_run_again(self):
+        sim = self.assertMatchesSerial(UndeclaredEvent, workers=3)
+
+        self.assertEqual(sim.timeline.current_state.get("seen"), 7)
+
+    def test_process_pool_matches_serial(self):
+        self.assertMatchesSerial(TotalEvent, executor="process", workers=2)
+
+    def assertRandomMatchesSerial(self, **kwargs):
+        random.seed(7)
+        expected = run_steps(random_model(DiscreteSimulation))
+        after = random.random()
+        random.seed(7)
+        sim = random_model(ParallelDiscreteSimulation, workers=2, **kwargs)
+
+        self.assertEqual(run_steps(sim), expected)
+        self.assertEqual(random.random(), after)
+        self.assertSetEqual(sim.serial_types, {RandomMachineEvent})
+
+    def test_random_hooks_run_serially_on_threads(self):
+        self.assertRandomMatchesSerial()
+
+    def test_random_hooks_run_serially_on_processes(self):
+        self.assertRandomMatchesSerial(executor="process")
+
+    def test_runs_batch_in_parallel(self):
+        barrier = threading.Barrier(2)
+        events = [Rendezvous(name="a"), Rendezvous(name="b")]
+        for e in events:
+            e.barrier = barrier
+            e.writes = (e.name,)
+        sim = ParallelDiscreteSimulation(
+            max_duration=2,
+            available_actions=[ShiftAction(events=[(1, e) for e in events])],
+            workers=2,
+            quiet=True,
+        )
+        state = sim.run()
+
+        self.assertEqual(state.values, {"a": True, "b": True})
+
+    def test_hooks_that_see_other_draws_are_not_serial(self):
+        barrier = threading.Barrier(2)
+        events = [Meeting(name="quiet"), DrawingMeeting(name="drawing")]
+        for e in events:
+            e.barrier = barrier
+            e.writes = (e.name,)
+        sim = ParallelDiscreteSimulation(
+            max_duration=2, available_actions=[], workers=2, quiet=True
+        )
+        for e in events:
+            sim.timeline.schedule_event(e, time=1)
+        random.seed(5)
+        state = sim.run()
+        random.seed(5)
+
+        self.assertEqual(state.values, {"quiet": True, "drawing": random.random()})
+        self.assertSetEqual(sim.serial_types, {DrawingMeeting})
+
+    def test_rejects_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            shift_model(ParallelDiscreteSimulation, TotalEvent(), executor="gpu")
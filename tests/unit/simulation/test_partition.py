@@ -0,0 +1,171 @@
+from simulation.framework import Action, DiscreteSimulation, Event, SimulationError
+from simulation.partition import (
+    LogicalProcess,
+    PartitionState,
+    PartitionedSimulation,
+)
+from tests.helpers import TestCase
+
+
+class ProduceEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        state.set("produced", state.get("produced") + 1)
+        return state.send("warehouse", ArrivalEvent(), delay=3)
+
+
+class ProduceAction(Action):
+    events = [(2, ProduceEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+class ArrivalEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        state.set("stock", state.get("stock") + 1)
+        return state.send("factory", AckEvent(), delay=1)
+
+
+class AckEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("acked", state.get("acked") + 1)
+
+
+class LateEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.send("factory", AckEvent(), delay=0.5)
+
+
+class CountEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("count", state.get("count") + 1)
+
+
+class CountAction(Action):
+    events = [(2, CountEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+
+class OtherCountAction(CountAction):
+    pass
+
+
+def zone(actions, initial_values) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=float("inf"),
+        available_actions=actions,
+        initial_values=initial_values,
+        state_factory=PartitionState,
+        quiet=True,
+    )
+
+
+def plant(max_duration: float = 20, parallel: bool = False) -> PartitionedSimulation:
+    return PartitionedSimulation(
+        processes=[
+            LogicalProcess(
+                "factory",
+                zone([ProduceAction()], {"produced": 0, "acked": 0}),
+                lookahead=3,
+            ),
+            LogicalProcess("warehouse", zone([], {"stock": 0}), lookahead=1),
+        ],
+        max_duration=max_duration,
+        parallel=parallel,
+    )
+
+
+def executed(process: LogicalProcess) -> list:
+    timeline = process.sim.timeline
+    return [(t, e.name) for t, e in timeline.executed_events.between(0, float("inf"))]
+
+
+class TestPartitionedSimulation(TestCase):
+    def test_messages_arrive_after_their_delay(self):
+        states = plant().run()
+
+        # Produced at 2, 4, ..., 20, arriving 3 later and acked 1 after that.
+        # Only the first event at 20 runs, like in a single simulation
+        self.assertEqual(states["factory"].values, {"produced": 10, "acked": 7})
+        self.assertEqual(states["warehouse"].values, {"stock": 8})
+
+    def test_max_duration_matches_single_simulation(self):
+        actions = [CountAction(), OtherCountAction()]
+        single = DiscreteSimulation(
+            max_duration=10,
+            available_actions=actions,
+            initial_values={"count": 0},
+            quiet=True,
+        )
+        partitioned = PartitionedSimulation(
+            processes=[LogicalProcess("counter", zone(actions, {"count": 0}), 1)],
+            max_duration=10,
+        )
+        state = partitioned.run()["counter"]
+        values = single.run().values
+        expected = [
+            (t, e.name) for t, e in single.timeline.executed_events.between(0, 10)
+        ]
+
+        self.assertEqual(state.values, values)
+        self.assertEqual(executed(partitioned["counter"]), expected)
+        self.assertEqual(expected[-1][0], 10)
+
+    def test_parallel_matches_sequential(self):
+        sequential = plant()
+        parallel = plant(parallel=True)
+        states = sequential.run()
+        parallel_states = parallel.run()
+
+        for name in ("factory", "warehouse"):
+            self.assertEqual(parallel_states[name].values, states[name].values)
+            self.assertEqual(executed(parallel[name]), executed(sequential[name]))
+        self.assertEqual(parallel.windows, sequential.windows)
+
+    def test_windows_span_the_lookahead(self):
+        sim = plant()
+        sim.run()
+
+        self.assertLess(sim.windows, 20)
+
+    def test_delay_below_lookahead_is_rejected(self):
+        sim = PartitionedSimulation(
+            processes=[
+                LogicalProcess(
+                    "warehouse",
+                    zone([Action(events=[(1, LateEvent())])], {}),
+                    lookahead=1,
+                ),
+                LogicalProcess("factory", zone([], {"acked": 0}), lookahead=1),
+            ],
+            max_duration=5,
+        )
+        with self.assertRaises(SimulationError):
+            sim.run()
+
+    def test_needs_partition_state_and_positive_lookahead(self):
+        plain = DiscreteSimulation(max_duration=1, available_actions=[], quiet=True)
+        with self.assertRaises(ValueError):
+            LogicalProcess("zone", plain, lookahead=1)
+        with self.assertRaises(ValueError):
+            LogicalProcess("zone", zone([], {}), lookahead=0)
+
+
+class TestPartitionedErrors(TestCase):
+    def test_errors_in_workers_are_raised(self):
+        sim = PartitionedSimulation(
+            processes=[
+                LogicalProcess(
+                    "warehouse",
+                    zone([Action(events=[(1, LateEvent())])], {}),
+                    lookahead=1,
+                ),
+                LogicalProcess("factory", zone([], {"acked": 0}), lookahead=1),
+            ],
+            max_duration=5,
+            parallel=True,
+        )
+        with self.assertRaises(SimulationError):
+            sim.run()
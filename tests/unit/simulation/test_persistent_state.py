@@ -0,0 +1,83 @@
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.persistent import PersistentState
+from tests.helpers import TestCase
+
+
+class TestPersistentState(TestCase):
+    def test_state_starts_with_initial_values(self):
+        s = PersistentState(values={"water": 1})
+        self.assertEqual(s.values, {"water": 1})
+        self.assertEqual(s.get("water"), 1)
+
+    def test_get_returns_default_for_missing_keys(self):
+        s = PersistentState()
+        self.assertEqual(s.get("water", 5), 5)
+
+    def test_derived_state_does_not_change_its_parent(self):
+        s1 = PersistentState(values={"water": 1, "fire": 2})
+        s2 = s1.derive().set("water", 10)
+        self.assertEqual(s1.values, {"water": 1, "fire": 2})
+        self.assertEqual(s2.values, {"water": 10, "fire": 2})
+
+    def test_values_are_read_only(self):
+        s = PersistentState(values={"water": 1}).derive().set("fire", 2)
+
+        with self.assertRaises(TypeError):
+            s.values["water"] = 5
+        self.assertEqual(list(s.values), ["water", "fire"])
+        self.assertEqual(len(s.values), 2)
+        self.assertIn("fire", s.values)
+
+    def test_derived_state_shares_unchanged_values(self):
+        value = object()
+        s1 = PersistentState(values={"value": value})
+        s2 = s1.derive().set("water", 1)
+        self.assertIs(s2.get("value"), value)
+
+    def test_changes_only_contain_values_set_on_that_version(self):
+        s1 = PersistentState(values={"water": 1}).derive().set("water", 2)
+        s2 = s1.derive().set("fire", 3)
+        self.assertDictEqual(s1.changes, {"water": 2})
+        self.assertDictEqual(s2.changes, {"fire": 3})
+
+    def test_values_stay_correct_after_overlay_is_flattened(self):
+        s = PersistentState(values={"water": 0})
+        history = [s]
+        for i in range(1, 200):
+            s = s.derive().set("water", i).set("key{}".format(i % 50), i)
+            history.append(s)
+        self.assertEqual(history[10].get("water"), 10)
+        self.assertEqual(history[-1].get("water"), 199)
+        self.assertEqual(history[-1].get("key0"), 150)
+        self.assertEqual(len(history[-1].values), 51)
+
+    def test_completing_an_event_does_not_change_the_parent(self):
+        a = Action()
+        s1 = PersistentState(active_events=[a])
+        s2 = s1.derive().complete_event(a)
+        self.assertEqual(s1.active_events, [a])
+        self.assertEqual(s2.completed_events, [a])
+        self.assertEqual(s2.active_events, [])
+
+    def test_simulation_keeps_history_with_persistent_state(self):
+        class AddWaterEvent(Event):
+            def hook(self, state, *args, **kwargs):
+                state.set("water", state.get("water") + 1)
+                return state
+
+        class AddWaterAction(Action):
+            events = [(3, AddWaterEvent())]
+
+            def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+                return not timeline.action_already_planned(action=self)
+
+        sim = DiscreteSimulation(
+            max_duration=8,
+            available_actions=[AddWaterAction()],
+            initial_values={"water": 0},
+            state_factory=PersistentState,
+        )
+        sim.run()
+        self.assertEqual(sim.timeline.states[0].values, {"water": 0})
+        self.assertEqual(sim.timeline.states[3].values, {"water": 1})
+        self.assertEqual(sim.timeline.current_state.values, {"water": 2})
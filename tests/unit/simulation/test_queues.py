@@ -0,0 +1,102 @@
+from random import Random
+
+from simulation.queues import CalendarEventQueue, HeapEventQueue
+from tests.helpers import TestCase
+
+
+class QueueTestMixin:
+    queue_class = None
+
+    def test_queue_starts_empty(self):
+        q = self.queue_class()
+        self.assertEqual(len(q), 0)
+        self.assertIsNone(q.peek())
+
+    def test_pop_from_empty_queue_raises_error(self):
+        with self.assertRaises(IndexError):
+            self.queue_class().pop()
+
+    def test_items_are_popped_by_time(self):
+        q = self.queue_class()
+        q.push(time=5, weight=0, item="late")
+        q.push(time=1, weight=0, item="early")
+        self.assertEqual(q.pop().item, "early")
+        self.assertEqual(q.pop().item, "late")
+
+    def test_items_at_same_time_are_popped_by_descending_weight(self):
+        q = self.queue_class()
+        q.push(time=1, weight=0, item="low")
+        q.push(time=1, weight=100, item="high")
+        self.assertEqual(q.pop().item, "high")
+        self.assertEqual(q.pop().item, "low")
+
+    def test_items_with_same_time_and_weight_are_popped_in_insertion_order(self):
+        q = self.queue_class()
+        for i in range(10):
+            q.push(time=1, weight=0, item=i)
+        self.assertListEqual([q.pop().item for _ in range(10)], list(range(10)))
+
+    def test_peek_does_not_remove_item(self):
+        q = self.queue_class()
+        q.push(time=1, weight=0, item="item")
+        self.assertEqual(q.peek().item, "item")
+        self.assertEqual(len(q), 1)
+
+    def test_interleaved_pushes_and_pops_match_sorted_order(self):
+        rng = Random(1)
+        q = self.queue_class()
+        expected = []
+        popped = []
+        now = 0
+        for i in range(2000):
+            time = now + rng.random() * 50
+            entry = q.push(time=time, weight=rng.randint(0, 3), item=i)
+            expected.append(entry)
+            if rng.random() < 0.4:
+                entry = q.pop()
+                now = entry.time
+                popped.append(entry)
+        popped.extend(q.pop() for _ in range(len(q)))
+        self.assertListEqual(popped, sorted(popped))
+        self.assertCountEqual(popped, expected)
+
+    def test_cancelled_items_are_skipped(self):
+        q = self.queue_class()
+        first = q.push(time=1, weight=0, item="first")
+        q.push(time=2, weight=0, item="second")
+        q.cancel(first)
+        self.assertEqual(q.peek().item, "second")
+        self.assertEqual(q.pop().item, "second")
+        with self.assertRaises(IndexError):
+            q.pop()
+
+    def test_cancelled_items_are_compacted(self):
+        q = self.queue_class()
+        entries = [q.push(time=t, weight=0, item=t) for t in range(200)]
+        for entry in entries[:150]:
+            q.cancel(entry)
+        self.assertLess(len(q), 200)
+        self.assertListEqual([e.item for e in q.ordered()], list(range(150, 200)))
+        self.assertListEqual([q.pop().item for _ in range(50)], list(range(150, 200)))
+
+
+class TestHeapEventQueue(QueueTestMixin, TestCase):
+    queue_class = HeapEventQueue
+
+
+class TestCalendarEventQueue(QueueTestMixin, TestCase):
+    queue_class = CalendarEventQueue
+
+    def test_queue_handles_items_far_in_the_future(self):
+        q = CalendarEventQueue(bucket_width=1)
+        q.push(time=1_000_000, weight=0, item="far")
+        q.push(time=2, weight=0, item="near")
+        self.assertEqual(q.pop().item, "near")
+        self.assertEqual(q.pop().item, "far")
+
+    def test_queue_handles_items_pushed_before_the_cursor(self):
+        q = CalendarEventQueue(bucket_width=1)
+        q.push(time=10, weight=0, item="later")
+        self.assertEqual(q.peek().item, "later")
+        q.push(time=3, weight=0, item="earlier")
+        self.assertEqual(q.pop().item, "earlier")
@@ -0,0 +1,28 @@
+from simulation.framework import logger
+from tests.helpers import TestCase, water_sim
+
+
+class TestQuietMode(TestCase):
+    def setUp(self):
+        self.messages = []
+        self.sink = logger.add(self.messages.append, level="DEBUG")
+
+    def tearDown(self):
+        logger.remove(self.sink)
+
+    def test_same_outcome_as_normal_mode(self):
+        quiet = water_sim(quiet=True)
+        normal = water_sim()
+        self.assertDictEqual(quiet.run().values, normal.run().values)
+        self.assertListEqual(list(quiet.timeline.states), list(normal.timeline.states))
+
+    def test_nothing_is_logged_per_event(self):
+        water_sim(quiet=True).run()
+        self.assertLess(len(self.messages), 3)
+        self.assertFalse(any("Scheduling" in m for m in self.messages))
+
+    def test_progress_is_reported(self):
+        water_sim(quiet=True, progress_every=5).run()
+        progress = [m for m in self.messages if "events/s" in m]
+        self.assertEqual(len(progress), 4)
+        self.assertIn("Executed 5 events, at time 5", progress[0])
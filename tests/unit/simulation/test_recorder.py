@@ -0,0 +1,111 @@
+import csv
+import os
+from tempfile import TemporaryDirectory
+
+from simulation.framework import DiscreteSimulation
+from simulation.history import CheckpointHistory
+from simulation.recorder import Recorder, load_recording
+from tests.helpers import FillEvent, TestCase, water_sim
+
+
+class LevelFillEvent(FillEvent):
+    def hook(self, state, *args, **kwargs):
+        state = super(LevelFillEvent, self).hook(state, *args, **kwargs)
+        return state.set("level", state.get("water") / 2)
+
+
+def level_sim(**kwargs) -> DiscreteSimulation:
+    return water_sim(
+        LevelFillEvent(), max_duration=10, initial_values={"level": 0.0}, **kwargs
+    )
+
+
+class TestRecorder(TestCase):
+    def test_keys_are_recorded_when_they_change(self):
+        sim = level_sim(record={"water": "q"})
+        sim.run()
+        times, values = sim.recorder["water"]
+        self.assertListEqual(list(times), list(range(11)))
+        self.assertListEqual(list(values), list(range(11)))
+        self.assertEqual(values.typecode, "q")
+
+    def test_recording_without_history(self):
+        sim = level_sim(
+            record=["level"],
+            history_factory=lambda: CheckpointHistory(retention="final"),
+        )
+        sim.run()
+        self.assertEqual(len(sim.timeline.states), 1)
+        self.assertEqual(sim.recorder["level"][1][-1], 5.0)
+
+    def test_every_nth_change(self):
+        recorder = Recorder(["water"], every=3)
+        level_sim(observers=[recorder]).run()
+        self.assertListEqual(list(recorder["water"][1]), [0, 3, 6, 9])
+
+    def test_time_bins_keep_the_last_value(self):
+        recorder = Recorder(["water"], bin_width=4)
+        level_sim(observers=[recorder]).run()
+        times, values = recorder["water"]
+        self.assertListEqual(list(times), [0, 4, 8])
+        self.assertListEqual(list(values), [3, 7, 10])
+
+    def test_to_numpy(self):
+        sim = level_sim(record=["level"])
+        sim.run()
+        times, values = sim.recorder.to_numpy("level")
+        self.assertEqual(values.sum(), sum(sim.recorder["level"][1]))
+        self.assertEqual(times.dtype.name, "float64")
+
+    def test_recording_continues_after_to_numpy(self):
+        sim = level_sim(record=["level"])
+        steps = sim.iter_run()
+        for _ in range(5):
+            next(steps)
+        times, _ = sim.recorder.to_numpy("level")
+        for _ in steps:
+            pass
+        self.assertGreater(len(sim.recorder["level"][0]), len(times))
+
+    def test_runs_after_a_reset_start_over(self):
+        sim = level_sim(record=["water"])
+        sim.run()
+        sim.reset({"water": 0, "level": 0.0})
+        sim.run()
+        times, values = sim.recorder["water"]
+        self.assertListEqual(list(times), list(range(11)))
+        self.assertListEqual(list(values), list(range(11)))
+
+    def test_resumed_runs_continue_the_recording(self):
+        sim = level_sim(record=["water"])
+        sim.run()
+        sim.max_duration = 15
+        sim.run()
+        times, values = sim.recorder["water"]
+        self.assertListEqual(list(times), list(range(16)))
+        self.assertListEqual(list(values), list(range(16)))
+
+    def test_export_to_csv(self):
+        sim = level_sim(record=["water", "level"])
+        sim.run()
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "recording.csv")
+            sim.recorder.to_csv(path)
+            with open(path) as fp:
+                rows = list(csv.reader(fp))
+        self.assertListEqual(rows[0], ["time", "key", "value"])
+        self.assertEqual(len(rows), 23)
+        self.assertListEqual(
+            [float(r[0]) for r in rows[1:]], sorted(float(r[0]) for r in rows[1:])
+        )
+
+    def test_save_and_memory_map(self):
+        sim = level_sim(record={"water": "i", "level": "d"})
+        sim.run()
+        with TemporaryDirectory() as directory:
+            sim.recorder.save(directory)
+            recording = load_recording(directory)
+            times, values = recording["water"]
+            self.assertListEqual(values.tolist(), list(range(11)))
+            self.assertEqual(recording["level"][1][-1], 5.0)
+            del times, values, recording
@@ -0,0 +1,76 @@
+from simulation.framework import DiscreteSimulation
+from simulation.replications import derive_seeds, run_replications
+from simulation.statistics import summarize, t_quantile
+from tests.helpers import RandomFillEvent, TestCase, water_sim
+
+
+class LabelledFillEvent(RandomFillEvent):
+    def hook(self, state, *args, **kwargs):
+        state = super(LabelledFillEvent, self).hook(state, *args, **kwargs)
+        return state.set("label", "wet")
+
+
+def water_model(seed: int) -> DiscreteSimulation:
+    return water_sim(LabelledFillEvent())
+
+
+def water_only(sim: DiscreteSimulation) -> dict:
+    return {"water": sim.timeline.current_state.get("water")}
+
+
+class TestStatistics(TestCase):
+    def test_t_quantile_matches_table_values(self):
+        self.assertAlmostEqual(t_quantile(0.975, 1), 12.706, places=3)
+        self.assertAlmostEqual(t_quantile(0.975, 2), 4.303, places=3)
+        self.assertAlmostEqual(t_quantile(0.975, 10), 2.228, places=3)
+
+    def test_summary_contains_mean_and_interval(self):
+        summary = summarize([1, 2, 3, 4, 5])
+        self.assertEqual(summary.n, 5)
+        self.assertEqual(summary.mean, 3)
+        self.assertAlmostEqual(summary.half_width, 1.963, places=3)
+        self.assertAlmostEqual(summary.low, 3 - summary.half_width)
+
+    def test_summary_of_nothing_raises_error(self):
+        with self.assertRaises(ValueError):
+            summarize([])
+
+
+class TestReplications(TestCase):
+    def test_seeds_are_reproducible(self):
+        self.assertListEqual(derive_seeds(1, 5), derive_seeds(1, 5))
+        self.assertEqual(len(set(derive_seeds(1, 100))), 100)
+
+    def test_number_of_replications_or_seeds_is_needed(self):
+        with self.assertRaises(ValueError):
+            run_replications(water_model)
+
+    def test_replications_are_reproducible(self):
+        r1 = run_replications(water_model, n=5, workers=1, seed=3)
+        r2 = run_replications(water_model, n=5, workers=1, seed=3)
+        self.assertListEqual(r1.results, r2.results)
+        self.assertGreater(len(set(r1.values("water"))), 1)
+
+    def test_replications_on_a_process_pool_match_local_runs(self):
+        local = run_replications(water_model, seeds=[1, 2, 3, 4], workers=1)
+        pooled = run_replications(water_model, seeds=[1, 2, 3, 4], workers=2)
+        self.assertListEqual(local.results, pooled.results)
+
+    def test_only_requested_keys_are_kept(self):
+        replications = run_replications(
+            water_model, seeds=[1, 2], workers=1, keys=["water"]
+        )
+        self.assertListEqual([list(r.values) for r in replications], [["water"]] * 2)
+
+    def test_reducer_decides_the_result(self):
+        replications = run_replications(
+            water_model, seeds=[1], workers=1, reducer=water_only
+        )
+        self.assertListEqual(list(replications.results[0].values), ["water"])
+
+    def test_summary_only_covers_numeric_values(self):
+        replications = run_replications(water_model, n=10, workers=1)
+        summary = replications.summary()
+        self.assertListEqual(list(summary), ["water"])
+        self.assertEqual(summary["water"].n, 10)
+        self.assertLess(summary["water"].low, summary["water"].mean)
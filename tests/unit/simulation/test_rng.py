@@ -0,0 +1,174 @@
+import subprocess
+import sys
+from copy import deepcopy
+from pathlib import Path
+
+from examples.water_bucket import water_bucket_simulation
+from simulation.framework import DiscreteSimulation, Event
+from simulation.parallel import ParallelDiscreteSimulation
+from simulation.persistent import PersistentState
+from simulation.rng import RandomStreams
+from tests.helpers import RepeatAction, TestCase
+
+
+class RollEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set(
+            "rolls", state.get("rolls") + [state.streams["dice"].randint(1, 6)]
+        )
+
+
+class MachineEvent(Event):
+    def __init__(self, key: str):
+        super(MachineEvent, self).__init__(name=key)
+        self.reads = self.writes = (key,)
+
+    def hook(self, state, *args, **kwargs):
+        parts = state.streams["machines"].randint(1, 1000)
+        return state.set(self.name, state.get(self.name) + parts)
+
+
+def machine_model(engine: type, **kwargs) -> DiscreteSimulation:
+    events = [(1, MachineEvent("m{}".format(i))) for i in range(4)]
+    return engine(
+        max_duration=5,
+        available_actions=[RepeatAction(events=events)],
+        initial_values={"m{}".format(i): 0 for i in range(4)},
+        quiet=True,
+        streams=RandomStreams(seed=5),
+        **kwargs
+    )
+
+
+def dice_model(seed, **kwargs) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=10,
+        available_actions=[RepeatAction(events=[(1, RollEvent())])],
+        initial_values={"rolls": []},
+        quiet=True,
+        streams=RandomStreams(seed),
+        **kwargs
+    )
+
+
+class TestRandomStreams(TestCase):
+    def test_same_seed_gives_same_variates(self):
+        first, second = RandomStreams(seed=1)["a"], RandomStreams(seed=1)["a"]
+
+        self.assertEqual(
+            [first.random() for _ in range(10)], [second.random() for _ in range(10)]
+        )
+
+    def test_streams_dont_depend_on_interleaving(self):
+        streams, other = RandomStreams(seed=1), RandomStreams(seed=1)
+        expected = [streams["a"].random() for _ in range(5)]
+        other["b"].random()
+        drawn = []
+        for _ in range(5):
+            drawn.append(other["a"].random())
+            other["b"].random()
+
+        self.assertEqual(drawn, expected)
+        self.assertNotEqual(other["b"].random(), streams["a"].random())
+
+    def test_block_size_doesnt_change_variates(self):
+        small = RandomStreams(seed=1, block_size=3)["a"]
+        large = RandomStreams(seed=1, block_size=1000)["a"]
+
+        self.assertEqual(
+            [small.random() for _ in range(10)], [large.random() for _ in range(10)]
+        )
+
+    def test_randint_includes_bounds(self):
+        stream = RandomStreams(seed=1)["a"]
+        drawn = {stream.randint(1, 3) for _ in range(100)}
+
+        self.assertEqual(drawn, {1, 2, 3})
+        self.assertIsInstance(stream.randint(1, 3), int)
+
+    def test_deepcopy_shares_streams(self):
+        streams = RandomStreams(seed=1)
+
+        self.assertIs(deepcopy(streams), streams)
+
+    def test_copy_continues_independently(self):
+        streams = RandomStreams(seed=1)
+        streams["a"].random()
+        copy = streams.copy()
+
+        drawn = [copy["a"].random() for _ in range(3)]
+
+        self.assertEqual([streams["a"].random() for _ in range(3)], drawn)
+
+
+class TestSimulationStreams(TestCase):
+    def test_states_share_streams(self):
+        sim = dice_model(seed=1)
+        sim.run()
+
+        self.assertIs(sim.timeline.history[0].streams, sim.streams)
+        self.assertIs(sim.timeline.current_state.streams, sim.streams)
+
+    def test_persistent_states_share_streams(self):
+        sim = dice_model(seed=1, state_factory=PersistentState)
+        sim.run()
+
+        self.assertIs(sim.timeline.current_state.streams, sim.streams)
+
+    def test_runs_are_reproducible(self):
+        first, second, other = dice_model(1), dice_model(1), dice_model(2)
+        for sim in (first, second, other):
+            sim.run()
+        rolls = first.timeline.current_state.get("rolls")
+
+        self.assertEqual(len(rolls), 10)
+        self.assertEqual(second.timeline.current_state.get("rolls"), rolls)
+        self.assertNotEqual(other.timeline.current_state.get("rolls"), rolls)
+
+    def test_fork_copies_streams(self):
+        sim = dice_model(seed=1)
+        sim.run()
+        fork = sim.fork()
+
+        self.assertIsNot(fork.streams, sim.streams)
+        self.assertIs(fork.timeline.current_state.streams, fork.streams)
+        for branch in (sim, fork):
+            branch.max_duration = 20
+            branch.run()
+        self.assertEqual(
+            fork.timeline.current_state.get("rolls"),
+            sim.timeline.current_state.get("rolls"),
+        )
+
+    def test_water_bucket_is_reproducible(self):
+        first = water_bucket_simulation(max_duration=300, seed=3)
+        second = water_bucket_simulation(max_duration=300, seed=3)
+        first.run()
+        second.run()
+
+        self.assertEqual(
+            first.timeline.current_state.values, second.timeline.current_state.values
+        )
+
+    def test_parallel_engine_draws_in_serial_order(self):
+        expected = machine_model(DiscreteSimulation).run().values
+        for executor in ("thread", "process"):
+            sim = machine_model(
+                ParallelDiscreteSimulation, executor=executor, workers=2
+            )
+
+            self.assertEqual(sim.run().values, expected)
+            self.assertSetEqual(sim.serial_types, {MachineEvent})
+
+    def test_example_runs_without_numpy(self):
+        code = (
+            "import sys, examples.water_bucket as example; "
+            "example.water_bucket_simulation(max_duration=30).run(); "
+            "print('numpy' in sys.modules)"
+        )
+        root = Path(__file__).parents[3]
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=root, text=True
+        )
+
+        self.assertEqual(output.strip(), "False")
@@ -1,6 +1,6 @@
 from copy import deepcopy
 
-from simulation.framework import State, Action
+from simulation.framework import State, Action, Event
 from tests.helpers import TestCase
 
 
@@ -35,3 +35,15 @@ class TestState(TestCase):
         s = State(active_events=[Action()])
         with self.assertRaises(IndexError):
             s.complete_event(Action())
+
+    def test_set_records_changes(self):
+        s = State(values={"water": 1})
+        s.set("fire", 2)
+        self.assertDictEqual(s.changes, {"fire": 2})
+
+    def test_applied_state_only_has_changes_of_that_event(self):
+        s = State(values={"water": 1})
+        s.set("fire", 2)
+        new_state = s.apply(Event(hook=lambda state: state.set("water", 3)))
+        self.assertDictEqual(new_state.changes, {"water": 3})
+        self.assertDictEqual(new_state.values, {"water": 3, "fire": 2})
@@ -0,0 +1,182 @@
+import random
+
+from simulation.framework import DiscreteSimulation, Event, State
+from simulation.replications import run_replications
+from simulation.stopping import (
+    STOP_MAX_DURATION,
+    STOP_NO_EVENTS,
+    Observations,
+    Precision,
+    Predicate,
+    SteadyState,
+    batch_means,
+    mser,
+)
+from tests.helpers import RepeatAction, TestCase
+
+
+class CoolDownEvent(Event):
+    """
+    Starts hot and settles around 50
+    """
+
+    def hook(self, state, *args, **kwargs):
+        return state.set("x", state.get("x") * 0.8 + random.gauss(10, 1))
+
+
+class TickEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("ticks", state.get("ticks") + 1)
+
+
+def cool_down_model(seed: int = 0, **kwargs) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=100000,
+        available_actions=[
+            RepeatAction(events=[(1, CoolDownEvent()), (1, TickEvent())])
+        ],
+        initial_values={"x": 200.0, "ticks": 0},
+        quiet=True,
+        **kwargs
+    )
+
+
+class TestDetectors(TestCase):
+    def test_mser_drops_the_transient(self):
+        rng = random.Random(1)
+        values = [100 - i + rng.gauss(0, 1) for i in range(100)]
+        values += [rng.gauss(0, 1) for _ in range(900)]
+        cutoff = mser(values)
+
+        self.assertGreater(cutoff, 50)
+        self.assertLessEqual(cutoff, 150)
+
+    def test_mser_keeps_stationary_data(self):
+        rng = random.Random(2)
+        self.assertLess(mser([rng.gauss(0, 1) for _ in range(1000)]), 100)
+
+    def test_mser_finds_no_steady_state_in_a_trend(self):
+        self.assertIsNone(mser([float(i) for i in range(1000)]))
+
+    def test_batch_means_uses_the_last_full_batches(self):
+        summary = batch_means([100.0] + [1.0, 2.0] * 10, batches=5)
+
+        self.assertEqual(summary.n, 5)
+        self.assertEqual(summary.mean, 1.5)
+
+    def test_batch_means_needs_a_value_per_batch(self):
+        with self.assertRaises(ValueError):
+            batch_means([1.0, 2.0], batches=5)
+
+    def test_observations_keep_running_sums(self):
+        rng = random.Random(1)
+        values = [100 - i + rng.gauss(0, 1) for i in range(100)]
+        values += [rng.gauss(0, 1) for _ in range(403)]
+        observations = Observations("x")
+        for t, value in enumerate(values):
+            observations.update(t, State().set("x", value))
+        cutoff = observations.mser()
+
+        self.assertEqual(cutoff, mser(values))
+        self.assertAlmostEqual(
+            observations.batch_means(cutoff).mean, batch_means(values[cutoff:]).mean
+        )
+
+
+class TestStopConditions(TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_predicate_stops_run(self):
+        sim = cool_down_model(stop_when=[Predicate(lambda s: s.get("ticks") >= 10)])
+        state = sim.run()
+
+        self.assertEqual(state.get("ticks"), 10)
+        self.assertEqual(sim.stop_reason, "predicate")
+
+    def test_predicate_is_only_evaluated_after_its_keys_change(self):
+        calls = []
+
+        def done(state) -> bool:
+            calls.append(state.get("ticks"))
+            return state.get("ticks") >= 10
+
+        sim = cool_down_model(
+            stop_when=[Predicate(done, keys=["ticks"], reason="done")]
+        )
+        sim.run()
+
+        self.assertEqual(calls, list(range(1, 11)))
+        self.assertEqual(sim.stop_reason, "done")
+
+    def test_records_why_run_stopped(self):
+        sim = cool_down_model()
+        sim.max_duration = 5
+        sim.run()
+        self.assertEqual(sim.stop_reason, STOP_MAX_DURATION)
+
+        sim = DiscreteSimulation(max_duration=5, available_actions=[], quiet=True)
+        sim.run()
+        self.assertEqual(sim.stop_reason, STOP_NO_EVENTS)
+
+    def test_steady_state_records_warmup_cutoff(self):
+        sim = cool_down_model(stop_when=[SteadyState("x")])
+        sim.run()
+
+        self.assertEqual(sim.stop_reason, "steady state")
+        self.assertGreater(sim.warmup_cutoff, 1)
+        self.assertLess(sim.timeline.current_time, 1000)
+
+    def test_warmup_cutoff_is_reset_by_the_next_run(self):
+        sim = cool_down_model(stop_when=[SteadyState("x")])
+        sim.run()
+        sim.stop_conditions = []
+        sim.max_duration = sim.timeline.current_time + 5
+        sim.run()
+
+        self.assertEqual(sim.stop_reason, STOP_MAX_DURATION)
+        self.assertIsNone(sim.warmup_cutoff)
+
+    def test_conditions_forget_earlier_runs(self):
+        steady = SteadyState("x")
+        sim = cool_down_model(stop_when=[steady])
+        sim.run()
+        sim.reset({"x": 200.0, "ticks": 0})
+        sim.run()
+
+        self.assertEqual(len(steady.observations), sim.timeline.current_time)
+
+    def test_precision_stops_once_interval_is_narrow(self):
+        precision = Precision("x", relative=0.01)
+        sim = cool_down_model(stop_when=[precision])
+        sim.run()
+
+        self.assertEqual(sim.stop_reason, "precision")
+        self.assertLessEqual(precision.summary.relative_half_width, 0.01)
+        self.assertAlmostEqual(precision.summary.mean, 50, delta=1)
+        self.assertGreater(sim.warmup_cutoff, 1)
+        self.assertLess(sim.timeline.current_time, 100000)
+
+
+def noisy_model(seed: int) -> DiscreteSimulation:
+    sim = cool_down_model()
+    sim.max_duration = 20
+    return sim
+
+
+class TestReplicationPrecision(TestCase):
+    def test_stops_launching_replications_once_precise(self):
+        replications = run_replications(
+            noisy_model, n=100, workers=1, precision=0.01, precision_keys=["x"]
+        )
+
+        self.assertLess(len(replications), 100)
+        self.assertEqual(replications.stop_reason, "precision")
+        self.assertLessEqual(replications.summary(["x"])["x"].relative_half_width, 0.01)
+        self.assertEqual(replications.results[0].stop_reason, STOP_MAX_DURATION)
+
+    def test_runs_all_replications_without_precision(self):
+        replications = run_replications(noisy_model, n=4, workers=1)
+
+        self.assertEqual(len(replications), 4)
+        self.assertEqual(replications.stop_reason, "replications")
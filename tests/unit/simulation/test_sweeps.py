@@ -0,0 +1,124 @@
+import inspect
+import os
+import tempfile
+from unittest import mock
+
+from simulation.framework import DiscreteSimulation
+from simulation.sweeps import (
+    ResultCache,
+    cache_key,
+    grid,
+    iter_sweep,
+    model_fingerprint,
+    run_sweep,
+    sample,
+)
+from tests.helpers import RandomFillEvent, TestCase, water_sim
+
+
+def fill_model(seed: int, duration: int = 10, start: int = 0) -> DiscreteSimulation:
+    return water_sim(
+        RandomFillEvent(), max_duration=duration, initial_values={"water": start}
+    )
+
+
+class TestPoints(TestCase):
+    def test_grid_contains_every_combination(self):
+        points = grid(duration=[5, 10], start=[0, 1, 2])
+
+        self.assertEqual(len(points), 6)
+        self.assertIn({"duration": 10, "start": 2}, points)
+
+    def test_sample_is_reproducible(self):
+        axes = {"start": lambda rng: rng.randint(0, 100)}
+
+        self.assertEqual(sample(5, seed=3, **axes), sample(5, seed=3, **axes))
+        self.assertEqual(len(sample(5, **axes)), 5)
+
+
+class TestCacheKey(TestCase):
+    def test_key_depends_on_params_seed_and_version(self):
+        key = cache_key({"a": 1, "b": 2}, 1, "v1")
+
+        self.assertEqual(key, cache_key({"b": 2, "a": 1}, 1, "v1"))
+        self.assertNotEqual(key, cache_key({"a": 1, "b": 3}, 1, "v1"))
+        self.assertNotEqual(key, cache_key({"a": 1, "b": 2}, 2, "v1"))
+        self.assertNotEqual(key, cache_key({"a": 1, "b": 2}, 1, "v2"))
+
+    def test_params_have_to_be_json(self):
+        with self.assertRaises(TypeError):
+            cache_key({"a": object()}, 1, "v1")
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(model_fingerprint(fill_model), model_fingerprint(fill_model))
+
+    def test_fingerprint_covers_imported_modules(self):
+        fingerprint = model_fingerprint(fill_model)
+        getsource = inspect.getsource
+        for name in ("simulation.framework", "tests.helpers"):
+
+            def changed_source(module, name=name):
+                source = getsource(module)
+                return source + "# Changed" if module.__name__ == name else source
+
+            with mock.patch("inspect.getsource", changed_source):
+                self.assertNotEqual(model_fingerprint(fill_model), fingerprint)
+
+    def test_cache_round_trip(self):
+        with tempfile.TemporaryDirectory() as path:
+            cache = ResultCache(path)
+            self.assertIsNone(cache.get("ab" * 32))
+            cache.put("ab" * 32, {"water": 3})
+
+            self.assertIn("ab" * 32, cache)
+            self.assertEqual(cache.get("ab" * 32), {"water": 3})
+
+
+class TestSweep(TestCase):
+    def test_results_are_in_point_and_seed_order(self):
+        points = grid(duration=[5, 10], start=[0, 100])
+        results = run_sweep(fill_model, points, replications=2, workers=1)
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual([r.params for r in results[::2]], points)
+        self.assertEqual(results[0].seed, results[2].seed)
+        for r in results:
+            self.assertGreaterEqual(r.values["water"], r.params["start"])
+
+    def test_same_seed_gives_same_values(self):
+        first = run_sweep(fill_model, [{"duration": 10}], seed=4, workers=1)
+        second = run_sweep(fill_model, [{"duration": 10}], seed=4, workers=1)
+
+        self.assertEqual(first[0].values, second[0].values)
+
+    def test_repeated_sweep_only_computes_new_points(self):
+        with tempfile.TemporaryDirectory() as path:
+            first = run_sweep(fill_model, grid(duration=[5, 10]), cache=path, workers=1)
+            second = run_sweep(
+                fill_model, grid(duration=[5, 10, 15]), cache=path, workers=1
+            )
+
+            self.assertFalse(any(r.cached for r in first))
+            self.assertEqual([r.cached for r in second], [True, True, False])
+            self.assertEqual(second[0].values, first[0].values)
+
+    def test_new_version_invalidates_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            run_sweep(fill_model, [{}], cache=path, version="v1", workers=1)
+            results = run_sweep(fill_model, [{}], cache=path, version="v2", workers=1)
+
+            self.assertFalse(results[0].cached)
+
+    def test_results_are_streamed(self):
+        results = iter_sweep(fill_model, grid(duration=[5, 10]), workers=1)
+
+        self.assertEqual(next(results).params, {"duration": 5})
+
+    def test_parallel_sweep_matches_serial(self):
+        points = grid(duration=[5, 10])
+        with tempfile.TemporaryDirectory() as path:
+            parallel = run_sweep(fill_model, points, cache=path, workers=2)
+            self.assertEqual(sum(len(f) for _, _, f in os.walk(path)), 2)
+        serial = run_sweep(fill_model, points, workers=1)
+
+        self.assertEqual([r.values for r in parallel], [r.values for r in serial])
@@ -1,7 +1,9 @@
+from copy import deepcopy
 from collections import OrderedDict
 from random import randint
 
-from simulation.framework import Timeline, Event, Timeslot, Action
+from simulation.framework import Timeline, Event, Timeslot, Action, SimulationError
+from simulation.queues import CalendarEventQueue
 from tests.helpers import TestCase
 
 
@@ -18,6 +20,44 @@ class TestTimeline(TestCase):
         self.assertEqual(last_event, es[-1])
         self.assertEqual(t, 99)
 
+    def test_last_event_prefers_highest_weight(self):
+        low = Event(hook=lambda *args, **kwargs: 123, weight=1)
+        high = Event(hook=lambda *args, **kwargs: 123, weight=3)
+        tl = Timeline()
+        tl.schedule_event(event=low, time=4)
+        tl.schedule_event(event=high, time=4)
+        tl.schedule_event(event=Event(hook=lambda *args, **kwargs: 123), time=2)
+        self.assertEqual(tl.last_event_occurrence(Event), (4, high))
+
+    def test_executed_events_can_be_queried(self):
+        es = [Event(hook=lambda state: state) for _ in range(5)]
+        tl = Timeline()
+        for i, e in enumerate(es):
+            tl.schedule_event(event=e, time=i + 1)
+        self.assertIsNone(tl.last_event_occurrence(Event, executed=True))
+        for i, e in enumerate(es[:3]):
+            tl.set_state(state=tl.current_state.apply(e), time=i + 1, event=e)
+        self.assertEqual(tl.last_event_occurrence(Event, executed=True), (3, es[2]))
+        self.assertEqual(tl.count_since(2, executed=True), 2)
+        self.assertEqual(tl.count_since(2), 4)
+        self.assertListEqual(
+            tl.events_between(2, 4), [(2, es[1]), (3, es[2]), (4, es[3])]
+        )
+        self.assertListEqual(
+            tl.events_between(2, 4, executed=True), [(2, es[1]), (3, es[2])]
+        )
+
+    def test_actions_can_be_queried_by_time(self):
+        tl = Timeline()
+        a1 = Action()
+        a2 = Action()
+        tl.schedule_action(a1)
+        tl.set_state(state=tl.current_state, time=5)
+        tl.schedule_action(a2)
+        self.assertEqual(tl.last_action_occurrence(Action), (5, a2))
+        self.assertListEqual(tl.actions_between(0, 4), [(0, a1)])
+        self.assertEqual(tl.action_count_since(1), 1)
+
     def test_next_event_occurrence_can_be_retrieved(self):
         es = [
             Event(hook=lambda *args, **kwargs: 123, weight=randint(0, 5))
@@ -60,3 +100,160 @@ class TestTimeline(TestCase):
             ),
             tl.actions,
         )
+
+    def test_events_scheduled_out_of_order_are_kept_sorted_by_time(self):
+        tl = Timeline()
+        for t in [5, 1, 3, 9, 2]:
+            tl.schedule_event(Event(hook=lambda *args, **kwargs: 123), time=t)
+        self.assertListEqual(list(tl.events.keys()), [1, 2, 3, 5, 9])
+
+    def test_upcoming_event_is_retrieved_with_calendar_queue(self):
+        es = [Event(hook=lambda *args, **kwargs: 123) for _ in range(50)]
+        tl = Timeline(queue=CalendarEventQueue())
+        for i, e in reversed(list(enumerate(es))):
+            tl.schedule_event(event=e, time=i + 1)
+        t, next_event = tl.get_first_upcoming_event()
+        self.assertEqual(next_event, es[0])
+        self.assertEqual(t, 1)
+
+    def test_started_events_are_skipped(self):
+        e1 = Event(hook=lambda *args, **kwargs: 123)
+        e2 = Event(hook=lambda *args, **kwargs: 123)
+        tl = Timeline()
+        tl.schedule_event(e1, time=1)
+        tl.schedule_event(e2, time=2)
+        e1.started = True
+        self.assertEqual(tl.get_first_upcoming_event(), (2, e2))
+
+    def test_action_is_planned_until_time_moves_on(self):
+        a = Action()
+        tl = Timeline()
+        tl.schedule_action(a)
+        self.assertTrue(tl.action_already_planned(Action()))
+        self.assertEqual(tl.planned_action_count(Action, time=0), 1)
+        tl.set_state(state=tl.current_state, time=1)
+        self.assertFalse(tl.action_already_planned(Action()))
+        self.assertListEqual(tl.actions_to_come, [])
+
+    def test_executed_events_are_no_longer_to_come(self):
+        e1 = Event(hook=lambda *args, **kwargs: 123)
+        e2 = Event(hook=lambda *args, **kwargs: 123)
+        tl = Timeline()
+        tl.schedule_event(e2, time=2)
+        tl.schedule_event(e1, time=1)
+        self.assertListEqual(tl.events_to_come, [e1, e2])
+        tl.set_state(state=tl.current_state, time=1, event=e1)
+        self.assertListEqual(tl.events_to_come, [e2])
+        self.assertListEqual(tl.events_to_come_of(Event), [e2])
+
+
+class TestCancellation(TestCase):
+    @staticmethod
+    def event(weight=0) -> Event:
+        return Event(hook=lambda state: state, weight=weight)
+
+    def test_cancelled_event_does_not_come_up(self):
+        tl = Timeline()
+        e1, e2 = self.event(), self.event()
+        handle = tl.schedule_event(e1, time=1)
+        tl.schedule_event(e2, time=2)
+        self.assertTrue(handle.cancel())
+        self.assertEqual(tl.get_first_upcoming_event(), (2, e2))
+        self.assertListEqual(tl.events_to_come, [e2])
+        self.assertListEqual(tl.events[1].to_list(), [])
+        self.assertEqual(tl.last_event_occurrence(Event), (2, e2))
+        self.assertFalse(handle.cancel())
+
+    def test_executed_event_can_not_be_cancelled(self):
+        tl = Timeline()
+        e = self.event()
+        tl.schedule_event(e, time=1)
+        tl.set_state(state=tl.current_state.apply(e), time=1, event=e)
+        self.assertFalse(tl.cancel(e))
+
+    def test_reschedule_moves_event(self):
+        tl = Timeline()
+        e1, e2 = self.event(), self.event()
+        tl.schedule_event(e1, time=1)
+        tl.schedule_event(e2, time=2)
+        handle = tl.reschedule(e1, 3)
+        self.assertEqual(handle.time, 3)
+        self.assertEqual(tl.get_first_upcoming_event(), (2, e2))
+        self.assertListEqual(tl.events_to_come, [e2, e1])
+        self.assertEqual(tl.last_event_occurrence(Event), (3, e1))
+
+    def test_reschedule_of_unknown_event_raises_error(self):
+        with self.assertRaises(SimulationError):
+            Timeline().reschedule(self.event(), 3)
+
+    def test_cancelling_action_cancels_its_remaining_events(self):
+        tl = Timeline()
+        e1, e2 = self.event(), self.event()
+        action = Action(events=[(1, e1), (2, e2)])
+        handle = tl.schedule_action(action)
+        tl.set_state(state=tl.current_state.apply(e1), time=1, event=e1)
+        self.assertTrue(handle.cancel())
+        self.assertIsNone(tl.get_first_upcoming_event())
+        self.assertTrue(e1.started)
+        self.assertFalse(e2.started)
+
+    def test_cancelling_planned_action_unplans_it(self):
+        tl = Timeline()
+        action = Action(events=[(1, self.event())])
+        tl.schedule_action(action)
+        self.assertTrue(tl.action_already_planned(action))
+        tl.cancel(action)
+        self.assertFalse(tl.action_already_planned(action))
+        self.assertIsNone(tl.last_action_occurrence(Action))
+
+    def test_cancellation_survives_copying(self):
+        tl = Timeline()
+        e = self.event()
+        tl.schedule_event(e, time=1)
+        copied = deepcopy(tl)
+        (copied_event,) = copied.events_to_come
+        self.assertTrue(copied.cancel(copied_event))
+        self.assertIsNone(copied.get_first_upcoming_event())
+        self.assertEqual(tl.get_first_upcoming_event(), (1, e))
+
+    def test_reschedule_moves_action_with_its_events(self):
+        tl = Timeline()
+        e1, e2 = self.event(), self.event()
+        action = Action(events=[(1, e1), (2, e2)])
+        handle = tl.schedule_action(action).reschedule(5)
+        self.assertEqual(handle.time, 5)
+        self.assertEqual(tl.get_first_upcoming_event(), (6, e1))
+        self.assertListEqual(tl.events_to_come, [e1, e2])
+        self.assertEqual(tl.last_action_occurrence(Action), (5, action))
+        self.assertListEqual(tl.actions[0].to_list(), [])
+
+    def test_started_action_can_not_be_rescheduled(self):
+        tl = Timeline()
+        e1, e2 = self.event(), self.event()
+        action = Action(events=[(0, e1), (2, e2)])
+        tl.schedule_action(action)
+        tl.set_state(state=tl.current_state.apply(e1), time=0, event=e1)
+        with self.assertRaises(SimulationError):
+            tl.reschedule(action, 5)
+        self.assertEqual(tl.get_first_upcoming_event(), (2, e2))
+
+    def test_many_cancellations_keep_queries_right(self):
+        tl = Timeline()
+        es = [self.event() for _ in range(20)]
+        handles = [tl.schedule_event(e, time=i % 4) for i, e in enumerate(es)]
+        for handle in handles[::3]:
+            handle.cancel()
+        kept = [e for i, e in enumerate(es) if i % 3]
+        self.assertEqual(len(tl.scheduled_events), len(kept))
+        self.assertEqual(
+            tl.count_since(2), sum(1 for i in range(20) if i % 3 and i % 4 >= 2)
+        )
+        self.assertListEqual(
+            [e for _, e in tl.events_between(0, 3)],
+            sorted(kept, key=lambda e: es.index(e) % 4),
+        )
+        self.assertListEqual(
+            tl.events[3].to_list(),
+            [e for i, e in enumerate(es) if i % 3 and i % 4 == 3],
+        )
+        self.assertEqual(tl.last_event_occurrence(), (3, es[7]))
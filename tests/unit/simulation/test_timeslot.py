@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from copy import deepcopy
 
 from simulation.framework import Timeslot, Event
 from tests.helpers import TestCase
@@ -40,3 +41,72 @@ class TestTimeslot(TestCase):
             ts.to_list(),
             [highweightevent1, highweightevent2, lowweightevent1, lowweightevent2],
         )
+
+    def test_next_event_skips_started_items(self):
+        e1 = Event(hook=lambda *args, **kwargs: 123)
+        e2 = Event(hook=lambda *args, **kwargs: 123)
+        ts = Timeslot(items=[e1, e2])
+        self.assertEqual(ts.next_event(), e1)
+        e1.started = True
+        self.assertEqual(ts.next_event(), e2)
+        e2.started = True
+        self.assertIsNone(ts.next_event())
+
+    def test_next_event_returns_items_added_before_the_cursor(self):
+        lowweightevent = Event(weight=0, hook=lambda *args, **kwargs: 123)
+        highweightevent = Event(weight=100, hook=lambda *args, **kwargs: 123)
+        midweightevent = Event(weight=50, hook=lambda *args, **kwargs: 123)
+        ts = Timeslot(items=[highweightevent, lowweightevent])
+        highweightevent.started = True
+        self.assertEqual(ts.next_event(), lowweightevent)
+        ts.add(midweightevent)
+        self.assertEqual(ts.next_event(), midweightevent)
+        another_highweightevent = Event(weight=100, hook=lambda *args, **kwargs: 1)
+        ts.add(another_highweightevent)
+        self.assertEqual(ts.next_event(), another_highweightevent)
+
+    def test_upcoming_events_only_contains_unstarted_items(self):
+        es = [Event(hook=lambda *args, **kwargs: 123) for _ in range(5)]
+        ts = Timeslot(items=es)
+        for e in es[:3]:
+            e.started = True
+            ts.next_event()
+        self.assertListEqual(ts.upcoming_events(), es[3:])
+        self.assertListEqual(ts.to_list(), es)
+
+    def test_discarded_item_is_removed(self):
+        e1 = Event(hook=lambda state: state)
+        e2 = deepcopy(e1)  # Equal to e1, but not the same event
+        ts = Timeslot([e1, e2])
+        self.assertTrue(ts.discard(e2))
+        self.assertListEqual(ts.to_list(), [e1])
+        self.assertIs(ts.to_list()[0], e1)
+        self.assertFalse(ts.discard(e2))
+
+    def test_discard_keeps_the_cursor_in_place(self):
+        e1, e2, e3 = [Event(hook=lambda state: state) for _ in range(3)]
+        ts = Timeslot([e1, e2, e3])
+        e1.started = True
+        self.assertIs(ts.next_event(), e2)
+        ts.discard(e1)
+        self.assertIs(ts.next_event(), e2)
+        ts.discard(e2)
+        self.assertIs(ts.next_event(), e3)
+
+    def test_discarded_items_are_compacted(self):
+        es = [Event(hook=lambda state: state) for _ in range(6)]
+        ts = Timeslot(es)
+        for e in es[:3]:
+            self.assertTrue(ts.discard(e))
+        self.assertEqual(len(ts._discarded), 3)
+        self.assertTrue(ts.discard(es[3]))
+        self.assertEqual(len(ts._discarded), 0)
+        self.assertListEqual(ts.to_list(), es[4:])
+        self.assertIs(ts.next_event(), es[4])
+
+    def test_discarded_item_can_be_added_again(self):
+        e1, e2 = [Event(hook=lambda state: state) for _ in range(2)]
+        ts = Timeslot([e1, e2])
+        ts.discard(e1)
+        ts.add(e1)
+        self.assertListEqual(ts.to_list(), [e2, e1])
@@ -0,0 +1,104 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from simulation.framework import Event, Step
+from simulation.trace import BinaryTrace, BinaryTraceWriter, JsonlTraceWriter
+from tests.helpers import FillEvent, TestCase, water_sim
+
+
+class TestIterRun(TestCase):
+    def test_steps_are_yielded_as_events_execute(self):
+        steps = list(water_sim(every=2, max_duration=10).iter_run())
+        self.assertListEqual([s.time for s in steps], [2, 4, 6, 8, 10])
+        self.assertListEqual(
+            [s.changes for s in steps], [{"water": i} for i in range(1, 6)]
+        )
+        self.assertTrue(all(isinstance(s.event, FillEvent) for s in steps))
+
+    def test_state_is_updated_while_iterating(self):
+        sim = water_sim(every=2, max_duration=10)
+        for step in sim.iter_run():
+            self.assertEqual(sim.timeline.current_time, step.time)
+
+    def test_run_returns_same_state_as_iterating(self):
+        sim = water_sim(every=2, max_duration=10)
+        list(sim.iter_run())
+        self.assertDictEqual(
+            sim.timeline.current_state.values,
+            water_sim(every=2, max_duration=10).run().values,
+        )
+
+
+class TestJsonlTraceWriter(TestCase):
+    def test_steps_are_written_as_json_lines(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.jsonl")
+            with JsonlTraceWriter(path, batch_size=2) as trace:
+                trace.write_all(water_sim(every=2, max_duration=10).iter_run())
+            with open(path) as fp:
+                records = [json.loads(line) for line in fp]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["time"], 2)
+        self.assertEqual(records[0]["event"], "FillEvent")
+        self.assertDictEqual(records[-1]["changes"], {"water": 5})
+
+    def test_unknown_values_are_written_as_strings(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.jsonl")
+            with JsonlTraceWriter(path) as trace:
+                trace.write(
+                    Step(
+                        time=1,
+                        event=Event(hook=lambda state: state),
+                        changes={"x": {1}},
+                    )
+                )
+            with open(path) as fp:
+                self.assertEqual(json.loads(fp.read())["changes"], {"x": "{1}"})
+
+
+class TestBinaryTraceWriter(TestCase):
+    def test_columns_can_be_read_back(self):
+        with TemporaryDirectory() as directory:
+            with BinaryTraceWriter(directory, batch_size=2) as trace:
+                trace.write_all(water_sim(every=2, max_duration=10).iter_run())
+            columns = BinaryTrace(directory)
+            self.assertListEqual(columns["time"].tolist(), [2, 4, 6, 8, 10])
+            self.assertListEqual(columns.events, ["FillEvent"])
+            times, values = columns.values("water")
+            self.assertListEqual(times.tolist(), [2, 4, 6, 8, 10])
+            self.assertListEqual(values.tolist(), [1, 2, 3, 4, 5])
+            del columns, times, values
+
+    def test_empty_trace_can_be_read_back(self):
+        with TemporaryDirectory() as directory:
+            BinaryTraceWriter(directory).close()
+            self.assertEqual(len(BinaryTrace(directory)["time"]), 0)
+
+    def test_non_numeric_values_are_refused(self):
+        with TemporaryDirectory() as directory:
+            with BinaryTraceWriter(directory) as trace:
+                with self.assertRaises(TypeError):
+                    trace.write(
+                        Step(
+                            time=1,
+                            event=Event(hook=lambda state: state),
+                            changes={"x": "wet"},
+                        )
+                    )
+
+    def test_refused_steps_are_not_written(self):
+        event = Event(hook=lambda state: state)
+        with TemporaryDirectory() as directory:
+            with BinaryTraceWriter(directory) as trace:
+                trace.write(Step(time=1, event=event, changes={"x": 1}))
+                for value in ("wet", 2j):
+                    with self.assertRaises(TypeError):
+                        trace.write(
+                            Step(time=2, event=event, changes={"y": 0, "x": value})
+                        )
+            columns = BinaryTrace(directory)
+            self.assertListEqual(columns["time"].tolist(), [1])
+            self.assertListEqual(columns["value"].tolist(), [1])
+            del columns
@@ -0,0 +1,89 @@
+from unittest.mock import Mock
+
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.triggers import ActionTriggers
+from tests.helpers import TestCase
+
+
+class FireEvent(Event):
+    pass
+
+
+class SpecialFireEvent(FireEvent):
+    pass
+
+
+class WaterAction(Action):
+    depends_on = ("water",)
+
+
+class FireAction(Action):
+    triggered_by = (FireEvent,)
+
+
+class TestActionTriggers(TestCase):
+    def setUp(self):
+        self.always = Action()
+        self.water = WaterAction()
+        self.fire = FireAction()
+        self.triggers = ActionTriggers([self.always, self.water, self.fire])
+
+    def test_all_actions_are_checked_first(self):
+        self.assertListEqual(self.triggers.due(), [self.always, self.water, self.fire])
+
+    def test_undeclared_actions_are_always_checked(self):
+        self.triggers.due()
+        self.assertListEqual(self.triggers.due(), [self.always])
+
+    def test_actions_are_checked_after_their_keys_change(self):
+        self.triggers.due()
+        self.triggers.mark(event=Event(hook=Mock()), changes={"water": 1})
+        self.assertListEqual(self.triggers.due(), [self.always, self.water])
+        self.assertListEqual(self.triggers.due(), [self.always])
+
+    def test_actions_are_checked_after_their_event_types_execute(self):
+        self.triggers.due()
+        self.triggers.mark(event=SpecialFireEvent(hook=Mock()), changes={})
+        self.assertListEqual(self.triggers.due(), [self.always, self.fire])
+
+
+class TestReactiveSimulation(TestCase):
+    def test_declared_actions_are_only_checked_when_dependencies_change(self):
+        class TickEvent(Event):
+            def hook(self, state, *args, **kwargs):
+                return state.set("ticks", state.get("ticks") + 1)
+
+        class TickAction(Action):
+            events = [(1, TickEvent())]
+
+            def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+                return not timeline.action_already_planned(action=self)
+
+        class NeverAction(Action):
+            depends_on = ("water",)
+            checks = 0
+
+            def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+                NeverAction.checks += 1
+                return False
+
+        sim = DiscreteSimulation(
+            max_duration=10,
+            available_actions=[TickAction(), NeverAction()],
+            initial_values={"ticks": 0},
+        )
+        sim.run()
+        self.assertEqual(sim.timeline.current_state.get("ticks"), 10)
+        self.assertEqual(NeverAction.checks, 1)
+
+    def test_actions_are_sorted_again_when_they_change(self):
+        low, high = Action(weight=1), Action(weight=2)
+        sim = DiscreteSimulation(max_duration=1, available_actions=[low, high])
+        self.assertListEqual(sim.actions_by_weight, [high, low])
+
+        highest = Action(weight=3)
+        sim.available_actions[0] = highest
+        self.assertListEqual(sim.actions_by_weight, [highest, high])
+        high.weight = 4
+        self.assertListEqual(sim.actions_by_weight, [high, highest])
+        self.assertIs(sim.triggers.actions, sim.actions_by_weight)
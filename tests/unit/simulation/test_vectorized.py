@@ -0,0 +1,127 @@
+import numpy as np
+
+from simulation.framework import Action, DiscreteSimulation, Event
+from simulation.vectorized import VectorizedSimulation, VectorState, run_lockstep
+from tests.helpers import TestCase
+
+
+class DropEvent(Event):
+    def hook(self, state, *args, **kwargs):
+        return state.set("drops", state.get("drops") + 7)
+
+    def vector_hook(self, state, mask):
+        return state.set("drops", state.get("drops") + 7, mask=mask)
+
+
+class DropAction(Action):
+    events = [(3, DropEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return not timeline.action_already_planned(action=self)
+
+    def vector_ready(self, state, timeline):
+        return ~timeline.action_already_planned(action=self)
+
+
+class OverflowEvent(Event):
+    weight = 2
+
+    def hook(self, state, *args, **kwargs):
+        state = state.set("drops", 0)
+        return state.set("overflows", state.get("overflows") + 1)
+
+    def vector_hook(self, state, mask):
+        state = state.set("drops", 0, mask=mask)
+        return state.set("overflows", state.get("overflows") + 1, mask=mask)
+
+
+class OverflowAction(Action):
+    events = [(1, OverflowEvent())]
+
+    def ready_to_start(self, timeline, *args, **kwargs) -> bool:
+        return timeline.current_state.get(
+            "drops"
+        ) > 20 and not timeline.action_already_planned(action=self)
+
+    def vector_ready(self, state, timeline):
+        return (state.get("drops") > 20) & ~timeline.action_already_planned(self)
+
+
+class ScalarOnlyAction(Action):
+    events = [(3, Event(hook=lambda state: state))]
+
+
+def bucket_model(seed: int) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=100,
+        available_actions=[DropAction(), OverflowAction()],
+        initial_values={"drops": 0, "overflows": 0},
+    )
+
+
+def scalar_model(seed: int) -> DiscreteSimulation:
+    return DiscreteSimulation(
+        max_duration=10,
+        available_actions=[ScalarOnlyAction()],
+        initial_values={"drops": 0},
+    )
+
+
+class TestVectorState(TestCase):
+    def test_values_are_set_for_masked_lanes(self):
+        s = VectorState(values={"drops": 1}, lanes=3, rng=np.random.default_rng())
+        s.set("drops", 5, mask=np.array([True, False, True]))
+        self.assertListEqual(s.get("drops").tolist(), [5, 1, 5])
+        self.assertDictEqual(s.lane(1), {"drops": 1})
+
+    def test_values_are_set_for_all_lanes_without_mask(self):
+        s = VectorState(values={}, lanes=2, rng=np.random.default_rng())
+        s.set("drops", 3)
+        self.assertListEqual(s.get("drops").tolist(), [3, 3])
+
+
+class TestVectorizedSimulation(TestCase):
+    def test_lanes_match_the_scalar_engine(self):
+        sim = bucket_model(0)
+        sim.run()
+        lockstep = VectorizedSimulation(
+            max_duration=100,
+            available_actions=[DropAction(), OverflowAction()],
+            initial_values={"drops": 0, "overflows": 0},
+            lanes=4,
+        )
+        state = lockstep.run()
+        for lane in range(4):
+            self.assertDictEqual(state.lane(lane), sim.timeline.current_state.values)
+        self.assertListEqual(
+            lockstep.timeline.current_time.tolist(), [sim.timeline.current_time] * 4
+        )
+
+    def test_capacity_grows_when_lanes_run_out_of_slots(self):
+        lockstep = VectorizedSimulation(
+            max_duration=100,
+            available_actions=[DropAction(), OverflowAction()],
+            initial_values={"drops": 0, "overflows": 0},
+            lanes=2,
+            capacity=1,
+        )
+        lockstep.run()
+        self.assertGreater(lockstep._times.shape[1], 1)
+
+    def test_models_without_vectorized_hooks_are_refused(self):
+        with self.assertRaises(TypeError):
+            VectorizedSimulation(
+                max_duration=10, available_actions=[ScalarOnlyAction()], lanes=2
+            )
+
+
+class TestRunLockstep(TestCase):
+    def test_vectorized_models_run_in_lockstep(self):
+        replications = run_lockstep(bucket_model, n=3)
+        self.assertEqual(len(replications), 3)
+        self.assertEqual(replications.summary()["overflows"].stdev, 0)
+        self.assertListEqual([r.seed for r in replications.results], [0, 1, 2])
+
+    def test_other_models_fall_back_to_scalar_engine(self):
+        replications = run_lockstep(scalar_model, n=2, workers=1)
+        self.assertEqual(len(replications), 2)